@@ -8,6 +8,9 @@ andriy.toloshnyy@gmail.com
 import os
 import sys
 import time
+import random
+import queue
+import itertools
 import threading
 import atexit
 import inspect
@@ -46,6 +49,28 @@ default_storage_root = '/media/dirtylooks_vfx'
 
 shot_code_field = '30_dl_vfx_id'
 
+# fetch queue priorities, lower values are served first
+fetch_priority_menu = 0
+fetch_priority_batch = 1
+fetch_priority_background = 2
+
+# bump when pipeline data layout changes
+# so older on-disk caches are ignored
+pipeline_cache_format = 'flameMenuKITSU pipeline cache'
+pipeline_cache_version = 2
+pipeline_cache_keys = (
+    'current_project',
+    'project_tasks_for_person',
+    'all_episodes_for_project',
+    'all_sequences_for_project',
+    'all_shots_for_project',
+    'all_assets_for_project',
+    'tasks_by_entity_id',
+    'preview_by_task_id',
+    'all_task_types_for_project',
+    'all_task_statuses_for_project'
+)
+
 default_templates = {
     'Shot': {
         'flame_render': {
@@ -214,6 +239,9 @@ class flameAppFramework(object):
         self.prefs = {}
         self.prefs_user = {}
         self.prefs_global = {}
+        # bumped whenever prefs might have been changed
+        # so menus built from them are built again
+        self.prefs_revision = 0
         self.debug = settings['debug']
         
         try:
@@ -287,6 +315,8 @@ class flameAppFramework(object):
 
     def load_prefs(self):
         import pickle
+
+        self.prefs_revision += 1
         
         prefix = self.prefs_folder + os.path.sep + self.bundle_name
         prefs_file_path = prefix + '.' + self.flame_user_name + '.' + self.flame_project_name + '.prefs'
@@ -371,6 +401,8 @@ class flameAppFramework(object):
     def save_prefs(self):
         import pickle
 
+        self.prefs_revision += 1
+
         if not os.path.isdir(self.prefs_folder):
             try:
                 os.makedirs(self.prefs_folder)
@@ -625,6 +657,8 @@ class flameMenuApp(object):
         self.menu_group_name = settings['menu_group_name']
         self.debug = settings['debug']
         self.dynamic_menu_data = {}
+        self.previous_menu_data = {}
+        self.menu_cache = {}
 
         # flame module is only avaliable when a 
         # flame project is loaded and initialized
@@ -678,7 +712,58 @@ class flameMenuApp(object):
     def log_debug(self, message):
         self.framework.log_debug('[' + self.name + '] ' + str(message))
 
+    def cached_menu(self, menu_key, build):
+        # Flame asks for menus on every right-click and again after each
+        # rescan, so menu is only built again when anything it is built
+        # from has changed. menu_key should hold pipeline data generation
+        # and the state menu is built from that prefs revision does not cover
+        menu_key = (menu_key, self.framework.prefs_revision)
+        if self.menu_cache.get('key') == menu_key:
+            return self.menu_cache.get('menu')
+        self.reset_menu_callbacks()
+        menu = build()
+        self.menu_cache = {'key': menu_key, 'menu': menu}
+        return menu
+
+    def invalidate_menu(self):
+        self.menu_cache = {}
+
+    def menu_inputs(self, pipeline_data):
+        # parts of pipeline data menus of the app are built from,
+        # other than prefs, user and linked project.
+        # menus are refreshed when they change
+        return ()
+
+    def flame_inputs(self):
+        # parts of Flame state menus of the app are built from,
+        # like current batch or selection. Flame does not tell
+        # when they change so they are polled at idle and should
+        # be cheap to read. Called from Flame main thread only
+        return ()
+
+    def menu_callback(self, key, data):
+        # data of a menu action is registered under a stable key
+        # such as 'publish Shot <shot id> <task id>' and Flame gets
+        # a callback named after it, so the same action on the same
+        # entity always resolves to the same data
+        self.dynamic_menu_data[key] = data
+        return getattr(self, key)
+
+    def reset_menu_callbacks(self):
+        # called before menus are built so only callbacks of the last
+        # two builds are kept, the previous ones in case Flame
+        # still shows menus built from them
+        self.previous_menu_data = self.dynamic_menu_data
+        self.dynamic_menu_data = {}
+
+    def get_menu_data(self, key):
+        data = self.dynamic_menu_data.get(key)
+        if data is None:
+            data = self.previous_menu_data.get(key)
+        return data
+
     def rescan(self, *args, **kwargs):
+        self.invalidate_menu()
         if not self.flame:
             try:
                 import flame
@@ -817,6 +902,352 @@ class flameMenuApp(object):
         return preset_fields
 
 
+class flameKitsuPipelineIndex(object):
+    # Indexed view of project entities used to join episodes,
+    # sequences, shots and assets without walking the lists.
+    # Index is never changed in place: updated() and patched() return
+    # a new index that shares maps with the old one if their inputs
+    # have not changed
+
+    def __init__(self):
+        self.sources = {}
+        self.episode_by_id = {}
+        self.episode_id_by_entity_id = {}
+        self.sequence_by_id = {}
+        self.shots_by_sequence_id = {}
+        self.entity_by_code = {}
+        self.entity_by_id = {}
+        self.shots = []
+        self.assets = []
+        self.views = self.build_views()
+
+    def updated(self, episodes = None, sequences = None, shots = None, assets = None):
+        index = flameKitsuPipelineIndex()
+        index.__dict__.update(self.__dict__)
+        index.sources = dict(self.sources)
+
+        def changed(name, source):
+            # snapshot lists are replaced and never changed in place
+            # so list that has been indexed already has not changed
+            if index.sources.get(name) is source:
+                return False
+            index.sources[name] = source
+            return True
+
+        if episodes is not None:
+            if changed('episodes', episodes):
+                index.episode_by_id = {x.get('id'):x for x in episodes if x.get('id')}
+                episode_id_by_entity_id = {}
+                for episode_id, episode in index.episode_by_id.items():
+                    for asset_id in (episode.get('assets_by_id') or {}).keys():
+                        episode_id_by_entity_id[asset_id] = episode_id
+                    for shot_id in (episode.get('shots_by_id') or {}).keys():
+                        episode_id_by_entity_id[shot_id] = episode_id
+                index.episode_id_by_entity_id = episode_id_by_entity_id
+
+        if sequences is not None:
+            if changed('sequences', sequences):
+                index.sequence_by_id = {x.get('id'):x for x in sequences}
+
+        shots_changed = False
+        if shots is not None:
+            shots_changed = changed('shots', shots)
+            if shots_changed:
+                shots_by_sequence_id = {}
+                for shot in shots:
+                    shots_by_sequence_id.setdefault(shot.get('parent_id'), []).append(shot)
+                index.shots_by_sequence_id = shots_by_sequence_id
+                index.shots = shots
+
+        assets_changed = False
+        if assets is not None:
+            assets_changed = changed('assets', assets)
+            if assets_changed:
+                index.assets = assets
+
+        if shots_changed or assets_changed:
+            entity_by_code = {}
+            entity_by_id = {}
+            for entity in index.assets:
+                entity_by_code[entity.get('code')] = entity
+                entity_by_id[entity.get('id')] = entity
+            for entity in index.shots:
+                entity_by_code[entity.get('code')] = entity
+                entity_by_id[entity.get('id')] = entity
+            index.entity_by_code = entity_by_code
+            index.entity_by_id = entity_by_id
+            index.views = index.build_views()
+
+        return index
+
+    def patched(self, entity_type, entity_id, entities, entity = None):
+        # returns index with one shot or asset added, replaced
+        # or removed if entity is None. entities is the list
+        # the change has already been applied to.
+        # only maps and view lists the entity is in are copied and updated
+        index = flameKitsuPipelineIndex()
+        index.__dict__.update(self.__dict__)
+        index.sources = dict(self.sources)
+        if entity_type == 'Shot':
+            index.sources['shots'] = index.shots = entities
+        else:
+            index.sources['assets'] = index.assets = entities
+        old_entity = self.entity_by_id.get(entity_id)
+
+        index.entity_by_id = dict(self.entity_by_id)
+        index.entity_by_id.pop(entity_id, None)
+        if entity:
+            index.entity_by_id[entity_id] = entity
+
+        if entity_type == 'Shot':
+            shots_by_sequence_id = dict(self.shots_by_sequence_id)
+            if old_entity:
+                sequence_id = old_entity.get('parent_id')
+                shots_by_sequence_id[sequence_id] = [
+                    x for x in shots_by_sequence_id.get(sequence_id, []) if x.get('id') != entity_id]
+            if entity:
+                sequence_id = entity.get('parent_id')
+                shots_by_sequence_id[sequence_id] = shots_by_sequence_id.get(sequence_id, []) + [entity]
+            index.shots_by_sequence_id = shots_by_sequence_id
+
+        # shots take codes over assets, and later entities over earlier ones
+        entity_by_code = dict(self.entity_by_code)
+        if old_entity:
+            code = old_entity.get('code')
+            if entity_by_code.get(code) is old_entity:
+                entity_by_code.pop(code)
+                if not (entity and entity.get('code') == code):
+                    for x in index.assets + index.shots:
+                        if x.get('code') == code:
+                            entity_by_code[code] = x
+        if entity:
+            code_owner = entity_by_code.get(entity.get('code'))
+            if entity_type == 'Shot' or (not code_owner) or code_owner.get('type') != 'Shot':
+                entity_by_code[entity.get('code')] = entity
+        index.entity_by_code = entity_by_code
+
+        by_episode = dict(self.views['by_episode'])
+        by_type = dict(self.views['by_type'])
+        copied_episodes = set()
+
+        def episode_entities(episode_name):
+            if episode_name not in copied_episodes:
+                by_episode[episode_name] = dict(by_episode.get(episode_name, {}))
+                copied_episodes.add(episode_name)
+            return by_episode[episode_name]
+
+        if old_entity:
+            episode_name = old_entity.get('episode_name') or None
+            entities_by_type = episode_entities(episode_name)
+            entities_by_type[entity_type] = self.view_removed(
+                entities_by_type.get(entity_type, []), old_entity, self.view_code_key)
+            if not entities_by_type[entity_type]:
+                entities_by_type.pop(entity_type)
+            if not entities_by_type:
+                by_episode.pop(episode_name)
+                copied_episodes.discard(episode_name)
+            by_type[entity_type] = self.view_removed(
+                by_type.get(entity_type, []), old_entity, self.view_name_key)
+        if entity:
+            episode_name = entity.get('episode_name') or None
+            entities_by_type = episode_entities(episode_name)
+            entities_by_type[entity_type] = self.view_inserted(
+                entities_by_type.get(entity_type, []), entity, self.view_code_key)
+            by_type[entity_type] = self.view_inserted(
+                by_type.get(entity_type, []), entity, self.view_name_key)
+        index.views = {'by_episode': by_episode, 'by_type': by_type}
+
+        return index
+
+    @staticmethod
+    def view_code_key(entity):
+        return str(entity.get('code'))
+
+    @staticmethod
+    def view_name_key(entity):
+        return (entity.get('episode_name') or '') + ' ' + str(entity.get('code'))
+
+    @staticmethod
+    def view_position(entities, entity_key, key):
+        # first position in sorted view with key not lower than given one
+        low, high = 0, len(entities)
+        while low < high:
+            middle = (low + high) // 2
+            if key(entities[middle]) < entity_key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def view_inserted(self, entities, entity, key):
+        # copy of sorted view with entity put after ones with the same key
+        entity_key = key(entity)
+        position = self.view_position(entities, entity_key, key)
+        while position < len(entities) and key(entities[position]) == entity_key:
+            position += 1
+        return entities[:position] + [entity] + entities[position:]
+
+    def view_removed(self, entities, entity, key):
+        # copy of sorted view without entity
+        entity_key = key(entity)
+        position = self.view_position(entities, entity_key, key)
+        while position < len(entities) and key(entities[position]) == entity_key:
+            if entities[position].get('id') == entity.get('id'):
+                return entities[:position] + entities[position + 1:]
+            position += 1
+        return entities
+
+    def build_views(self, entity_ids = None):
+        # shots and assets the way new batch menu lists them:
+        # by_episode maps episode name (None for no episode) to types
+        # with entities sorted by code, by_type has entities of each type
+        # sorted by episode name and code.
+        # if entity_ids is given only those entities are included
+        by_episode = {}
+        by_type = {'Shot': [], 'Asset': []}
+        for entity_type, entities in (('Shot', self.shots), ('Asset', self.assets)):
+            for entity in entities:
+                if (entity_ids is not None) and (entity.get('id') not in entity_ids):
+                    continue
+                episode_name = entity.get('episode_name') or None
+                by_episode.setdefault(episode_name, {}).setdefault(entity_type, []).append(entity)
+                by_type[entity_type].append(entity)
+        for episode_entities in by_episode.values():
+            for entity_type, entities in episode_entities.items():
+                episode_entities[entity_type] = sorted(entities, key = self.view_code_key)
+        for entity_type, entities in by_type.items():
+            by_type[entity_type] = sorted(entities, key = self.view_name_key)
+        return {'by_episode': by_episode, 'by_type': by_type}
+
+    def episode_id_for(self, entity):
+        episode_id = self.episode_id_by_entity_id.get(entity.get('id'))
+        if episode_id:
+            return episode_id
+        if entity.get('type') == 'Shot':
+            sequence = self.sequence_by_id.get(entity.get('parent_id'))
+            if sequence:
+                return sequence.get('parent_id')
+        elif entity.get('type') == 'Asset':
+            return entity.get('source_id')
+        return None
+
+    def decorate(self, entity):
+        # sets episode id and name on shot or asset
+        episode_id = self.episode_id_for(entity)
+        episode = self.episode_by_id.get(episode_id)
+        if episode:
+            entity['episode_id'] = episode_id
+            entity['episode_name'] = episode.get('name')
+        else:
+            entity['episode_id'] = None
+            entity['episode_name'] = None
+        return entity
+
+
+class flameKitsuScheduler(object):
+    # Runs periodic connector jobs on their own threads.
+    # Waits are done on events so a job can be woken up
+    # or stopped at once, and intervals are jittered so workstations
+    # on the floor do not hit the server in lock-step.
+    # Job target may return number of seconds to wait before next run,
+    # exception raised by target makes the job back off exponentially
+
+    def __init__(self, log = None, jitter = 0.2, max_backoff = 300, idle_after = 600, idle_factor = 4):
+        self.log = log if log else (lambda message: None)
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.idle_after = idle_after
+        self.idle_factor = idle_factor
+
+        self.jobs = {}
+        self.stop_event = threading.Event()
+        self.last_activity = time.time()
+        self.random = random.Random()
+
+    def add(self, name, target, interval):
+        # interval can be a number or a function returning one
+        job = {
+            'name': name,
+            'target': target,
+            'interval': interval,
+            'wake': threading.Event(),
+            'errors': 0,
+            'thread': None
+        }
+        job['thread'] = threading.Thread(target=self.run, args=(job, ))
+        job['thread'].daemon = True
+        self.jobs[name] = job
+        job['thread'].start()
+        return job
+
+    def run(self, job):
+        # spread the first run so hosts started together drift apart
+        job['wake'].wait(self.random.uniform(0, self.get_interval(job) * self.jitter))
+
+        while not self.stop_event.is_set():
+            job['wake'].clear()
+            start = time.time()
+            result = None
+            try:
+                result = job['target']()
+                job['errors'] = 0
+            except Exception as e:
+                job['errors'] += 1
+                self.log('error in %s: %s' % (job['name'], pformat(e)))
+
+            if self.stop_event.is_set():
+                break
+            job['wake'].wait(self.next_delay(job, time.time() - start, result))
+
+    def next_delay(self, job, duration, result):
+        interval = self.get_interval(job)
+        if job['errors']:
+            delay = min(interval * (2 ** job['errors']), self.max_backoff)
+        elif isinstance(result, (int, float)) and not isinstance(result, bool):
+            return result
+        else:
+            delay = interval
+            # do not let slow server to be queried back to back
+            if duration > interval / 2:
+                delay = max(delay, duration * 2)
+            if self.is_idle():
+                delay = delay * self.idle_factor
+        return delay * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def get_interval(self, job):
+        interval = job['interval']
+        if callable(interval):
+            interval = interval()
+        return interval
+
+    def touch(self):
+        # called when artist uses Kitsu menus
+        self.last_activity = time.time()
+
+    def is_idle(self):
+        return (time.time() - self.last_activity) > self.idle_after
+
+    def wake(self, name = None):
+        for job in list(self.jobs.values()):
+            if (name is None) or (job['name'] == name):
+                job['wake'].set()
+
+    def wait(self, timeout):
+        # returns True if scheduler has been stopped
+        return self.stop_event.wait(timeout)
+
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake()
+
+    def join(self):
+        for job in list(self.jobs.values()):
+            job['thread'].join()
+
+
 class flameKitsuConnector(object):
     def __init__(self, framework):
         self.name = self.__class__.__name__
@@ -845,10 +1276,54 @@ class flameKitsuConnector(object):
 
         self.gazu_client = None
 
+        # long-lived authenticated clients used by cache loops
+        self.loop_clients = {}
+        self.loop_clients_lock = threading.RLock()
+
+        # cancelling it makes requests of loop clients to give up
+        # so shutdown and project switch do not wait for the network
+        self.loop_cancellation_token = self.gazu.client.CancellationToken()
+
+        # loops, fetch workers and menus asking for the same data
+        # at the same time share one request to the server
+        if not 'single_flight' in self.prefs_global.keys():
+            self.prefs_global['single_flight'] = True
+        try:
+            if self.prefs_global.get('single_flight'):
+                self.gazu.client.enable_single_flight()
+            else:
+                self.gazu.client.disable_single_flight()
+        except Exception as e:
+            self.log_debug(pformat(e))
+
+        # menus read projects, task types and statuses through gazu cache.
+        # cache loops refresh values they fetch so menus rarely wait
+        # for the server, and expired values are still served
+        # for gazu_cache_max_stale seconds while they are refreshed
+        if not 'gazu_cache' in self.prefs_global.keys():
+            self.prefs_global['gazu_cache'] = True
+        if not 'gazu_cache_max_stale' in self.prefs_global.keys():
+            self.prefs_global['gazu_cache_max_stale'] = 600
+        self.set_gazu_cache()
+
         # defautl values are set here
         if not 'user signed out' in self.prefs_global.keys():
             self.prefs_global['user signed out'] = False
 
+        # http transport of gazu clients.
+        # collect_pipeline_data runs 8 requests at a time
+        # so connection pools are sized to keep them all alive
+        if not self.prefs_global.get('http_pool_maxsize'):
+            self.prefs_global['http_pool_maxsize'] = 16
+        if not 'http_retries' in self.prefs_global.keys():
+            self.prefs_global['http_retries'] = 3
+        if not 'http_backoff_factor' in self.prefs_global.keys():
+            self.prefs_global['http_backoff_factor'] = 0.5
+        if not 'http_connect_timeout' in self.prefs_global.keys():
+            self.prefs_global['http_connect_timeout'] = 10
+        if not 'http_read_timeout' in self.prefs_global.keys():
+            self.prefs_global['http_read_timeout'] = 120
+
         self.user = None
         self.user_name = None
 
@@ -863,20 +1338,83 @@ class flameKitsuConnector(object):
             self.prefs['storage_root'] = default_storage_root
             self.framework.save_prefs()
 
+        if not 'delta_sync' in self.prefs_global.keys():
+            self.prefs_global['delta_sync'] = True
+        if not self.prefs_global.get('delta_sync_max_events'):
+            self.prefs_global['delta_sync_max_events'] = 1000
+
+        # event log cursors by project id used for incremental refresh
+        self.event_cursors = {}
+        self.delta_sync_supported = True
+
+        if not 'event_listener' in self.prefs_global.keys():
+            self.prefs_global['event_listener'] = True
+        if not self.prefs_global.get('event_listener_safety_interval'):
+            self.prefs_global['event_listener_safety_interval'] = 120
+
+        # events pushed by Kitsu are queued by socketio thread
+        # and applied to pipeline data by event listener loop
+        self.event_client = None
+        self.event_queue = queue.Queue()
+
+        if not self.prefs_global.get('fetch_workers'):
+            self.prefs_global['fetch_workers'] = 4
+        if not self.prefs_global.get('fetch_workers_per_host'):
+            self.prefs_global['fetch_workers_per_host'] = 4
+        # requests run at a time when assets and shots
+        # of all episodes are collected
+        if not self.prefs_global.get('fetch_concurrency'):
+            self.prefs_global['fetch_concurrency'] = 8
+
+        # fetch jobs are run by a bounded pool of worker threads
+        # sharing one client and limited per host.
+        # entities artist is looking at are served before background crawl
+        self.fetch_queue = queue.PriorityQueue()
+        self.fetch_queue_counter = itertools.count()
+        self.fetch_jobs_lock = threading.Lock()
+        self.entity_jobs = {}
+        self.host_semaphores = {}
+        self.host_semaphores_lock = threading.Lock()
+
         self.flame_project = None
         self.linked_project = None
         self.linked_project_id = None
 
+        # pipeline_data is a snapshot that is never modified in place.
+        # refreshes build a new one and swap the reference under the lock
+        # so menus always iterate over consistent lists
+        self.pipeline_data_lock = threading.RLock()
+        self.pipeline_generation = itertools.count(1)
+        # called with new snapshot each time it is published
+        self.pipeline_data_listeners = []
+
         self.init_pipeline_data()
         self.shot_code_field = shot_code_field
 
+        # last good snapshot is kept on disk so menus
+        # are populated at startup before the first refresh
+        if not 'pipeline_cache' in self.prefs_global.keys():
+            self.prefs_global['pipeline_cache'] = True
+        if not self.prefs_global.get('pipeline_cache_save_interval'):
+            self.prefs_global['pipeline_cache_save_interval'] = 60
+        self.pipeline_cache_lock = threading.Lock()
+        self.pipeline_cache_generation = None
+        self.pipeline_cache_saved_at = 0
+
         self.check_linked_project()
+        self.load_pipeline_cache()
 
         self.loops = []
         self.threads = True
-        self.loops.append(threading.Thread(target=self.cache_short_loop, args=(8, )))
-        self.loops.append(threading.Thread(target=self.cache_long_loop, args=(8, )))
-        self.loops.append(threading.Thread(target=self.cache_utility_loop, args=(1, )))
+
+        # cache refresh passes are run by scheduler
+        self.scheduler = flameKitsuScheduler(log = self.log)
+        self.scheduler.add('cache_short_loop', self.cache_short_loop, lambda: self.loop_interval(8))
+        self.scheduler.add('cache_long_loop', self.cache_long_loop, lambda: self.loop_interval(8))
+
+        self.loops.append(threading.Thread(target=self.event_listener_loop, args=(8, )))
+        for index in range(self.prefs_global.get('fetch_workers', 4)):
+            self.loops.append(threading.Thread(target=self.fetch_worker_loop, args=(index, )))
 
         for loop in self.loops:
             loop.daemon = True
@@ -898,6 +1436,7 @@ class flameKitsuConnector(object):
     def get_user(self, *args, **kwargs):
         # get saved credentials
         import base64
+        self.release_loop_clients()
         self.gazu_client = None
         self.kitsu_host = self.prefs_user.get('kitsu_host', 'http://localhost/api/')
         self.kitsu_user = self.prefs_user.get('kitsu_user', 'user@host')
@@ -908,16 +1447,8 @@ class flameKitsuConnector(object):
 
         def login(msg=True):
             try:
-                host = self.kitsu_host                
-                if not host.endswith('/api/'):
-                    if self.kitsu_host.endswith('/'):
-                        host = host + 'api/'
-                    else:
-                        host = host + '/api/'
-                elif host.endswith('/api'):
-                    host = host + ('/')
-
-                self.gazu_client = self.gazu.client.create_client(host)
+                host = self.get_api_host()
+                self.gazu_client = self.gazu.client.create_client(host, transport = self.get_transport())
                 self.gazu.log_in(self.kitsu_user, self.kitsu_pass, client = self.gazu_client)
                 self.user = self.gazu.client.get_current_user(client = self.gazu_client)
                 self.user_name = self.user.get('full_name')
@@ -964,7 +1495,139 @@ class flameKitsuConnector(object):
         except:
             return None
 
+    def get_api_host(self):
+        host = self.kitsu_host
+        if not host.endswith('/api/'):
+            if self.kitsu_host.endswith('/'):
+                host = host + 'api/'
+            else:
+                host = host + '/api/'
+        elif host.endswith('/api'):
+            host = host + ('/')
+        return host
+
+    def get_transport(self):
+        # fetch workers share one client so its pool
+        # should have a connection for each of them
+        pool_maxsize = max(
+            self.prefs_global.get('http_pool_maxsize', 16),
+            self.prefs_global.get('fetch_workers', 4) + 2)
+        return {
+            'pool_connections': 4,
+            'pool_maxsize': pool_maxsize,
+            'retries': self.prefs_global.get('http_retries', 3),
+            'backoff_factor': self.prefs_global.get('http_backoff_factor', 0.5),
+            'connect_timeout': self.prefs_global.get('http_connect_timeout', 10),
+            'read_timeout': self.prefs_global.get('http_read_timeout', 120)
+        }
+
+    def set_gazu_cache(self):
+        try:
+            if not self.prefs_global.get('gazu_cache'):
+                self.gazu.cache.disable()
+                return
+            max_stale = self.prefs_global.get('gazu_cache_max_stale', 600)
+            for function in (
+                    self.gazu.project.all_open_projects,
+                    self.gazu.project.get_project,
+                    self.gazu.task.all_task_types_for_project,
+                    self.gazu.task.all_task_statuses_for_project):
+                function.set_cache_max_stale(max_stale)
+            self.gazu.cache.enable()
+        except Exception as e:
+            self.log_debug('unable to set gazu cache: %s' % pformat(e))
+
+    def get_loop_client(self, loop_name):
+        # each cache loop keeps its own authenticated client
+        # so every pass reuses the same session with its keep-alive
+        # connections and tokens instead of logging in and out again.
+        # Expired access tokens are refreshed by gazu and we only log in
+        # again if the refresh fails with 401
+
+        if not self.user:
+            return None
+
+        host = self.get_api_host()
+        with self.loop_clients_lock:
+            loop_client = self.loop_clients.get(loop_name)
+            if loop_client:
+                if (loop_client.host == host) and (loop_client.kitsu_user == self.kitsu_user):
+                    return loop_client
+                self.release_loop_client(loop_name)
+
+            try:
+                loop_client = self.gazu.client.create_client(
+                    host,
+                    automatic_refresh_token = True,
+                    callback_not_authenticated = self.relogin_client,
+                    transport = self.get_transport()
+                )
+                loop_client.kitsu_user = self.kitsu_user
+                loop_client.relogin_in_progress = False
+                # loops always ask the server and keep gazu cache warm for menus
+                self.gazu.client.set_cache_refresh(True, client = loop_client)
+                self.gazu.client.set_cancellation_token(self.loop_cancellation_token, client = loop_client)
+                self.gazu.log_in(self.kitsu_user, self.kitsu_pass, client = loop_client)
+            except Exception as e:
+                self.log_debug('unable to log in client for %s: %s' % (loop_name, e))
+                return None
+
+            self.loop_clients[loop_name] = loop_client
+        return loop_client
+
+    def relogin_client(self, client, path):
+        # gazu calls it back when 401 is still there after token refresh.
+        # returning True makes gazu to retry the request
+        if path.strip('/') in ('auth/login', 'auth/logout'):
+            return False
+        if client.relogin_in_progress:
+            return False
+
+        client.relogin_in_progress = True
+        try:
+            self.log_debug('logging in again for %s' % path)
+            self.gazu.log_in(self.kitsu_user, self.kitsu_pass, client = client)
+            return True
+        except Exception as e:
+            self.log_debug('unable to log in again: %s' % e)
+            return False
+        finally:
+            client.relogin_in_progress = False
+
+    def release_loop_client(self, loop_name):
+        with self.loop_clients_lock:
+            loop_client = self.loop_clients.pop(loop_name, None)
+        if not loop_client:
+            return
+        loop_client.automatic_refresh_token = False
+        loop_client.callback_not_authenticated = None
+        self.gazu.client.set_cancellation_token(None, client = loop_client)
+        try:
+            self.gazu.log_out(client = loop_client)
+        except Exception as e:
+            self.log_debug('error logging out client for %s: %s' % (loop_name, e))
+        loop_client.session.close()
+
+    def cancel_loop_requests(self):
+        # requests in flight give up and loops carry on with a new token.
+        # old token is cancelled while clients are still registered with it
+        # so their sessions are closed, and then clients are moved to new one
+        with self.loop_clients_lock:
+            self.loop_cancellation_token.cancel()
+            self.loop_cancellation_token = self.gazu.client.CancellationToken()
+            for loop_client in self.loop_clients.values():
+                self.gazu.client.set_cancellation_token(self.loop_cancellation_token, client = loop_client)
+        # cancelled passes start again for the new project without backing off
+        self.scheduler.wake()
+
+    def release_loop_clients(self):
+        with self.loop_clients_lock:
+            loop_names = list(self.loop_clients.keys())
+        for loop_name in loop_names:
+            self.release_loop_client(loop_name)
+
     def clear_user(self, *args, **kwargs):
+        self.release_loop_clients()
         try:
             self.gazu.log_out(client = self.gazu_client)
         except Exception as e:
@@ -1156,201 +1819,428 @@ class flameKitsuConnector(object):
         return True
 
     def init_pipeline_data(self):
-        self.pipeline_data = {}
-        self.pipeline_data['current_project'] = {}
-        self.pipeline_data['project_tasks_for_person'] = []
-        self.pipeline_data['all_episodes_for_project'] = []
-        self.pipeline_data['all_sequences_for_project'] = []
-        self.pipeline_data['all_shots_for_project'] = []
-        self.pipeline_data['all_assets_for_project'] = []
-        self.pipeline_data['entitiy_keys'] = set()
-        self.pipeline_data['tasks_by_entity_id'] = {}
-        self.pipeline_data['preview_by_task_id'] = {}
-        self.pipeline_data['all_task_types_for_project'] = []
-        self.pipeline_data['all_task_statuses_for_project'] = []
-        self.pipeline_data['entity_by_id'] = {}
-
-    def cache_short_loop(self, timeout):
-        avg_delta = timeout / 2
-        recent_deltas = [avg_delta]*9
-        while self.threads:
-            start = time.time()                
-            
-            if (not self.user) and (not self.linked_project_id):
-                time.sleep(1)
-                continue
-
-            shortloop_gazu_client = None
+        pipeline_data = {}
+        pipeline_data['current_project'] = {}
+        pipeline_data['project_tasks_for_person'] = []
+        pipeline_data['all_episodes_for_project'] = []
+        pipeline_data['all_sequences_for_project'] = []
+        pipeline_data['all_shots_for_project'] = []
+        pipeline_data['all_assets_for_project'] = []
+        pipeline_data['entitiy_keys'] = frozenset()
+        pipeline_data['assigned_entity_ids'] = frozenset()
+        pipeline_data['assigned_tasks_by_entity_id'] = {}
+        pipeline_data['tasks_by_entity_id'] = {}
+        pipeline_data['preview_by_task_id'] = {}
+        pipeline_data['all_task_types_for_project'] = []
+        pipeline_data['all_task_statuses_for_project'] = []
+        pipeline_data['entity_by_id'] = {}
+        pipeline_data['pipeline_index'] = flameKitsuPipelineIndex()
+        pipeline_data['digests'] = {}
+        with self.pipeline_data_lock:
+            pipeline_data['generation'] = next(self.pipeline_generation)
+            self.pipeline_data = pipeline_data
+        self.notify_pipeline_data_listeners(pipeline_data)
+
+    def update_pipeline_data(self, update, project_id = None):
+        # update gets a shallow copy of current snapshot and
+        # should replace rather then modify lists and dicts it changes.
+        # the copy becomes current snapshot with a new generation.
+        # if project_id is given and project has been changed meanwhile
+        # the update is dropped
+        with self.pipeline_data_lock:
+            if project_id and (project_id != self.linked_project_id):
+                return self.pipeline_data
+            pipeline_data = dict(self.pipeline_data)
+            update(pipeline_data)
+            pipeline_data['generation'] = next(self.pipeline_generation)
+            self.pipeline_data = pipeline_data
+        self.notify_pipeline_data_listeners(pipeline_data)
+        return pipeline_data
+
+    def notify_pipeline_data_listeners(self, pipeline_data):
+        for listener in list(self.pipeline_data_listeners):
             try:
-                host = self.kitsu_host
-                if not host.endswith('/api/'):
-                    if self.kitsu_host.endswith('/'):
-                        host = host + 'api/'
-                    else:
-                        host = host + '/api/'
-                elif host.endswith('/api'):
-                    host = host + ('/')
-                shortloop_gazu_client = self.gazu.client.create_client(host)
-                self.gazu.log_in(self.kitsu_user, self.kitsu_pass, client=shortloop_gazu_client)
-                # self.cache_update(shortloop_gazu_client)
+                listener(pipeline_data)
             except Exception as e:
-                self.log_debug('error soft updating cache in cache_short_loop: %s' % e)
+                self.log_debug('pipeline data listener failed: %s' % pformat(e))
+
+    def pipeline_cache_path(self, project_id):
+        # one cache file per Kitsu host and project
+        import hashlib
+
+        host_hash = hashlib.sha1(self.get_api_host().encode('utf-8')).hexdigest()[:12]
+        return os.path.join(
+            self.framework.prefs_folder,
+            self.framework.bundle_name + '.' + host_hash + '.' + str(project_id) + '.cache.json.gz')
+
+    def load_pipeline_cache(self):
+        # cache is plain gzipped json so a file put into
+        # shared prefs folder can not run any code when loaded
+        import gzip
+        import json
+
+        if not (self.prefs_global.get('pipeline_cache', True) and self.user and self.linked_project_id):
+            return False
+        project_id = self.linked_project_id
+        if self.pipeline_data.get('current_project', {}).get('id') == project_id:
+            return False
+
+        cache_file_path = self.pipeline_cache_path(project_id)
+        if not os.path.isfile(cache_file_path):
+            return False
+
+        try:
+            with gzip.open(cache_file_path, 'rt', encoding = 'utf-8') as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, EOFError, ValueError) as e:
+            self.log('unable to load pipeline cache from %s' % cache_file_path)
+            self.log_debug(pformat(e))
+            return False
+
+        if not isinstance(cache, dict):
+            return False
+        if cache.get('format') != pipeline_cache_format:
+            return False
+        if cache.get('version') != pipeline_cache_version:
+            return False
+        if cache.get('project_id') != project_id:
+            return False
+        if not isinstance(cache.get('pipeline_data'), dict):
+            return False
+
+        cached_data = {k:v for k, v in cache.get('pipeline_data', {}).items() if k in pipeline_cache_keys}
+        if cache.get('user_id') != self.user.get('id'):
+            # assigned tasks belong to someone else
+            cached_data['project_tasks_for_person'] = []
+
+        def update(data):
+            data.update(cached_data)
+            self.index_pipeline_data(data, decorated = cached_data.keys())
+
+        pipeline_data = self.update_pipeline_data(update, project_id = project_id)
+        self.pipeline_cache_generation = pipeline_data.get('generation')
+
+        # cursor saved together with snapshot lets the first
+        # short loop pass to catch up from event log
+        event_cursor = cache.get('event_cursor')
+        if isinstance(event_cursor, dict) and (project_id not in self.event_cursors.keys()):
+            self.event_cursors[project_id] = {
+                'after': event_cursor.get('after'),
+                'seen': set(event_cursor.get('seen') or [])
+            }
 
-            if self.user and shortloop_gazu_client:
+        self.log_debug('pipeline cache loaded from %s' % cache_file_path)
+        return True
+
+    def save_pipeline_cache(self, force = False):
+        import gzip
+        import json
+
+        if not (self.prefs_global.get('pipeline_cache', True) and self.user and self.linked_project_id):
+            return False
+
+        with self.pipeline_cache_lock:
+            project_id = self.linked_project_id
+            # cursor is taken before snapshot so it is never ahead of it
+            event_cursor = self.event_cursors.get(project_id)
+            pipeline_data = self.pipeline_data
+
+            if pipeline_data.get('current_project', {}).get('id') != project_id:
+                return False
+            if pipeline_data.get('generation') == self.pipeline_cache_generation:
+                return False
+            if (not force) and (time.time() - self.pipeline_cache_saved_at) < self.prefs_global.get('pipeline_cache_save_interval', 60):
+                return False
+
+            if event_cursor:
+                event_cursor = {
+                    'after': event_cursor.get('after'),
+                    'seen': sorted(event_cursor.get('seen', set()))
+                }
+
+            cache = {
+                'format': pipeline_cache_format,
+                'version': pipeline_cache_version,
+                'host': self.get_api_host(),
+                'project_id': project_id,
+                'user_id': self.user.get('id'),
+                'event_cursor': event_cursor,
+                'pipeline_data': {k: pipeline_data.get(k) for k in pipeline_cache_keys}
+            }
+
+            if not os.path.isdir(self.framework.prefs_folder):
                 try:
-                    self.pipeline_data['active_projects'] = self.gazu.project.all_open_projects(client=shortloop_gazu_client)
-                    if not self.pipeline_data['active_projects']:
-                        self.pipeline_data['active_projects'] = [{}]
-                except Exception as e:
-                    self.log(pformat(e))
+                    os.makedirs(self.framework.prefs_folder)
+                except:
+                    self.log('unable to create folder %s' % self.framework.prefs_folder)
+                    return False
 
-            if not self.linked_project_id:
-                self.log_debug('short loop: no id')
-                self.gazu.log_out(client = shortloop_gazu_client)
-                time.sleep(1)
-                continue
-            
-            active_projects = self.pipeline_data.get('active_projects')
+            cache_file_path = self.pipeline_cache_path(project_id)
+            temp_file_path = cache_file_path + '.' + str(os.getpid()) + '.tmp'
+            try:
+                with gzip.open(temp_file_path, 'wt', compresslevel = 1, encoding = 'utf-8') as cache_file:
+                    json.dump(cache, cache_file, separators = (',', ':'))
+                os.replace(temp_file_path, cache_file_path)
+            except Exception as e:
+                self.log('unable to save pipeline cache to %s' % cache_file_path)
+                self.log_debug(pformat(e))
+                try:
+                    os.remove(temp_file_path)
+                except:
+                    pass
+                return False
+
+            self.pipeline_cache_generation = pipeline_data.get('generation')
+            self.pipeline_cache_saved_at = time.time()
+            self.log_debug('pipeline cache saved to %s' % cache_file_path)
+            return True
+
+    def cache_short_loop(self):
+        # single pass, scheduled by self.scheduler
+        start = time.time()
+
+        if (not self.user) and (not self.linked_project_id):
+            return 1
+
+        shortloop_gazu_client = self.get_loop_client('cache_short_loop')
+
+        if self.user and shortloop_gazu_client:
+            # let scheduler back off if server can not be reached
+            active_projects = self.gazu.project.all_open_projects(client=shortloop_gazu_client)
+            digest = self.gazu.client.last_response_digest()
             if not active_projects:
-                self.log_debug('no active_projects')
-                self.gazu.log_out(client = shortloop_gazu_client)
-                time.sleep(1)
-                continue
+                active_projects = [{}]
+            if not (digest and self.pipeline_data.get('digests', {}).get('active_projects') == digest):
+                def update(data):
+                    data['active_projects'] = active_projects
+                    data['digests'] = dict(data.get('digests', {}), active_projects = digest)
+                self.update_pipeline_data(update)
 
-            projects_by_id = {x.get('id'):x for x in self.pipeline_data['active_projects']}
-            current_project = projects_by_id.get(self.linked_project_id)
-            
-            self.collect_pipeline_data(current_project=current_project, current_client=shortloop_gazu_client)
+        if not self.linked_project_id:
+            self.log_debug('short loop: no id')
+            return 1
+        
+        active_projects = self.pipeline_data.get('active_projects')
+        if not active_projects:
+            self.log_debug('no active_projects')
+            return 1
 
-            self.gazu.log_out(client = shortloop_gazu_client)
+        projects_by_id = {x.get('id'):x for x in active_projects}
+        current_project = projects_by_id.get(self.linked_project_id)
+        
+        self.refresh_pipeline_data(current_project=current_project, current_client=shortloop_gazu_client)
 
-            # self.preformat_common_queries()
+        # self.preformat_common_queries()
 
-            delta = time.time() - start
-            self.log_debug('cache_short_loop took %s sec' % str(delta))
+        self.save_pipeline_cache()
+        self.log_debug('cache_short_loop took %s sec' % str(time.time() - start))
 
-            last_delta = recent_deltas[len(recent_deltas) - 1]
-            recent_deltas.pop(0)
-            
-            if abs(delta - last_delta) > last_delta*3:
-                delta = last_delta*3
+    def cache_long_loop(self):
+        # single pass, scheduled by self.scheduler
+        start = time.time()
 
-            recent_deltas.append(delta)
-            avg_delta = sum(recent_deltas)/float(len(recent_deltas))
-            if avg_delta > timeout/2:
-                self.loop_timeout(avg_delta*2, start)
-            else:
-                self.loop_timeout(timeout, start)
+        if (not self.user) and (not self.linked_project_id):
+            return 1
+
+        longloop_gazu_client = self.get_loop_client('cache_long_loop')
+        if longloop_gazu_client:
+            # main job body
+            self.collect_linked_info(current_client = longloop_gazu_client)
+
+        # self.preformat_common_queries()
+
+        self.save_pipeline_cache()
+        self.log_debug('cache_long_loop took %s sec' % str(time.time() - start))
+
+    def event_listener_loop(self, timeout):
+        # Keeps socketio connection to Kitsu events open
+        # and applies pushed events to pipeline data.
+        # Connection is re-created by this loop rather then by socketio
+        # itself so it always gets fresh auth headers
 
-    def cache_long_loop(self, timeout):
-        avg_delta = timeout / 2
-        recent_deltas = [avg_delta]*9
         while self.threads:
             start = time.time()
 
-            if (not self.user) and (not self.linked_project_id):
-                time.sleep(1)
+            if not (self.prefs_global.get('event_listener') and self.user and self.linked_project_id):
+                self.disconnect_event_listener()
+                self.loop_timeout(1, start)
                 continue
 
-            longloop_gazu_client = None
+            if not self.event_listener_connected():
+                self.disconnect_event_listener()
+                self.connect_event_listener()
+                if not self.event_listener_connected():
+                    self.loop_timeout(timeout, start)
+                    continue
+
             try:
-                host = self.kitsu_host
-                if not host.endswith('/api/'):
-                    if self.kitsu_host.endswith('/'):
-                        host = host + 'api/'
-                    else:
-                        host = host + '/api/'
-                elif host.endswith('/api'):
-                    host = host + ('/')
-                longloop_gazu_client = self.gazu.client.create_client(host)
-                self.gazu.log_in(self.kitsu_user, self.kitsu_pass, client=longloop_gazu_client)
-
-                # main job body
-                for entity_key in self.pipeline_data.get('entitiy_keys'):
-                    self.collect_entity_linked_info(entity_key, current_client = longloop_gazu_client)
-                
-            except Exception as e:
-                self.log_debug('error updating cache in cache_long_loop: %s' % e)
+                events = [self.event_queue.get(timeout = 1)]
+            except queue.Empty:
+                continue
 
-            self.gazu.log_out(client = longloop_gazu_client)
-            
-            # self.preformat_common_queries()
+            # coalesce events that came together
+            while True:
+                try:
+                    events.append(self.event_queue.get_nowait())
+                except queue.Empty:
+                    break
 
-            self.log_debug('cache_long_loop took %s sec' % str(time.time() - start))
-            delta = time.time() - start
-            last_delta = recent_deltas[len(recent_deltas) - 1]
-            recent_deltas.pop(0)
-            
-            if abs(delta - last_delta) > last_delta*3:
-                delta = last_delta*3
+            self.log_debug('applying %s pushed events' % len(events))
+            listener_gazu_client = self.get_loop_client('event_listener')
+            if not (listener_gazu_client and self.apply_pipeline_events(events, listener_gazu_client)):
+                # let the short loop to do full refresh
+                self.event_cursors.pop(self.linked_project_id, None)
+                self.scheduler.wake('cache_short_loop')
 
-            recent_deltas.append(delta)
-            avg_delta = sum(recent_deltas)/float(len(recent_deltas))
-            if avg_delta > timeout/2:
-                self.loop_timeout(avg_delta*2, start)
-            else:
-                self.loop_timeout(timeout, start)
+        self.disconnect_event_listener()
 
-    def cache_utility_loop(self, timeout):
-        while self.threads:
-            start = time.time()                
-            
-            if (not self.user) and (not self.linked_project_id):
-                time.sleep(1)
-                continue
+    def connect_event_listener(self):
+        listener_gazu_client = self.get_loop_client('event_listener')
+        if not listener_gazu_client:
+            return None
+
+        event_names = [
+            'project:update',
+            'episode:new', 'episode:update', 'episode:delete',
+            'sequence:new', 'sequence:update', 'sequence:delete',
+            'shot:new', 'shot:update', 'shot:delete',
+            'asset:new', 'asset:update', 'asset:delete',
+            'task:new', 'task:update', 'task:delete',
+            'task:assign', 'task:unassign', 'task:status-changed',
+            'preview-file:new', 'preview-file:update', 'preview-file:add-file',
+            'task-type:new', 'task-type:update',
+            'task-status:new', 'task-status:update'
+        ]
+
+        def listener(event_name):
+            def handler(data):
+                if not isinstance(data, dict):
+                    data = {}
+                project_id = data.get('project_id')
+                if project_id and (project_id != self.linked_project_id):
+                    return
+                self.event_queue.put({'name': event_name, 'data': data})
+            return handler
+
+        try:
+            # events are served from server root rather then from api
+            self.gazu.client.set_event_host(
+                self.gazu.client.get_api_url_from_host(client = listener_gazu_client),
+                client = listener_gazu_client)
+            event_client = self.gazu.events.init(
+                client = listener_gazu_client,
+                ssl_verify = listener_gazu_client.session.verify,
+                reconnection = False)
+            for event_name in event_names:
+                self.gazu.events.add_listener(event_client, event_name, listener(event_name))
+        except Exception as e:
+            self.log_debug('unable to connect to Kitsu events: %s' % pformat(e))
+            return None
 
-            # pprint (self.pipeline_data['current_project'])
+        self.log_debug('listening to Kitsu events')
+        self.event_client = event_client
+        return event_client
 
-            self.loop_timeout(timeout, start)
+    def disconnect_event_listener(self):
+        event_client = self.event_client
+        self.event_client = None
+        if not event_client:
+            return
+        try:
+            event_client.disconnect()
+        except Exception as e:
+            self.log_debug('error disconnecting from Kitsu events: %s' % pformat(e))
+
+    def event_listener_connected(self):
+        event_client = self.event_client
+        if not event_client:
+            return False
+        return event_client.connected
 
     def collect_pipeline_data(self, current_project = None, current_client = None):
         if not self.linked_project_id:
             return
+        project_id = self.linked_project_id
         if not current_project:
-            current_project = {'id': self.linked_project_id}
+            current_project = {'id': project_id}
         if not current_client:
             current_client = self.gazu_client
 
-        # query requests defined as functions
+        # query requests defined as functions.
+        # they only write their own keys into results
+        # and a new snapshot is published once all of them are done.
+        # payloads with the same digest as the ones current snapshot
+        # has been built from are left out of results
+
+        results = {}
+        digests = {}
+        previous_digests = self.pipeline_data.get('digests', {})
+
+        def response_digest(parts = None):
+            # digest of the last response in this thread
+            # or of payloads fetched with several requests
+            if parts is None:
+                return self.gazu.client.last_response_digest()
+            if (not parts) or (None in parts):
+                return None
+            return '.'.join(parts)
+
+        def is_unchanged(list_name, digest):
+            if digest and previous_digests.get(list_name) == digest:
+                digests[list_name] = digest
+                return True
+            return False
 
         def get_current_project():
             try:
-                current_project = self.gazu.project.get_project(self.linked_project_id, client=current_client)
-                self.pipeline_data['current_project'] = dict(current_project)
-                self.pipeline_data['entity_by_id'][current_project.get('id')] = dict(current_project)
+                current_project = self.gazu.project.get_project(project_id, client=current_client)
+                digest = response_digest()
+                if is_unchanged('current_project', digest):
+                    return
+                results['current_project'] = dict(current_project)
+                digests['current_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
         def project_tasks_for_person():
             try:
                 all_tasks_for_person = self.gazu.task.all_tasks_for_person(self.user, client=current_client)
+                parts = [response_digest()]
                 all_tasks_for_person.extend(self.gazu.task.all_done_tasks_for_person(self.user, client=current_client))
+                parts.append(response_digest())
+                digest = response_digest(parts)
+                if is_unchanged('project_tasks_for_person', digest):
+                    return
                 project_tasks_for_person = []
                 for x in all_tasks_for_person:
-                    if x.get('project_id') == self.linked_project_id:
+                    if x.get('project_id') == project_id:
                         project_tasks_for_person.append(x)
-                self.pipeline_data['project_tasks_for_person'] = list(project_tasks_for_person)
-                for task in project_tasks_for_person:
-                    self.pipeline_data['entitiy_keys'].add((task.get('entity_type_name'), task.get('entity_id')))
+                results['project_tasks_for_person'] = list(project_tasks_for_person)
+                digests['project_tasks_for_person'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
         def all_episodes_for_project():
             try:
                 all_episodes_for_project = self.gazu.shot.all_episodes_for_project(current_project, client=current_client)
+                parts = [response_digest()]
                 if not isinstance(all_episodes_for_project, list):
                     all_episodes_for_project = []
-                                 
+
+                # assets and shots of all episodes are fetched right here
+                # rather then queued to fetch workers, so refresh asked
+                # from a menu does not wait behind the background crawl
+                episodes_content = self.fetch_episodes_content(all_episodes_for_project, current_client)
+
                 episodes = []
-                for episode in all_episodes_for_project:
-                    episode_assets = self.gazu.asset.all_assets_for_episode(episode, client=current_client)
+                for episode, (episode_assets, episode_shots, episode_parts) in zip(all_episodes_for_project, episodes_content):
+                    parts.extend(episode_parts)
                     if not isinstance(episode_assets, list):
                         episode_assets = []
                     episode_assets_by_id = {x.get('id'):x for x in episode_assets}
                     episode['assets'] = episode_assets
                     episode['assets_by_id'] = episode_assets_by_id
                     
-                    episode_shots = self.gazu.shot.all_shots_for_episode(episode, client=current_client)
                     if not isinstance(episode_shots, list):
                         episode_shots = []
                     episode_shots_by_id = {x.get('id'):x for x in episode_shots}
@@ -1359,10 +2249,11 @@ class flameKitsuConnector(object):
 
                     episodes.append(episode)
 
-                self.pipeline_data['all_episodes_for_project'] = list(episodes)
-                for entity in all_episodes_for_project:
-                    self.pipeline_data['entitiy_keys'].add((entity.get('type'), entity.get('id')))
-                    self.pipeline_data['entity_by_id'][entity.get('id')] = entity
+                digest = response_digest(parts)
+                if is_unchanged('all_episodes_for_project', digest):
+                    return
+                results['all_episodes_for_project'] = list(episodes)
+                digests['all_episodes_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
@@ -1370,6 +2261,9 @@ class flameKitsuConnector(object):
             try:
                 assets_with_modified_code = []
                 all_assets_for_project = self.gazu.asset.all_assets_for_project(current_project, client=current_client)
+                digest = response_digest()
+                if is_unchanged('all_assets_for_project', digest):
+                    return
                 
                 for asset in all_assets_for_project:
                     asset['code'] = asset['name']
@@ -1381,38 +2275,8 @@ class flameKitsuConnector(object):
                                 asset['code'] = code
                     assets_with_modified_code.append(asset)
 
-                episodes = self.connector.pipeline_data.get('all_episodes_for_project')
-                episodes_by_id = {x.get('id'):x for x in episodes}
-                episode_id_by_entity_id = {}
-                for episode in episodes:
-                    episode_id = episode.get('id')
-                    if not episode_id:
-                        continue
-                    episode_assets_by_id = episode.get('assets_by_id')
-                    if not episode_assets_by_id:
-                        episode_assets_by_id = {}
-                    for asset_id in episode_assets_by_id.keys():
-                        episode_id_by_entity_id[asset_id] = episode_id
-                    episode_shots_by_id = episode.get('shots_by_id')
-                    if not episode_shots_by_id:
-                        episode_shots_by_id = {}
-                    for shot_id in episode_shots_by_id.keys():
-                        episode_id_by_entity_id[shot_id] = episode_id
-                for asset in assets_with_modified_code:
-                    asset_episode_id = episode_id_by_entity_id.get(asset.get('id'))
-                    asset_episode_name = None
-                    if asset_episode_id:
-                        asset_episode = episodes_by_id.get(asset_episode_id)
-                        if asset_episode:
-                            asset_episode_name = asset_episode.get('name')
-                    asset['episode_id'] = asset_episode_id
-                    asset['episode_name'] = asset_episode_name
-
-                
-                self.pipeline_data['all_assets_for_project'] = list(assets_with_modified_code)
-                for entity in assets_with_modified_code:
-                    self.pipeline_data['entitiy_keys'].add((entity.get('type'), entity.get('id')))
-                    self.pipeline_data['entity_by_id'][entity.get('id')] = entity
+                results['all_assets_for_project'] = list(assets_with_modified_code)
+                digests['all_assets_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
@@ -1420,6 +2284,9 @@ class flameKitsuConnector(object):
             try:
                 shots_with_modified_code = []
                 all_shots_for_project = self.gazu.shot.all_shots_for_project(current_project, client=current_client)
+                digest = response_digest()
+                if is_unchanged('all_shots_for_project', digest):
+                    return
                 for shot in all_shots_for_project:
                     shot['code'] = shot['name']
                     if self.shot_code_field:
@@ -1429,63 +2296,42 @@ class flameKitsuConnector(object):
                             if code:
                                 shot['code'] = code
                     shots_with_modified_code.append(shot)
-            
-                episodes = self.connector.pipeline_data.get('all_episodes_for_project')
-                episodes_by_id = {x.get('id'):x for x in episodes}
-                episode_id_by_entity_id = {}
-                for episode in episodes:
-                    episode_id = episode.get('id')
-                    if not episode_id:
-                        continue
-                    episode_assets_by_id = episode.get('assets_by_id')
-                    if not episode_assets_by_id:
-                        episode_assets_by_id = {}
-                    for asset_id in episode_assets_by_id.keys():
-                        episode_id_by_entity_id[asset_id] = episode_id
-                    episode_shots_by_id = episode.get('shots_by_id')
-                    if not episode_shots_by_id:
-                        episode_shots_by_id = {}
-                    for shot_id in episode_shots_by_id.keys():
-                        episode_id_by_entity_id[shot_id] = episode_id
 
-                for shot in shots_with_modified_code:
-                    shot_episode_id = episode_id_by_entity_id.get(shot.get('id'))
-                    shot_episode_name = None
-                    if shot_episode_id:
-                        shot_episode = episodes_by_id.get(shot_episode_id)
-                        if shot_episode:
-                            shot_episode_name = shot_episode.get('name')
-                    shot['episode_id'] = shot_episode_id
-                    shot['episode_name'] = shot_episode_name
-
-                self.pipeline_data['all_shots_for_project'] = list(shots_with_modified_code)
-                for entity in shots_with_modified_code:
-                    self.pipeline_data['entitiy_keys'].add((entity.get('type'), entity.get('id')))
-                    self.pipeline_data['entity_by_id'][entity.get('id')] = entity
+                results['all_shots_for_project'] = list(shots_with_modified_code)
+                digests['all_shots_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
         def all_sequences_for_project():
             try:
                 all_sequences_for_project = self.gazu.shot.all_sequences_for_project(current_project, client=current_client)
-                self.pipeline_data['all_sequences_for_project'] = list(all_sequences_for_project)
-                for entity in all_sequences_for_project:
-                    self.pipeline_data['entitiy_keys'].add((entity.get('type'), entity.get('id')))
-                    self.pipeline_data['entity_by_id'][entity.get('id')] = entity
+                digest = response_digest()
+                if is_unchanged('all_sequences_for_project', digest):
+                    return
+                results['all_sequences_for_project'] = list(all_sequences_for_project)
+                digests['all_sequences_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
         def all_task_types_for_project():
             try:
-                all_task_types_for_project = self.connector.gazu.task.all_task_types_for_project(current_project, client=current_client)
-                self.pipeline_data['all_task_types_for_project'] = list(all_task_types_for_project)
+                all_task_types_for_project = self.gazu.task.all_task_types_for_project(current_project, client=current_client)
+                digest = response_digest()
+                if is_unchanged('all_task_types_for_project', digest):
+                    return
+                results['all_task_types_for_project'] = list(all_task_types_for_project)
+                digests['all_task_types_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
         def all_task_statuses_for_project():
             try:
-                all_task_types_for_project = self.connector.gazu.task.all_task_statuses_for_project(current_project, client=current_client)
-                self.pipeline_data['all_task_statuses_for_project'] = list(all_task_types_for_project)
+                all_task_types_for_project = self.gazu.task.all_task_statuses_for_project(current_project, client=current_client)
+                digest = response_digest()
+                if is_unchanged('all_task_statuses_for_project', digest):
+                    return
+                results['all_task_statuses_for_project'] = list(all_task_types_for_project)
+                digests['all_task_statuses_for_project'] = digest
             except Exception as e:
                 self.log(pformat(e))
 
@@ -1506,81 +2352,791 @@ class flameKitsuConnector(object):
         for request in requests:
             request.join()
 
-        # this block is to add episode id and name to shot or asset
-        episodes = self.connector.pipeline_data.get('all_episodes_for_project')
-        episodes_by_id = {x.get('id'):x for x in episodes}
-        episode_id_by_entity_id = {}
+        if not results:
+            # nothing changed or nothing could be downloaded
+            return
+
+        def update(data):
+            # lists that failed to download or did not change
+            # keep their previous values
+            data.update(results)
+            data['digests'] = dict(data.get('digests', {}), **digests)
+            self.index_pipeline_data(data, decorated = results.keys())
+
+        self.update_pipeline_data(update, project_id = project_id)
+
+    def fetch_episodes_content(self, episodes, current_client):
+        # assets, shots and digests of their payloads for each episode.
+        # gazu.aio runs them concurrently with a bounded number
+        # of requests at a time, without it they go one by one
+        aio = getattr(self.gazu, 'aio', None)
+        if aio:
+            return aio.run(aio.gather(
+                [self.episode_content(episode, current_client) for episode in episodes],
+                concurrency = self.prefs_global.get('fetch_concurrency', 8)
+            ))
+
+        episodes_content = []
         for episode in episodes:
-            episode_id = episode.get('id')
-            if not episode_id:
+            episode_assets = self.gazu.asset.all_assets_for_episode(episode, client = current_client)
+            assets_digest = self.gazu.client.last_response_digest()
+            episode_shots = self.gazu.shot.all_shots_for_episode(episode, client = current_client)
+            shots_digest = self.gazu.client.last_response_digest()
+            episodes_content.append((episode_assets, episode_shots, [assets_digest, shots_digest]))
+        return episodes_content
+
+    async def episode_content(self, episode, current_client):
+        episode_assets = await self.gazu.aio.all_assets_for_episode(episode, client = current_client)
+        assets_digest = self.gazu.aio.last_response_digest()
+        episode_shots = await self.gazu.aio.all_shots_for_episode(episode, client = current_client)
+        shots_digest = self.gazu.aio.last_response_digest()
+        return episode_assets, episode_shots, [assets_digest, shots_digest]
+
+    def index_pipeline_data(self, data, decorated = ()):
+        # rebuilds entity maps and index of a snapshot copy
+        # from its lists. shots and assets not in decorated
+        # are copied as they are shared with older snapshots
+
+        # this block is to add episode id and name to shot or asset.
+        previous_index = data['pipeline_index']
+        pipeline_index = previous_index.updated(
+            episodes = data.get('all_episodes_for_project'),
+            sequences = data.get('all_sequences_for_project')
+        )
+        joins_changed = (
+            (pipeline_index.episode_by_id is not previous_index.episode_by_id) or
+            (pipeline_index.sequence_by_id is not previous_index.sequence_by_id))
+        for list_name in ('all_assets_for_project', 'all_shots_for_project'):
+            if list_name in decorated:
+                entities = data.get(list_name)
+            elif joins_changed:
+                entities = [dict(x) for x in data.get(list_name)]
+            else:
+                # already decorated from the same episodes and sequences
+                continue
+            for entity in entities:
+                pipeline_index.decorate(entity)
+            data[list_name] = entities
+        data['pipeline_index'] = pipeline_index.updated(
+            shots = data.get('all_shots_for_project'),
+            assets = data.get('all_assets_for_project')
+        )
+
+        entitiy_keys = set()
+        entity_by_id = {}
+        if data.get('current_project'):
+            entity_by_id[data['current_project'].get('id')] = data['current_project']
+        for list_name in (
+            'all_episodes_for_project',
+            'all_assets_for_project',
+            'all_shots_for_project',
+            'all_sequences_for_project'):
+            for entity in data.get(list_name):
+                entitiy_keys.add((entity.get('type'), entity.get('id')))
+                entity_by_id[entity.get('id')] = entity
+        for task in data.get('project_tasks_for_person'):
+            entitiy_keys.add((task.get('entity_type_name'), task.get('entity_id')))
+        data['entitiy_keys'] = frozenset(entitiy_keys)
+        data['entity_by_id'] = entity_by_id
+        self.index_assigned_tasks(data)
+        self.update_entity_views(data)
+
+    def index_assigned_tasks(self, data):
+        # tasks assigned to current user by entity id,
+        # kept along with project_tasks_for_person
+        assigned_tasks_by_entity_id = {}
+        for task in data.get('project_tasks_for_person') or []:
+            assigned_tasks_by_entity_id.setdefault(task.get('entity_id'), []).append(task)
+        data['assigned_tasks_by_entity_id'] = assigned_tasks_by_entity_id
+        data['assigned_entity_ids'] = frozenset(assigned_tasks_by_entity_id.keys())
+
+    def update_entity_views(self, data):
+        # views of entities assigned to current user are built again
+        # only if assigned entities or views of the whole project have changed
+        views = data['pipeline_index'].views
+        entity_ids = data.get('assigned_entity_ids') or frozenset()
+        assigned_views = data.get('assigned_entity_views')
+        if assigned_views:
+            if assigned_views.get('views') is views and assigned_views.get('entity_ids') == entity_ids:
+                return
+        if entity_ids:
+            user_views = data['pipeline_index'].build_views(entity_ids)
+        else:
+            # nothing assigned, menus only offer to create new entities
+            user_views = {'by_episode': {}, 'by_type': {}}
+        data['assigned_entity_views'] = {
+            'views': views,
+            'entity_ids': entity_ids,
+            'user_views': user_views
+        }
+
+    def get_entity_views(self, user_only = False, pipeline_data = None):
+        # sorted and grouped shots and assets, see build_views
+        if not pipeline_data:
+            pipeline_data = self.pipeline_data
+        if user_only:
+            assigned_views = pipeline_data.get('assigned_entity_views')
+            if not assigned_views:
+                return {'by_episode': {}, 'by_type': {}}
+            return assigned_views.get('user_views')
+        return pipeline_data['pipeline_index'].views
+
+    def refresh_pipeline_data(self, current_project = None, current_client = None):
+        # Full pipeline data download only happens on first load,
+        # after project change or when event log gap is too big to catch up.
+        # Otherwise only entities named in new events are re-fetched
+
+        project_id = self.linked_project_id
+        if not project_id:
+            return
+        if not current_client:
+            current_client = self.gazu_client
+
+        if not (self.prefs_global.get('delta_sync', True) and self.delta_sync_supported):
+            self.collect_pipeline_data(current_project=current_project, current_client=current_client)
+            return
+
+        project_loaded = self.pipeline_data.get('current_project', {}).get('id') == project_id
+        if project_loaded and self.event_cursors.get(project_id):
+            if self.sync_pipeline_data(project_id, current_client):
+                return
+
+        # take the cursor before full download so events
+        # happened during the download are picked up next time
+        cursor = self.get_event_cursor(project_id, current_client)
+        self.collect_pipeline_data(current_project=current_project, current_client=current_client)
+        if cursor:
+            self.event_cursors[project_id] = cursor
+        else:
+            self.event_cursors.pop(project_id, None)
+
+    def get_event_cursor(self, project_id, current_client):
+        try:
+            events = self.gazu.sync.get_last_events(
+                page_size = 1,
+                project = {'id': project_id},
+                client = current_client)
+        except self.gazu.exception.NotAllowedException:
+            self.log('event log is not avaliable for current user, using full refresh')
+            self.delta_sync_supported = False
+            return None
+        except Exception as e:
+            self.log_debug('unable to get event log cursor: %s' % pformat(e))
+            return None
+
+        if not events:
+            return {'after': '1970-01-01T00:00:00', 'seen': set()}
+        return self.event_cursor_from(events)
+
+    def event_cursor_from(self, events, cursor = None):
+        # gazu only accepts dates with seconds precision
+        # so ids of events within the last second are kept
+        # in order to skip them next time
+        if not cursor:
+            cursor = {'after': '1970-01-01T00:00:00', 'seen': set()}
+        after = cursor.get('after')
+        seen = set(cursor.get('seen', set()))
+        for event in events:
+            created_at = str(event.get('created_at', ''))[:19]
+            if created_at > after:
+                after = created_at
+                seen = set()
+            if created_at == after:
+                seen.add(event.get('id'))
+        return {'after': after, 'seen': seen}
+
+    def sync_pipeline_data(self, project_id, current_client):
+        # returns False if full refresh is needed
+        cursor = self.event_cursors.get(project_id)
+        max_events = self.prefs_global.get('delta_sync_max_events', 1000)
+
+        try:
+            events = self.gazu.sync.get_last_events(
+                page_size = max_events,
+                project = {'id': project_id},
+                after = cursor.get('after'),
+                client = current_client)
+        except Exception as e:
+            self.log_debug('unable to get events from event log: %s' % pformat(e))
+            return False
+
+        if not isinstance(events, list):
+            return False
+        if len(events) >= max_events:
+            self.log_debug('event log gap is too big, doing full refresh')
+            return False
+
+        events = [x for x in events if x.get('id') not in cursor.get('seen', set())]
+        events = sorted(events, key = lambda x: str(x.get('created_at', '')))
+        if not events:
+            return True
+
+        self.log_debug('applying %s new events' % len(events))
+        if not self.apply_pipeline_events(events, current_client):
+            return False
+
+        self.event_cursors[project_id] = self.event_cursor_from(events, cursor)
+        return True
+
+    def apply_pipeline_events(self, events, current_client):
+        # patches pipeline_data with entities re-fetched for given events.
+        # returns False if full refresh is needed
+
+        entities_to_update = {}
+        entities_to_delete = {}
+        lists_to_update = set()
+        preview_task_ids = set()
+
+        for event in events:
+            name = event.get('name', '')
+            data = event.get('data')
+            if not isinstance(data, dict):
+                data = {}
+            model, _, action = name.partition(':')
+
+            if model in ('shot', 'asset', 'sequence', 'task'):
+                entity_id = data.get(model + '_id')
+                if not entity_id:
+                    continue
+                if action == 'delete':
+                    entities_to_update.get(model, {}).pop(entity_id, None)
+                    entities_to_delete.setdefault(model, set()).add(entity_id)
+                else:
+                    entities_to_delete.get(model, set()).discard(entity_id)
+                    entities_to_update.setdefault(model, {})[entity_id] = True
+            elif model == 'preview-file':
+                if data.get('task_id'):
+                    preview_task_ids.add(data.get('task_id'))
+                elif data.get('preview_file_id'):
+                    try:
+                        preview_file = self.gazu.files.get_preview_file(data.get('preview_file_id'), client = current_client)
+                        preview_task_ids.add(preview_file.get('task_id'))
+                    except Exception as e:
+                        self.log_debug('unable to get preview file: %s' % pformat(e))
+            elif model == 'episode':
+                # episodes carry their shots and assets lists
+                # so let full refresh to take care of it
+                return False
+            elif model in ('task-type', 'task-status', 'project'):
+                lists_to_update.add(model)
+
+        # values gazu cache may hold for changed entities are dropped
+        # so they are not served back to the fetches below
+        changed_ids = set(preview_task_ids)
+        for model in entities_to_update.keys():
+            changed_ids.update(entities_to_update[model].keys())
+        for model in entities_to_delete.keys():
+            changed_ids.update(entities_to_delete[model])
+        if lists_to_update:
+            changed_ids.add(self.linked_project_id)
+        self.invalidate_cached(changed_ids, client = current_client)
+
+        # everything is fetched first and then applied
+        # to pipeline data as a single snapshot update
+
+        project_id = self.linked_project_id
+        fetched = {}
+        sequences = []
+        shots = []
+        assets = []
+        tasks = []
+        preview_by_task_id = {}
+
+        try:
+            if 'project' in lists_to_update:
+                fetched['current_project'] = dict(self.gazu.project.get_project(project_id, client=current_client))
+            if 'task-type' in lists_to_update:
+                fetched['all_task_types_for_project'] = list(
+                    self.gazu.task.all_task_types_for_project({'id': project_id}, client=current_client))
+            if 'task-status' in lists_to_update:
+                fetched['all_task_statuses_for_project'] = list(
+                    self.gazu.task.all_task_statuses_for_project({'id': project_id}, client=current_client))
+
+            # changed entities of each kind come with a few requests.
+            # ids missing from results have been deleted meanwhile
+            # and their delete events are coming next
+
+            sequence_ids = list(entities_to_update.get('sequence', {}).keys())
+            if sequence_ids:
+                for sequence in self.gazu.shot.get_sequences(sequence_ids, client = current_client).values():
+                    sequence['type'] = 'Sequence'
+                    sequences.append(sequence)
+
+            shot_ids = list(entities_to_update.get('shot', {}).keys())
+            if shot_ids:
+                for shot in self.gazu.shot.get_shots(shot_ids, client = current_client).values():
+                    shot['type'] = 'Shot'
+                    shots.append(shot)
+
+            asset_ids = list(entities_to_update.get('asset', {}).keys())
+            if asset_ids:
+                for asset in self.gazu.asset.get_assets(asset_ids, client = current_client).values():
+                    asset['type'] = 'Asset'
+                    assets.append(asset)
+
+            task_ids = list(entities_to_update.get('task', {}).keys())
+            if task_ids:
+                for task in self.gazu.task.get_tasks(task_ids, client = current_client).values():
+                    tasks.append(self.flatten_pipeline_task(task))
+
+            preview_task_ids = [x for x in preview_task_ids if x]
+            if preview_task_ids:
+                preview_by_task_id = self.gazu.files.get_preview_files_for_tasks(
+                    preview_task_ids,
+                    client = current_client)
+
+        except Exception as e:
+            self.log_debug('error applying events: %s' % pformat(e))
+            return False
+
+        def update(data):
+            data.update(fetched)
+            # patched lists no longer match payloads their digests were taken from
+            data['digests'] = {}
+            if fetched.get('current_project'):
+                entity_by_id = dict(data.get('entity_by_id'))
+                entity_by_id[fetched['current_project'].get('id')] = fetched['current_project']
+                data['entity_by_id'] = entity_by_id
+
+            for sequence in sequences:
+                self.patch_pipeline_entity(data, 'all_sequences_for_project', sequence)
+            for sequence_id in entities_to_delete.get('sequence', set()):
+                self.remove_pipeline_entity(data, 'all_sequences_for_project', 'Sequence', sequence_id)
+
+            for shot in shots:
+                self.patch_pipeline_entity(data, 'all_shots_for_project', self.decorate_pipeline_entity(data, shot))
+            for shot_id in entities_to_delete.get('shot', set()):
+                self.remove_pipeline_entity(data, 'all_shots_for_project', 'Shot', shot_id)
+
+            for asset in assets:
+                self.patch_pipeline_entity(data, 'all_assets_for_project', self.decorate_pipeline_entity(data, asset))
+            for asset_id in entities_to_delete.get('asset', set()):
+                self.remove_pipeline_entity(data, 'all_assets_for_project', 'Asset', asset_id)
+
+            task_lookups = self.pipeline_task_lookups(data)
+            for task in tasks:
+                self.patch_pipeline_task(data, task, task_lookups)
+            for task_id in entities_to_delete.get('task', set()):
+                self.remove_pipeline_task(data, task_id)
+
+            if preview_by_task_id:
+                data['preview_by_task_id'] = dict(data.get('preview_by_task_id'), **preview_by_task_id)
+
+            self.update_entity_views(data)
+
+        self.update_pipeline_data(update, project_id = project_id)
+        return True
+
+    def invalidate_cached(self, model_ids, client = None):
+        # drops values gazu cache keeps for given models.
+        # only values cached for current user are affected
+        if not client:
+            client = self.gazu_client
+        for model_id in model_ids:
+            if not model_id:
                 continue
-            episode_assets_by_id = episode.get('assets_by_id')
-            if not episode_assets_by_id:
-                episode_assets_by_id = {}
-            for asset_id in episode_assets_by_id.keys():
-                episode_id_by_entity_id[asset_id] = episode_id
-            episode_shots_by_id = episode.get('shots_by_id')
-            if not episode_shots_by_id:
-                episode_shots_by_id = {}
-            for shot_id in episode_shots_by_id.keys():
-                episode_id_by_entity_id[shot_id] = episode_id
-        for asset in self.connector.pipeline_data.get('all_assets_for_project'):
-            asset_episode_id = episode_id_by_entity_id.get(asset.get('id'))
-            asset_episode_name = None
-            if asset_episode_id:
-                asset_episode = episodes_by_id.get(asset_episode_id)
-                if asset_episode:
-                    asset_episode_name = asset_episode.get('name')
-            asset['episode_id'] = asset_episode_id
-            asset['episode_name'] = asset_episode_name
-        for shot in self.connector.pipeline_data.get('all_shots_for_project'):
-            shot_episode_id = episode_id_by_entity_id.get(shot.get('id'))
-            shot_episode_name = None
-            if shot_episode_id:
-                shot_episode = episodes_by_id.get(shot_episode_id)
-                if shot_episode:
-                    shot_episode_name = shot_episode.get('name')
-            shot['episode_id'] = shot_episode_id
-            shot['episode_name'] = shot_episode_name
+            try:
+                self.gazu.cache.invalidate(model_id, client = client)
+            except Exception as e:
+                self.log_debug('unable to invalidate cached values: %s' % pformat(e))
+
+    def decorate_pipeline_entity(self, data, entity):
+        # sets code and episode fields on shot or asset
+        # the same way collect_pipeline_data does
+        entity['code'] = entity.get('name')
+        if self.shot_code_field:
+            entity_data = entity.get('data')
+            if entity_data:
+                code = entity_data.get(self.shot_code_field)
+                if code:
+                    entity['code'] = code
+
+        return data['pipeline_index'].decorate(entity)
+
+    # patch and remove methods below are given a snapshot copy
+    # from update_pipeline_data and replace containers they change
+
+    def patch_pipeline_entity(self, data, list_name, entity):
+        entity_id = entity.get('id')
+        entities = [x for x in data.get(list_name, []) if x.get('id') != entity_id]
+        entities.append(entity)
+        data[list_name] = entities
+        data['entitiy_keys'] = data['entitiy_keys'] | {(entity.get('type'), entity_id)}
+        data['entity_by_id'] = dict(data['entity_by_id'])
+        data['entity_by_id'][entity_id] = entity
+        self.update_pipeline_index(data, list_name, entity_id, entity)
+
+    def remove_pipeline_entity(self, data, list_name, entity_type, entity_id):
+        data[list_name] = [x for x in data.get(list_name, []) if x.get('id') != entity_id]
+        data['entitiy_keys'] = data['entitiy_keys'] - {(entity_type, entity_id)}
+        data['entity_by_id'] = {k:v for k, v in data['entity_by_id'].items() if k != entity_id}
+        data['tasks_by_entity_id'] = {k:v for k, v in data['tasks_by_entity_id'].items() if k != entity_id}
+        self.update_pipeline_index(data, list_name, entity_id)
+
+    def update_pipeline_index(self, data, list_name, entity_id, entity = None):
+        # shots and assets are patched into the index one by one,
+        # sequences map is cheap enough to be built again
+        entity_types = {
+            'all_shots_for_project': 'Shot',
+            'all_assets_for_project': 'Asset'
+        }
+        if list_name in entity_types.keys():
+            data['pipeline_index'] = data['pipeline_index'].patched(
+                entity_types[list_name], entity_id, data.get(list_name), entity)
+        elif list_name == 'all_sequences_for_project':
+            data['pipeline_index'] = data['pipeline_index'].updated(sequences = data.get(list_name))
+
+    def flatten_pipeline_task(self, task):
+        # task comes from task route and has nested dicts
+        # instead of flat names found in entity and person task lists
+        for key in ('task_type', 'task_status', 'entity_type'):
+            if isinstance(task.get(key), dict):
+                task[key + '_name'] = task.get(key).get('name')
+        if isinstance(task.get('entity'), dict):
+            task['entity_name'] = task.get('entity').get('name')
+        for key in ('task_type', 'task_status', 'entity_type', 'entity', 'project', 'persons', 'assigner'):
+            if isinstance(task.get(key), (dict, list)):
+                task.pop(key)
+        return task
+
+    def patch_pipeline_task(self, data, task, task_lookups = None):
+        task_id = task.get('id')
+        self.decorate_pipeline_task(task, data, task_lookups)
+
+        entity_id = task.get('entity_id')
+        if entity_id in data['tasks_by_entity_id'].keys():
+            entity_tasks = [x for x in data['tasks_by_entity_id'].get(entity_id) if x.get('id') != task_id]
+            entity_tasks.append(task)
+            data['tasks_by_entity_id'] = dict(data['tasks_by_entity_id'])
+            data['tasks_by_entity_id'][entity_id] = entity_tasks
+
+        user_id = None
+        if self.user:
+            user_id = self.user.get('id')
+        project_tasks_for_person = [x for x in data.get('project_tasks_for_person', []) if x.get('id') != task_id]
+        if user_id in task.get('assignees', []):
+            project_tasks_for_person.append(task)
+            data['entitiy_keys'] = data['entitiy_keys'] | {(task.get('entity_type_name'), entity_id)}
+            self.patch_assigned_tasks(data, task_id, task)
+        else:
+            self.patch_assigned_tasks(data, task_id)
+        data['project_tasks_for_person'] = project_tasks_for_person
+
+    def remove_pipeline_task(self, data, task_id):
+        tasks_by_entity_id = dict(data['tasks_by_entity_id'])
+        for entity_id in list(tasks_by_entity_id.keys()):
+            entity_tasks = tasks_by_entity_id.get(entity_id, [])
+            if any(x.get('id') == task_id for x in entity_tasks):
+                tasks_by_entity_id[entity_id] = [x for x in entity_tasks if x.get('id') != task_id]
+        data['tasks_by_entity_id'] = tasks_by_entity_id
+        data['project_tasks_for_person'] = [x for x in data.get('project_tasks_for_person', []) if x.get('id') != task_id]
+        self.patch_assigned_tasks(data, task_id)
+        data['preview_by_task_id'] = {k:v for k, v in data['preview_by_task_id'].items() if k != task_id}
+
+    def patch_assigned_tasks(self, data, task_id, task = None):
+        # drops task with given id from assigned tasks index
+        # and puts given task in its place if it is still assigned
+        assigned_tasks_by_entity_id = dict(data.get('assigned_tasks_by_entity_id') or {})
+        for entity_id in list(assigned_tasks_by_entity_id.keys()):
+            entity_tasks = assigned_tasks_by_entity_id.get(entity_id)
+            if any(x.get('id') == task_id for x in entity_tasks):
+                entity_tasks = [x for x in entity_tasks if x.get('id') != task_id]
+                if entity_tasks:
+                    assigned_tasks_by_entity_id[entity_id] = entity_tasks
+                else:
+                    del assigned_tasks_by_entity_id[entity_id]
+        if task:
+            entity_id = task.get('entity_id')
+            assigned_tasks_by_entity_id[entity_id] = assigned_tasks_by_entity_id.get(entity_id, []) + [task]
+        data['assigned_tasks_by_entity_id'] = assigned_tasks_by_entity_id
+        data['assigned_entity_ids'] = frozenset(assigned_tasks_by_entity_id.keys())
+
+    def collect_linked_info(self, current_client = None):
+        # tasks for all project entities come in one request
+        # and preview files are fetched per task by fetch workers
+
+        if not self.linked_project_id:
+            return
+        project_id = self.linked_project_id
+        if not current_client:
+            current_client = self.gazu_client
+
+        # tasks are decoded while they are downloaded
+        # so the whole response body is never held in memory.
+        # only ids are kept of tasks that may have previews
+        pipeline_data = self.pipeline_data
+        task_lookups = self.pipeline_task_lookups(pipeline_data)
+        tasks_by_entity_id = {}
+        preview_task_ids = []
+        preview_by_task_id = {}
+        try:
+            for task in self.gazu.task.iter_tasks_for_project({'id': project_id}, client = current_client):
+                self.decorate_pipeline_task(task, pipeline_data, task_lookups)
+                tasks_by_entity_id.setdefault(task.get('entity_id'), []).append(task)
+                task_id = task.get('id')
+                if ('last_preview_file_id' in task.keys()) and (not task.get('last_preview_file_id')):
+                    # nothing has been uploaded to this task yet
+                    preview_by_task_id[task_id] = []
+                else:
+                    preview_task_ids.append(task_id)
+        except (self.gazu.exception.RouteNotFoundException, self.gazu.exception.NotAllowedException) as e:
+            # older servers and restricted users can not list tasks
+            # of the whole project, other errors are left to scheduler
+            # so the pass is retried rather then fanned out per entity
+            self.log_debug('unable to get tasks for project, fetching tasks by entity: %s' % pformat(e))
+            jobs = []
+            for entity_key in self.pipeline_data.get('entitiy_keys'):
+                jobs.append(self.entity_linked_info_job(entity_key))
+            self.run_fetch_jobs(jobs)
+            return
+
+        for entity_id in tasks_by_entity_id.keys():
+            tasks_by_entity_id[entity_id] = sorted(
+                tasks_by_entity_id[entity_id],
+                key = lambda x: str(x.get('name', '')).lower())
+
+        # project task list is complete, so entities not in it
+        # have no tasks left, including ones whose last task was deleted
+        for entity_id in pipeline_data['tasks_by_entity_id'].keys():
+            tasks_by_entity_id.setdefault(entity_id, [])
+        for entity_type, entity_id in pipeline_data.get('entitiy_keys', ()):
+            if entity_type in ('Shot', 'Asset'):
+                tasks_by_entity_id.setdefault(entity_id, [])
+
+        # previews are collected by workers, a chunk of tasks
+        # per request, and published with tasks in one update
+        chunk_size = self.prefs_global.get('fetch_chunk_size', 50)
+        jobs = []
+        for index in range(0, len(preview_task_ids), chunk_size):
+            jobs.append(self.task_previews_job(preview_task_ids[index:index + chunk_size], preview_by_task_id))
+        self.run_fetch_jobs(jobs)
+
+        # only tasks and previews that differ from current snapshot
+        # are published so unchanged passes do not rebuild menus
+        pipeline_data = self.pipeline_data
+        changed_tasks = {
+            k:v for k, v in tasks_by_entity_id.items()
+            if pipeline_data['tasks_by_entity_id'].get(k) != v}
+        changed_previews = {
+            k:v for k, v in preview_by_task_id.items()
+            if pipeline_data['preview_by_task_id'].get(k) != v}
+        if not (changed_tasks or changed_previews):
+            return
+
+        def update(data):
+            if changed_tasks:
+                data['tasks_by_entity_id'] = dict(data['tasks_by_entity_id'], **changed_tasks)
+            if changed_previews:
+                data['preview_by_task_id'] = dict(data['preview_by_task_id'], **changed_previews)
+
+        self.update_pipeline_data(update, project_id = project_id)
 
     def collect_entity_linked_info(self, entity_key, current_client = None):
         if not current_client:
             current_client = self.gazu_client
 
+        project_id = self.linked_project_id
         entity_type, entity_id = entity_key
 
         if entity_type == 'Shot':
-            shot_tasks = self.gazu.task.all_tasks_for_shot({'id': entity_id}, client = current_client)
-            self.pipeline_data['tasks_by_entity_id'][entity_id] = shot_tasks
-            for task in shot_tasks:
-                task_preview_files = self.gazu.files.get_all_preview_files_for_task(
-                    {'id': task.get('id')},
-                    client = current_client)
-                self.pipeline_data['preview_by_task_id'][task.get('id')] = task_preview_files
+            entity_tasks = self.gazu.task.all_tasks_for_shot({'id': entity_id}, client = current_client)
+        elif entity_type == 'Asset':
+            entity_tasks = self.gazu.task.all_tasks_for_asset({'id': entity_id}, client = current_client)
+        else:
+            return
+
+        preview_by_task_id = self.gazu.files.get_preview_files_for_tasks(
+            [task.get('id') for task in entity_tasks],
+            client = current_client)
+
+        def update(data):
+            data['preview_by_task_id'] = dict(data['preview_by_task_id'], **preview_by_task_id)
+            data['tasks_by_entity_id'] = dict(data['tasks_by_entity_id'])
+            data['tasks_by_entity_id'][entity_id] = entity_tasks
+
+        self.update_pipeline_data(update, project_id = project_id)
+
+    def pipeline_task_lookups(self, pipeline_data = None):
+        # task types and statuses by id, built once
+        # for all tasks decorated in one pass
+        if pipeline_data is None:
+            pipeline_data = self.pipeline_data
+        return {
+            'task_types_by_id': {x.get('id'):x for x in pipeline_data.get('all_task_types_for_project', [])},
+            'task_statuses_by_id': {x.get('id'):x for x in pipeline_data.get('all_task_statuses_for_project', [])}
+        }
+
+    def decorate_pipeline_task(self, task, pipeline_data = None, task_lookups = None):
+        # project-wide task lists only have ids
+        # so names used by menus are filled from cached lists
+        if pipeline_data is None:
+            pipeline_data = self.pipeline_data
+        if task_lookups is None:
+            task_lookups = self.pipeline_task_lookups(pipeline_data)
+        if not task.get('task_type_name'):
+            task_types_by_id = task_lookups['task_types_by_id']
+            task['task_type_name'] = task_types_by_id.get(task.get('task_type_id'), {}).get('name')
+        if not task.get('task_status_name'):
+            task_statuses_by_id = task_lookups['task_statuses_by_id']
+            task_status = task_statuses_by_id.get(task.get('task_status_id'), {})
+            task['task_status_name'] = task_status.get('name')
+            task['task_status_short_name'] = task_status.get('short_name')
+        if not task.get('entity_type_name'):
+            entity = pipeline_data.get('entity_by_id', {}).get(task.get('entity_id'), {})
+            task['entity_type_name'] = entity.get('type')
+            task['entity_name'] = entity.get('name')
+        return task
+
+    def entity_linked_info_job(self, entity_key):
+        def target(current_client):
+            self.collect_entity_linked_info(entity_key, current_client = current_client)
+        return target
+
+    def task_previews_job(self, task_ids, preview_by_task_id):
+        def target(current_client):
+            preview_by_task_id.update(self.gazu.files.get_preview_files_for_tasks(
+                task_ids,
+                client = current_client))
+        return target
+
+    def new_fetch_job(self, target, priority, key = None):
+        # jobs belong to project linked when they are queued
+        # and are skipped if another project is linked by then
+        return {
+            'target': target,
+            'priority': priority,
+            'key': key,
+            'project_id': self.linked_project_id,
+            'started': False,
+            'done': threading.Event()
+        }
+
+    def put_fetch_job(self, job):
+        # counter keeps jobs with the same priority in order
+        self.fetch_queue.put((job['priority'], next(self.fetch_queue_counter), job))
+
+    def run_fetch_jobs(self, targets, priority = fetch_priority_background):
+        # puts targets to fetch queue and waits for all of them
+        # to be done or for loops to be terminated
+        jobs = []
+        for target in targets:
+            job = self.new_fetch_job(target, priority)
+            jobs.append(job)
+            self.put_fetch_job(job)
+
+        for job in jobs:
+            while not job['done'].wait(1):
+                if not self.threads:
+                    return
+                if job['project_id'] != self.linked_project_id:
+                    return
+
+    def request_entity_linked_info(self, entity_key, priority = fetch_priority_batch):
+        # queues tasks and previews fetch for an entity or moves
+        # already queued one ahead if requested priority is higher
+        with self.fetch_jobs_lock:
+            job = self.entity_jobs.get(entity_key)
+            if job and (job['project_id'] != self.linked_project_id):
+                job = None
+            if job and (not job['done'].is_set()):
+                if (priority < job['priority']) and (not job['started']):
+                    job['priority'] = priority
+                    self.put_fetch_job(job)
+                return job
+            job = self.new_fetch_job(self.entity_linked_info_job(entity_key), priority, key = entity_key)
+            self.entity_jobs[entity_key] = job
+            self.put_fetch_job(job)
+        return job
+
+    def wait_entities_linked_info(self, entity_keys, timeout = 2):
+        # returns True if tasks and previews of all entities
+        # have been fetched within given timeout.
+        # entities are fetched in parallel and waited with one deadline
+        jobs = [self.request_entity_linked_info(x, priority = fetch_priority_menu) for x in entity_keys]
+        deadline = time.time() + timeout
+        for job in jobs:
+            if not job['done'].wait(max(0, deadline - time.time())):
+                return False
+        return True
+
+    def fetch_worker_loop(self, index):
+        while self.threads:
+            try:
+                priority, _, job = self.fetch_queue.get(timeout = 1)
+            except queue.Empty:
+                continue
+
+            with self.fetch_jobs_lock:
+                # the same job can be queued again with higher priority
+                if job['started']:
+                    continue
+                job['started'] = True
+
+            if job['project_id'] != self.linked_project_id:
+                # queued for previous project
+                with self.fetch_jobs_lock:
+                    if self.entity_jobs.get(job['key']) is job:
+                        self.entity_jobs.pop(job['key'])
+                job['done'].set()
+                continue
+
+            try:
+                fetch_gazu_client = self.get_loop_client('cache_long_loop')
+                if fetch_gazu_client:
+                    with self.get_host_semaphore(fetch_gazu_client.host):
+                        job['target'](fetch_gazu_client)
+            except Exception as e:
+                self.log_debug('error in fetch worker %s: %s' % (index, pformat(e)))
+            finally:
+                with self.fetch_jobs_lock:
+                    if self.entity_jobs.get(job['key']) is job:
+                        self.entity_jobs.pop(job['key'])
+                job['done'].set()
+
+    def get_host_semaphore(self, host):
+        with self.host_semaphores_lock:
+            if host not in self.host_semaphores.keys():
+                self.host_semaphores[host] = threading.BoundedSemaphore(
+                    self.prefs_global.get('fetch_workers_per_host', 4))
+            return self.host_semaphores[host]
 
     def terminate_loops(self):
         self.threads = False
-        
+        self.scheduler.stop()
+        self.loop_cancellation_token.cancel()
+
+        self.scheduler.join()
         for loop in self.loops:
             loop.join()
 
+        self.save_pipeline_cache(force = True)
+
+        self.release_loop_clients()
+
     def loop_timeout(self, timeout, start):
-        time_passed = int(time.time() - start)
+        time_passed = time.time() - start
         if timeout <= time_passed:
             return
-        else:
-            for n in range(int(timeout - time_passed) * 10):
-                if not self.threads:
-                    self.log_debug('leaving loop thread: %s' % inspect.currentframe().f_back.f_code.co_name)
-                    break
-                time.sleep(0.1)
+        if self.scheduler.wait(timeout - time_passed):
+            self.log_debug('leaving loop thread: %s' % inspect.currentframe().f_back.f_code.co_name)
+
+    def loop_interval(self, timeout):
+        if self.event_listener_connected():
+            # changes are pushed by Kitsu so polling is only a safety net
+            return self.prefs_global.get('event_listener_safety_interval', 120)
+        return timeout
+
+    def touch(self):
+        # artist is using Kitsu menus so keep the cache fresh
+        self.scheduler.touch()
 
     def scan_active_projects(self):
         if self.user:
             try:
-                self.pipeline_data['active_projects'] = self.gazu.project.all_open_projects(client=self.gazu_client)
-                if not self.pipeline_data['active_projects']:
-                    self.pipeline_data['active_projects'] = [{}]
+                active_projects = self.gazu.project.all_open_projects(client=self.gazu_client)
+                if not active_projects:
+                    active_projects = [{}]
+                self.update_pipeline_data(lambda data: data.update({'active_projects': active_projects}))
             except Exception as e:
                 self.log(pformat(e))
 
@@ -1614,16 +3170,21 @@ class flameMenuProjectconnect(flameMenuApp):
         
     def __getattr__(self, name):
         def method(*args, **kwargs):
-            project = self.dynamic_menu_data.get(name)
+            self.connector.touch()
+            project = self.get_menu_data(name)
             if project:
                 self.link_project(project)
         return method
     
+    def menu_inputs(self, pipeline_data):
+        return (pipeline_data.get('active_projects'), )
+
     def build_menu(self):
         if not self.flame:
             return []
 
         self.connector.linked_project = self.flame.project.current_project.shotgun_project_name.get_value()
+        self.reset_menu_callbacks()
 
         menu = {'actions': []}
 
@@ -1682,12 +3243,11 @@ class flameMenuProjectconnect(flameMenuApp):
             index = 0
             for index, project_name in enumerate(sorted(projects_by_name.keys(), key=str.casefold)):
                 project = projects_by_name.get(project_name)
-                self.dynamic_menu_data[str(id(project))] = project
 
                 menu_item = {}
                 menu_item['order'] = index + 2
                 menu_item['name'] = project_name
-                menu_item['execute'] = getattr(self, str(id(project)))
+                menu_item['execute'] = self.menu_callback('link Project ' + str(project.get('id')), project)
                 menu['actions'].append(menu_item)
             
             menu_item = {}
@@ -1728,10 +3288,12 @@ class flameMenuProjectconnect(flameMenuApp):
         self.flame.project.current_project.shotgun_project_name = ''
         self.connector.linked_project = None
         self.connector.linked_project_id = None
+        self.connector.cancel_loop_requests()
         self.connector.init_pipeline_data()
         self.rescan()
 
     def link_project(self, project):
+        self.connector.cancel_loop_requests()
         self.connector.init_pipeline_data()
         project_name = project.get('name')
         if project_name:
@@ -1739,6 +3301,7 @@ class flameMenuProjectconnect(flameMenuApp):
             self.connector.linked_project = project_name
             if 'id' in project.keys():
                 self.connector.linked_project_id = project.get('id')
+                self.connector.load_pipeline_cache()
         self.rescan()
         
     def refresh(self, *args, **kwargs):        
@@ -2975,6 +4538,7 @@ class flameMenuProjectconnect(flameMenuApp):
 
         # self.connector.cache_retrive_result(self.active_projects_uid, True)
         self.connector.collect_pipeline_data()
+        self.invalidate_menu()
 
         if self.flame:
             self.flame.execute_shortcut('Rescan Python Hooks')
@@ -3234,17 +4798,36 @@ class flameMenuNewBatch(flameMenuApp):
 
     def __getattr__(self, name):
         def method(*args, **kwargs):
+            self.connector.touch()
 
             if str(name).startswith('pg_fwd'):
                 self.page_fwd(menu_name = name.replace('pg_fwd ', ''))
             if str(name).startswith('pg_bkw'):
                 self.page_bkw(menu_name = name.replace('pg_bkw ', ''))
 
-            entity = self.dynamic_menu_data.get(name)
+            entity = self.get_menu_data(name)
             if entity:
                 self.create_new_batch(entity)
         return method
 
+    def menu_inputs(self, pipeline_data):
+        return (self.connector.get_entity_views(not self.prefs.get('show_all'), pipeline_data), )
+
+    def flame_inputs(self):
+        # menu is only shown for desktop or empty selection
+        # and lists batch groups already on the desktop
+        if not self.flame:
+            return ()
+        try:
+            selection = self.flame.media_panel.selected_entries
+            batch_groups = self.flame.project.current_project.current_workspace.desktop.batch_groups
+            return (
+                self.scope_desktop(selection) or (not selection),
+                tuple(x.name.get_value() for x in batch_groups)
+            )
+        except:
+            return ()
+
     def build_menu(self):
         '''
         # ---------------------------------
@@ -3271,12 +4854,23 @@ class flameMenuNewBatch(flameMenuApp):
         if not self.flame:
             return []
 
-        total_menu_itmes = 0
-
         batch_groups = []
         for batch_group in self.flame.project.current_project.current_workspace.desktop.batch_groups:
             batch_groups.append(batch_group.name.get_value())
 
+        menu_key = (
+            self.connector.pipeline_data.get('generation'),
+            self.connector.linked_project_id,
+            tuple(batch_groups),
+            self.prefs.get('show_all'),
+            self.prefs.get('menu_max_items_per_page'),
+            tuple((k, self.prefs.get(k)) for k in sorted(self.prefs.keys()) if k.startswith('current_page'))
+        )
+        return self.cached_menu(menu_key, lambda: self.build_entities_menu(batch_groups))
+
+    def build_entities_menu(self, batch_groups):
+        total_menu_itmes = 0
+
         menu = {'actions': [], 'hierarchy': []}
         menu['name'] = self.menu_group_name + ' Create new batch:'
         menu_item_order = 0
@@ -3302,37 +4896,10 @@ class flameMenuNewBatch(flameMenuApp):
         # found entities menu
 
         user_only = not self.prefs['show_all']
-        filter_out = ['Project', 'Sequence']
-        found_entities = self.get_entities(user_only, filter_out)
-        found_assets = found_entities.get('Asset')
-        if not found_assets:
-            found_assets = []
-        found_shots = found_entities.get('Shot')
-        if not found_shots:
-            found_shots = []
-        entities_with_no_episode = {'Shot': [], 'Asset': []}
-        found_entity_episodes = {}
-        for asset in found_assets:           
-            entity_episode_name = asset.get('episode_name')
-            if entity_episode_name:
-                if entity_episode_name not in found_entity_episodes.keys():
-                    found_entity_episodes[entity_episode_name] = {}
-                if not isinstance(found_entity_episodes[entity_episode_name].get('Asset'), list):
-                    found_entity_episodes[entity_episode_name]['Asset'] = []
-                found_entity_episodes[entity_episode_name]['Asset'].append(asset)
-            else:
-                entities_with_no_episode['Asset'].append(asset)        
-        for shot in found_shots:           
-            entity_episode_name = shot.get('episode_name')
-            if entity_episode_name:
-                if entity_episode_name not in found_entity_episodes.keys():
-                    found_entity_episodes[entity_episode_name] = {}
-                if not isinstance(found_entity_episodes[entity_episode_name].get('Shot'), list):
-                    found_entity_episodes[entity_episode_name]['Shot'] = []
-                found_entity_episodes[entity_episode_name]['Shot'].append(shot)
-            else:
-                entities_with_no_episode['Shot'].append(shot)
-        # found_entities = entities_with_no_episode
+        entity_views = self.get_entity_views(user_only)
+        found_entity_episodes = dict(entity_views['by_episode'])
+        no_episode = found_entity_episodes.pop(None, {})
+        entities_with_no_episode = {'Shot': no_episode.get('Shot', []), 'Asset': no_episode.get('Asset', [])}
 
         def build_menu_body(menu, found_entities, menu_item_order = 1):            
             menu_main_body = []
@@ -3384,20 +4951,16 @@ class flameMenuNewBatch(flameMenuApp):
                     menu_item['execute'] = self.rescan
                 menu_item['waitCursor'] = False
                 menu_main_body.append(menu_item)
-                    
-                entities_by_name = {}
+
                 for entity in found_entities[entity_type]:
-                    entities_by_name[entity.get('code')] = entity
-                for entity_name in sorted(entities_by_name.keys()):
-                    entity = entities_by_name.get(entity_name)
                     menu_item = {}
                     if entity.get('code') in batch_groups:
                         menu_item['name'] = '  * ' + entity.get('code')
                     else:
                         menu_item['name'] = '     ' + entity.get('code')
 
-                    self.dynamic_menu_data[str(id(entity))] = entity
-                    menu_item['execute'] = getattr(self, str(id(entity)))
+                    menu_item['execute'] = self.menu_callback(
+                        'new_batch ' + str(entity.get('type')) + ' ' + str(entity.get('id')), entity)
                     menu_main_body.append(menu_item)
 
             if len(found_entities.keys()) == 1:
@@ -3540,8 +5103,7 @@ class flameMenuNewBatch(flameMenuApp):
         # found entities menu
 
         user_only = not self.prefs['show_all']
-        filter_out = ['Project', 'Sequence']
-        found_entities = self.get_entities(user_only, filter_out)
+        found_entities = self.get_entity_views(user_only)['by_type']
         menu_main_body = []
 
         if not found_entities:
@@ -3591,22 +5153,18 @@ class flameMenuNewBatch(flameMenuApp):
                 menu_item['execute'] = self.rescan
             menu_item['waitCursor'] = False
             menu_main_body.append(menu_item)
-                
-            entities_by_name = {}
+
             for entity in found_entities[entity_type]:
-                entities_by_name[entity.get('episode_name', '') + ' ' + entity.get('code')] = entity
-            for entity_name in sorted(entities_by_name.keys()):
-                entity = entities_by_name.get(entity_name)
                 menu_item = {}
-                episode_name = entity.get('episode_name', '') 
+                episode_name = entity.get('episode_name') or ''
 
                 if entity.get('code') in batch_groups:
                     menu_item['name'] = '  * ' + episode_name + ': ' + entity.get('code')
                 else:
                     menu_item['name'] = '     ' + episode_name + ': ' + entity.get('code')
 
-                self.dynamic_menu_data[str(id(entity))] = entity
-                menu_item['execute'] = getattr(self, str(id(entity)))
+                menu_item['execute'] = self.menu_callback(
+                    'new_batch ' + str(entity.get('type')) + ' ' + str(entity.get('id')), entity)
                 menu_main_body.append(menu_item)
 
         if len(found_entities.keys()) == 1:
@@ -3670,55 +5228,25 @@ class flameMenuNewBatch(flameMenuApp):
         return [menu]
 
 
-    def get_entities(self, user_only = True, filter_out=[]):
+    def get_entity_views(self, user_only = True):
+        # menus work on one snapshot of pipeline data
+        pipeline_data = self.connector.pipeline_data
         if user_only:
-            cached_tasks = self.connector.pipeline_data.get('project_tasks_for_person')
-            if not isinstance(cached_tasks, list):
-                # try to collect pipeline data in foreground
-                self.connector.collect_pipeline_data()
-                cached_tasks = self.connector.pipeline_data.get('project_tasks_for_person')
-                if not isinstance(cached_tasks, list):
-                    # give up
-                    return {}
-            if not cached_tasks:
-                return {}
-            else:
-                cached_tasks_by_entity_id = {x.get('entity_id'):x for x in cached_tasks}
-                entities = {'Shot': [], 'Asset': []}
-                shots = self.connector.pipeline_data.get('all_shots_for_project')
-                if not shots:
-                    shots = []
-                for shot in shots:
-                    shot_id = shot.get('id')
-                    if not shot_id:
-                        continue
-
-                    if shot.get('id') in cached_tasks_by_entity_id.keys():
-                        entities['Shot'].append(shot)
-                assets = self.connector.pipeline_data.get('all_assets_for_project')
-                if not assets:
-                    assets = []
-                for asset in assets:
-                    if asset.get('id') in cached_tasks_by_entity_id.keys():
-                        entities['Asset'].append(asset)
-                return entities
-            
+            list_names = ('project_tasks_for_person', )
         else:
-            shots = self.connector.pipeline_data.get('all_shots_for_project')
-            if not isinstance(shots, list):
-                self.connector.collect_pipeline_data()
-                shots = self.connector.pipeline_data.get('all_shots_for_project')
-                if not shots:
-                    shots = []
-            assets = self.connector.pipeline_data.get('all_assets_for_project')
-            if not isinstance(assets, list):
-                self.connector.collect_pipeline_data()
-                assets = self.connector.pipeline_data.get('all_assets_for_project')
-                if not assets:
-                    assets = []
-            return {'Shot': shots, 'Asset': assets}
+            list_names = ('all_shots_for_project', 'all_assets_for_project')
+        if not all(isinstance(pipeline_data.get(x), list) for x in list_names):
+            # try to collect pipeline data in foreground
+            self.connector.collect_pipeline_data()
+            pipeline_data = self.connector.pipeline_data
+        return self.connector.get_entity_views(user_only, pipeline_data)
 
     def create_new_batch(self, entity):
+        # publish menu of the new batch will need this entity first
+        self.connector.request_entity_linked_info(
+            (entity.get('type'), entity.get('id')),
+            priority = fetch_priority_menu)
+
         # check if flame batch with entity name already in desktop
         batch_groups = []
         for batch_group in self.flame.project.current_project.current_workspace.desktop.batch_groups:
@@ -4412,6 +5940,7 @@ class flameMenuNewBatch(flameMenuApp):
 
         # self.connector.cache_retrive_result('current_tasks', True)
         self.connector.collect_pipeline_data()
+        self.invalidate_menu()
 
         if self.flame:
             self.flame.execute_shortcut('Rescan Python Hooks')
@@ -4449,7 +5978,8 @@ class flameMenuPublisher(flameMenuApp):
         
     def __getattr__(self, name):
         def method(*args, **kwargs):
-            entity = self.dynamic_menu_data.get(name)
+            self.connector.touch()
+            entity = self.get_menu_data(name)
             if entity:
                 if entity.get('caller') == 'build_addremove_menu':
                     self.update_loader_list(entity)
@@ -4479,6 +6009,41 @@ class flameMenuPublisher(flameMenuApp):
                 visibility = True
         return visibility
 
+    def flame_inputs(self):
+        # menu is only shown for selected clips
+        # and lists entities bound to current batch
+        if not self.flame:
+            return ()
+        try:
+            return (
+                self.scope_clip(self.flame.media_panel.selected_entries),
+                self.flame.batch.name.get_value()
+            )
+        except:
+            return ()
+
+    def menu_inputs(self, pipeline_data):
+        # only entities bound to current batch, their tasks and previews
+        try:
+            batch_name = self.flame.batch.name.get_value()
+        except:
+            return ()
+        entity_ids = tuple(x.get('id') for x in self.prefs.get('additional menu ' + batch_name) or [])
+        entity_by_id = pipeline_data.get('entity_by_id', {})
+        tasks_by_entity_id = pipeline_data.get('tasks_by_entity_id', {})
+        preview_by_task_id = pipeline_data.get('preview_by_task_id', {})
+        entity_tasks = tuple(tasks_by_entity_id.get(x) for x in entity_ids)
+        return (
+            batch_name,
+            entity_ids,
+            tuple(entity_by_id.get(x) for x in entity_ids),
+            pipeline_data['pipeline_index'].entity_by_code.get(batch_name),
+            entity_tasks,
+            tuple(preview_by_task_id.get(x.get('id')) for tasks in entity_tasks if tasks for x in tasks),
+            pipeline_data.get('all_task_types_for_project'),
+            pipeline_data.get('all_task_statuses_for_project')
+        )
+
     def build_menu(self):
         if not self.connector.user:
             return None
@@ -4486,9 +6051,19 @@ class flameMenuPublisher(flameMenuApp):
             return None
 
         batch_name = self.flame.batch.name.get_value()
+        pipeline_data = self.connector.pipeline_data
+        menu_key = (
+            pipeline_data.get('generation'),
+            self.connector.linked_project_id,
+            batch_name,
+            self.prefs.get('show_all')
+        )
+        return self.cached_menu(menu_key, lambda: self.build_batch_menu(batch_name, pipeline_data))
+
+    def build_batch_menu(self, batch_name, pipeline_data):
         entities_by_id = {}
-        all_shots = self.connector.pipeline_data.get('all_shots_for_project')
-        all_assets = self.connector.pipeline_data.get('all_assets_for_project')
+        all_shots = pipeline_data.get('all_shots_for_project')
+        all_assets = pipeline_data.get('all_assets_for_project')
 
         for shot in all_shots:
             entities_by_id[shot.get('id')] = shot
@@ -4507,25 +6082,27 @@ class flameMenuPublisher(flameMenuApp):
                     add_menu_list.pop(index)
             
             if not add_menu_list:
-                entity = {}
-                for current_entity in entities_by_id.values():
-                    if current_entity.get('code') == batch_name:
-                            entity = current_entity
-                            break
+                entity = pipeline_data['pipeline_index'].entity_by_code.get(batch_name)
                 if entity:
                     self.update_loader_list(entity)
                 add_menu_list = self.prefs.get('additional menu ' + batch_name)
         else:
             self.prefs['additional menu ' + batch_name] = []
 
-            entity = {}
-            for current_entity in entities_by_id.values():
-                if current_entity.get('code') == batch_name:
-                        entity = current_entity
+            entity = pipeline_data['pipeline_index'].entity_by_code.get(batch_name)
             if entity:
                 self.update_loader_list(entity)
             add_menu_list = self.prefs.get('additional menu ' + batch_name)
 
+        # entities bound to current batch go ahead of background fetch
+        # and menu waits for all of them at once
+        tasks_by_entity_id = pipeline_data.get('tasks_by_entity_id', {})
+        entity_keys = [(x.get('type'), x.get('id')) for x in add_menu_list if x.get('id') not in tasks_by_entity_id.keys()]
+        if entity_keys:
+            self.connector.wait_entities_linked_info(entity_keys, timeout = self.prefs.get('menu_fetch_timeout', 2))
+            # fetched tasks come with a new snapshot
+            pipeline_data = self.connector.pipeline_data
+
         menus = []
 
         # add_remove_menu = self.build_addremove_menu()
@@ -4534,7 +6111,7 @@ class flameMenuPublisher(flameMenuApp):
         # menus.append(add_remove_menu)
         
         for entity in add_menu_list:
-            publish_menu = self.build_publish_menu(entity)
+            publish_menu = self.build_publish_menu(entity, pipeline_data)
             if publish_menu:
                 # for action in publish_menu['actions']:
                 #     action['isVisible'] = self.scope_clip
@@ -4617,9 +6194,10 @@ class flameMenuPublisher(flameMenuApp):
                 else:
                     menu_item['name'] = '     ' + entity.get('code')
 
-                entity['caller'] = inspect.currentframe().f_code.co_name
-                self.dynamic_menu_data[str(id(entity))] = entity
-                menu_item['execute'] = getattr(self, str(id(entity)))
+                addremove_entity = dict(entity)
+                addremove_entity['caller'] = inspect.currentframe().f_code.co_name
+                menu_item['execute'] = self.menu_callback(
+                    'addremove ' + str(entity.get('type')) + ' ' + str(entity.get('id')), addremove_entity)
                 menu_main_body.append(menu_item)
 
         if menu_lenght < max_menu_lenght:
@@ -4669,7 +6247,7 @@ class flameMenuPublisher(flameMenuApp):
 
         return menu
 
-    def build_publish_menu(self, entity):
+    def build_publish_menu(self, entity, pipeline_data):
         
         # pprint (self.connector.pipeline_data.get('entity_by_id').get(entity.get('parent_id')))
 
@@ -4683,23 +6261,16 @@ class flameMenuPublisher(flameMenuApp):
             self.prefs[entity_key] = {}
             self.prefs[entity_key]['show_all'] = True
 
-        tasks_by_entity_id = self.connector.pipeline_data.get('tasks_by_entity_id')
+        tasks_by_entity_id = pipeline_data.get('tasks_by_entity_id')
 
         if not tasks_by_entity_id:
             tasks_by_entity_id = {}
 
-        if not entity_id in tasks_by_entity_id.keys():
-            # try to collect data
-            self.connector.collect_entity_linked_info(entity_key)
-            if not entity_id in tasks_by_entity_id.keys():
-                # something went wrong
-                tasks = []
-            else:
-                tasks = tasks_by_entity_id.get(entity_id)
-        else:
-            tasks = tasks_by_entity_id.get(entity_id)
+        # entity not fetched in time is shown without tasks,
+        # menu is built again when its tasks come with a new snapshot
+        tasks = tasks_by_entity_id.get(entity_id, [])
 
-        preview_by_task_id = self.connector.pipeline_data.get('preview_by_task_id')
+        preview_by_task_id = pipeline_data.get('preview_by_task_id')
         if not preview_by_task_id:
             preview_by_task_id = {}
 
@@ -4721,9 +6292,13 @@ class flameMenuPublisher(flameMenuApp):
         menu_item['execute'] = self.rescan
         menu['actions'].append(menu_item)
 
-        menu_item = {}        
-        show_all_entity = dict(entity)
-        show_all_entity['caller'] = 'flip_assigned_for_entity'
+        menu_item = {}
+        entity_callback_key = str(entity_type) + ' ' + str(entity_id)
+        show_all_entity = {
+            'caller': 'flip_assigned_for_entity',
+            'type': entity_type,
+            'id': entity_id
+        }
 
         if self.prefs[entity_key]['show_all']:            
             menu_item['name'] = '~ Show Assigned Only'
@@ -4732,8 +6307,7 @@ class flameMenuPublisher(flameMenuApp):
 
         menu_item['order'] = menu_item_order
         menu_item_order += 1
-        self.dynamic_menu_data[str(id(show_all_entity))] = show_all_entity
-        menu_item['execute'] = getattr(self, str(id(show_all_entity)))
+        menu_item['execute'] = self.menu_callback('show_all ' + entity_callback_key, show_all_entity)
         menu['actions'].append(menu_item)
 
         tasks_by_step = {}
@@ -4765,7 +6339,7 @@ class flameMenuPublisher(flameMenuApp):
             menu_item['isEnabled'] = False
             menu['actions'].append(menu_item)
 
-        current_steps = self.connector.pipeline_data.get('all_task_types_for_project')
+        current_steps = pipeline_data.get('all_task_types_for_project')
         entity_steps = [x for x in current_steps if x.get('for_entity') == entity_type]
         entity_steps_by_code = {step.get('name'):step for step in entity_steps}
         current_step_names = tasks_by_step.keys()
@@ -4779,13 +6353,16 @@ class flameMenuPublisher(flameMenuApp):
             if step_key not in self.prefs[entity_key].keys():
                 self.prefs[entity_key][step_key] = {'isFolded': False}
 
-            fold_step_entity = dict(entity)
-            fold_step_entity['caller'] = 'fold_step_entity'
-            fold_step_entity['key'] = step_key
-            self.dynamic_menu_data[str(id(fold_step_entity))] = fold_step_entity
+            fold_step_entity = {
+                'caller': 'fold_step_entity',
+                'type': entity_type,
+                'id': entity_id,
+                'key': step_key
+            }
 
             menu_item = {}
-            menu_item['execute'] = getattr(self, str(id(fold_step_entity)))
+            menu_item['execute'] = self.menu_callback(
+                'fold_step ' + entity_callback_key + ' ' + str(step_name), fold_step_entity)
 
             if self.prefs[entity_key][step_key].get('isFolded') and len(tasks_by_step[step_name]) != 1:
                 menu_item['name'] = '+ [ ' + step_name + ' ]'
@@ -4816,10 +6393,12 @@ class flameMenuPublisher(flameMenuApp):
                 if task_key not in self.prefs[entity_key].keys():
                     self.prefs[entity_key][task_key] = {'isFolded': False}
                 
-                fold_task_entity = dict(entity)
-                fold_task_entity['caller'] = 'fold_task_entity'
-                fold_task_entity['key'] = task_key
-                self.dynamic_menu_data[str(id(fold_task_entity))] = fold_task_entity
+                fold_task_entity = {
+                    'caller': 'fold_task_entity',
+                    'type': entity_type,
+                    'id': entity_id,
+                    'key': task_key
+                }
                 
                 task_name = task.get('task_type_name')
                 menu_item = {}
@@ -4835,7 +6414,8 @@ class flameMenuPublisher(flameMenuApp):
                         menu_item['name'] = ' '*4 + '+ [ ' + task_name + ' ]'
                     else:
                         menu_item['name'] = ' '*4 + '- [ ' + task_name + ' ]'
-                    menu_item['execute'] = getattr(self, str(id(fold_task_entity)))
+                    menu_item['execute'] = self.menu_callback(
+                        'fold_task ' + entity_callback_key + ' ' + str(task.get('id')), fold_task_entity)
                     menu_item['order'] = menu_item_order
                     menu_item_order += 1
                     menu['actions'].append(menu_item)
@@ -4869,9 +6449,9 @@ class flameMenuPublisher(flameMenuApp):
                 publish_entity['caller'] = 'publish'
                 publish_entity['task'] = task
                 publish_entity['entity'] = entity
-                publish_entity['parent'] = self.connector.pipeline_data['entity_by_id'].get(entity.get('parent_id'))
-                self.dynamic_menu_data[str(id(publish_entity))] = publish_entity
-                menu_item['execute'] = getattr(self, str(id(publish_entity)))
+                publish_entity['parent'] = pipeline_data['entity_by_id'].get(entity.get('parent_id'))
+                menu_item['execute'] = self.menu_callback(
+                    'publish ' + entity_callback_key + ' ' + str(task.get('id')), publish_entity)
                 menu_item['waitCursor'] = False
                 menu_item['order'] = menu_item_order
                 menu_item_order += 1
@@ -5508,6 +7088,9 @@ class flameMenuPublisher(flameMenuApp):
                     else:
                         return (pb_info, True)
 
+        # new comment and preview have changed the task
+        self.connector.invalidate_cached([task.get('id'), task.get('entity_id')])
+
         # Create 'flame_render' PublishedFile
         '''
         self.log_debug('creating flame_render published file in ShotGrid')
@@ -5918,49 +7501,51 @@ class flameMenuPublisher(flameMenuApp):
                     add_list.pop(index)
         else:
             add_list.append(entity)
+            self.connector.request_entity_linked_info(
+                (entity.get('type'), entity_id),
+                priority = fetch_priority_menu)
         self.prefs['additional menu ' + batch_name] = add_list
 
     def get_entities(self, user_only = True, filter_out=[]):
+        # menus work on one snapshot of pipeline data
+        pipeline_data = self.connector.pipeline_data
         start = time.time()
    
         if user_only:
-            cached_tasks = self.connector.pipeline_data.get('project_tasks_for_person')
+            cached_tasks = pipeline_data.get('project_tasks_for_person')
             if not isinstance(cached_tasks, list):
                 # try to collect pipeline data in foreground
                 self.connector.collect_pipeline_data()
-                cached_tasks = self.connector.pipeline_data('project_tasks_for_person')
+                pipeline_data = self.connector.pipeline_data
+                cached_tasks = pipeline_data.get('project_tasks_for_person')
                 if not isinstance(cached_tasks, list):
                     # give up
                     return {}
             if not cached_tasks:
                 return {}
             else:
-                cached_tasks_by_entity_id = {x.get('entity_id'):x for x in cached_tasks}
+                # entities are looked up by ids connector keeps
+                # for assigned tasks instead of scanning all of them
                 entities = {'Shot': [], 'Asset': []}
-                shots = self.connector.pipeline_data.get('all_shots_for_project')
-                if not shots:
-                    shots = []
-                for shot in shots:
-                    if shot.get('id') in cached_tasks_by_entity_id.keys():
-                        entities['Shot'].append(shot)
-                assets = self.connector.pipeline_data.get('all_assets_for_project')
-                if not assets:
-                    assets = []
-                for asset in assets:
-                    if asset.get('id') in cached_tasks_by_entity_id.keys():
-                        entities['Asset'].append(asset)
+                entity_by_id = pipeline_data.get('entity_by_id')
+                for entity_id in pipeline_data.get('assigned_tasks_by_entity_id').keys():
+                    entity = entity_by_id.get(entity_id)
+                    if entity and entity.get('type') in entities.keys():
+                        entities[entity.get('type')].append(entity)
                 return entities
         else:
-            shots = self.connector.pipeline_data.get('all_shots_for_project')
+            shots = pipeline_data.get('all_shots_for_project')
             if not isinstance(shots, list):
                 self.connector.collect_pipeline_data()
-                shots = self.connector.pipeline_data.get('all_shots_for_project')
+                pipeline_data = self.connector.pipeline_data
+                shots = pipeline_data.get('all_shots_for_project')
                 if not shots:
                     shots = []
-            assets = self.connector.pipeline_data.get('all_assets_for_project')
+            assets = pipeline_data.get('all_assets_for_project')
             if not isinstance(assets, list):
                 self.connector.collect_pipeline_data()
-                assets = self.connector.pipeline_data.get('all_assets_for_project')
+                pipeline_data = self.connector.pipeline_data
+                assets = pipeline_data.get('all_assets_for_project')
                 if not assets:
                     assets = []
             return {'Shot': shots, 'Asset': assets}
@@ -6520,6 +8105,7 @@ class flameMenuPublisher(flameMenuApp):
                 self.log(e)
 
     def rescan(self, *args, **kwargs):
+        self.invalidate_menu()
         if not self.flame:
             try:
                 import flame
@@ -6531,6 +8117,222 @@ class flameMenuPublisher(flameMenuApp):
             self.flame.execute_shortcut('Rescan Python Hooks')
             self.log_debug('Rescan Python Hooks')
 
+class flameMenuRefresh(object):
+    # Keeps Flame menus current without rescanning python hooks
+    # over and over while Flame is idle.
+    # Hooks tell it once their menus are built and it remembers
+    # the state menus were built from: prefs, user, linked project
+    # and inputs apps of the hook report from pipeline data and Flame.
+    # Changes of pipeline data are pushed by connector and only then
+    # the state is checked at idle. Flame does not tell when selection,
+    # current batch or batch groups change, so these few inputs are
+    # polled at idle instead, without looking at pipeline data.
+    # Hooks are rescanned if the state has changed.
+    # There is only one pending check at a time and rescans
+    # are rate limited so bursts of changes end up in a single rescan
+
+    hook_apps = {
+        'main_menu': ('flameMenuProjectconnect', ),
+        'media_panel': ('flameMenuNewBatch', 'flameMenuPublisher'),
+        'batch': ('flameMenuBatchLoader', )
+    }
+
+    def __init__(self, framework, connector):
+        self.framework = framework
+        self.connector = connector
+        self.lock = threading.Lock()
+        self.built_states = {}
+        self.built_flame_states = {}
+        self.timer = None
+        self.timer_due = 0
+        self.idle_check_pending = False
+        self.poll_timer = None
+        self.poll_pending = False
+        self.change_pending = False
+        self.last_rescan = 0
+        self.stopped = False
+
+        if not 'menu_refresh_check_interval' in self.framework.prefs_global.keys():
+            self.framework.prefs_global['menu_refresh_check_interval'] = 0.5
+        if not 'menu_refresh_min_interval' in self.framework.prefs_global.keys():
+            self.framework.prefs_global['menu_refresh_min_interval'] = 2
+        if not 'menu_refresh_poll_interval' in self.framework.prefs_global.keys():
+            self.framework.prefs_global['menu_refresh_poll_interval'] = 1
+
+    @property
+    def check_interval(self):
+        return self.framework.prefs_global.get('menu_refresh_check_interval', 0.5)
+
+    @property
+    def min_interval(self):
+        return self.framework.prefs_global.get('menu_refresh_min_interval', 2)
+
+    @property
+    def poll_interval(self):
+        return self.framework.prefs_global.get('menu_refresh_poll_interval', 1)
+
+    def get_hook_apps(self, hook_name):
+        return [x for x in self.framework.apps if x.__class__.__name__ in self.hook_apps.get(hook_name, ())]
+
+    def get_flame_state(self, hook_name):
+        # Flame objects should only be accessed from Flame main thread
+        state = []
+        for app in self.get_hook_apps(hook_name):
+            try:
+                state.append(app.flame_inputs())
+            except Exception as e:
+                self.framework.log_debug('unable to get flame inputs of %s: %s' % (app.name, pformat(e)))
+        return tuple(state)
+
+    def get_state(self, hook_name, flame_state = None):
+        # what menus of given hook are built from
+        if flame_state is None:
+            flame_state = self.get_flame_state(hook_name)
+        pipeline_data = self.connector.pipeline_data
+        user = self.connector.user if self.connector.user else {}
+        state = [
+            self.framework.prefs_revision,
+            user.get('id'),
+            self.connector.linked_project_id,
+            flame_state
+        ]
+        for app in self.get_hook_apps(hook_name):
+            try:
+                state.append(app.menu_inputs(pipeline_data))
+            except Exception as e:
+                self.framework.log_debug('unable to get menu inputs of %s: %s' % (app.name, pformat(e)))
+        return tuple(state)
+
+    def built(self, hook_name):
+        # called by hooks once their menus are built
+        menu_auto_refresh = self.framework.prefs_global.get('menu_auto_refresh', {})
+        if not menu_auto_refresh.get(hook_name, True):
+            with self.lock:
+                self.built_states.pop(hook_name, None)
+                self.built_flame_states.pop(hook_name, None)
+            return
+
+        flame_state = self.get_flame_state(hook_name)
+        state = self.get_state(hook_name, flame_state)
+        with self.lock:
+            self.built_states[hook_name] = state
+            self.built_flame_states[hook_name] = flame_state
+            change_pending = self.change_pending
+            self.change_pending = False
+            self.start_poll()
+        if change_pending:
+            # data has changed before any menu was there to refresh
+            self.schedule(self.check_interval)
+
+    def notify(self, *args, **kwargs):
+        # called by connector threads when pipeline data has changed
+        self.schedule(max(0, self.last_rescan + self.min_interval - time.time()))
+
+    def schedule(self, delay):
+        # starts or brings forward the timer of the next idle check
+        with self.lock:
+            if self.stopped or self.idle_check_pending:
+                return
+            if not self.built_states:
+                self.change_pending = True
+                return
+            due = time.time() + delay
+            if self.timer:
+                if self.timer_due <= due:
+                    return
+                self.timer.cancel()
+            self.timer_due = due
+            self.timer = threading.Timer(delay, self.schedule_idle_check)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def schedule_idle_check(self):
+        with self.lock:
+            self.timer = None
+            if self.stopped or self.idle_check_pending:
+                return
+            self.idle_check_pending = True
+        try:
+            import flame
+            flame.schedule_idle_event(self.idle_check)
+        except:
+            with self.lock:
+                self.idle_check_pending = False
+
+    def idle_check(self):
+        with self.lock:
+            self.idle_check_pending = False
+            built_states = dict(self.built_states)
+        if self.stopped:
+            return
+
+        changed = False
+        for hook_name, built_state in built_states.items():
+            if self.get_state(hook_name) != built_state:
+                changed = True
+                break
+        if not changed:
+            # menus are current, next check comes with next change
+            return
+
+        wait = self.last_rescan + self.min_interval - time.time()
+        if wait > 0:
+            # rescan is due as soon as it is allowed
+            self.schedule(wait)
+            return
+        self.last_rescan = time.time()
+        rescan_hooks()
+
+    def start_poll(self):
+        # called with the lock held
+        if self.stopped or self.poll_timer or self.poll_pending:
+            return
+        if (not self.built_flame_states) or (self.poll_interval <= 0):
+            return
+        self.poll_timer = threading.Timer(self.poll_interval, self.schedule_poll)
+        self.poll_timer.daemon = True
+        self.poll_timer.start()
+
+    def schedule_poll(self):
+        with self.lock:
+            self.poll_timer = None
+            if self.stopped:
+                return
+            self.poll_pending = True
+        try:
+            import flame
+            flame.schedule_idle_event(self.poll)
+        except:
+            # nothing to poll without Flame
+            with self.lock:
+                self.poll_pending = False
+
+    def poll(self):
+        # checks Flame side of menu inputs only,
+        # full state is compared by idle check if it has changed
+        with self.lock:
+            self.poll_pending = False
+            built_flame_states = dict(self.built_flame_states)
+        if self.stopped:
+            return
+
+        for hook_name, built_flame_state in built_flame_states.items():
+            if self.get_flame_state(hook_name) != built_flame_state:
+                self.notify()
+                break
+
+        with self.lock:
+            self.start_poll()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            for timer in (self.timer, self.poll_timer):
+                if timer:
+                    timer.cancel()
+            self.timer = None
+            self.poll_timer = None
+
 # --- FLAME STARTUP SEQUENCE ---
 # Flame startup sequence is a bit complicated
 # If the app installed in /opt/Autodesk/<user>/python
@@ -6550,6 +8352,7 @@ class flameMenuPublisher(flameMenuApp):
 
 app_framework = None
 kitsuConnector = None
+menu_refresh = None
 apps = []
 
 # Exception handler
@@ -6570,6 +8373,7 @@ sys.excepthook = exeption_handler
 
 # register clean up logic to be called at Flame exit
 def cleanup(apps, app_framework, kitsuConnector):
+    if menu_refresh: menu_refresh.stop()
     if kitsuConnector: kitsuConnector.terminate_loops()
     
     if apps:
@@ -6623,11 +8427,14 @@ def project_changed_dict(info):
 def app_initialized(project_name):
     global app_framework
     global kitsuConnector
+    global menu_refresh
     global apps
     app_framework = flameAppFramework(app_name = settings['app_name'])
     print ('PYTHON\t: %s initializing' % app_framework.bundle_name)
     kitsuConnector = flameKitsuConnector(app_framework)
     load_apps(apps, app_framework, kitsuConnector)
+    menu_refresh = flameMenuRefresh(app_framework, kitsuConnector)
+    kitsuConnector.pipeline_data_listeners.append(menu_refresh.notify)
 
 app_initialized.__dict__["waitCursor"] = False
 
@@ -6665,14 +8472,8 @@ def get_main_menu_custom_ui_actions():
             version_string += ', zou: v' + str(zou_version)
         menu[0]['actions'].append({'name': version_string, 'isEnabled': False, 'order': order})
 
-    if app_framework:
-        menu_auto_refresh = app_framework.prefs_global.get('menu_auto_refresh', {})
-        if menu_auto_refresh.get('main_menu', True):
-            try:
-                import flame
-                flame.schedule_idle_event(rescan_hooks)
-            except:
-                pass
+    if menu_refresh:
+        menu_refresh.built('main_menu')
     
     if settings.get('debug', False):
         print('main menu update took %s' % (time.time() - start))
@@ -6719,14 +8520,8 @@ def get_media_panel_custom_ui_actions():
                 if app_menu:
                     menu.extend(app_menu)
 
-    if app_framework:
-        menu_auto_refresh = app_framework.prefs_global.get('menu_auto_refresh', {})
-        if menu_auto_refresh.get('media_panel', True):
-            try:
-                import flame
-                flame.schedule_idle_event(rescan_hooks)
-            except:
-                pass
+    if menu_refresh:
+        menu_refresh.built('media_panel')
     
     if settings.get('debug', False):
         print('media panel menu update took %s' % (time.time() - start))
@@ -6746,14 +8541,8 @@ def get_batch_custom_ui_actions():
             for menuitem in app_menu:
                 menu.append(menuitem)
 
-    if app_framework:
-        menu_auto_refresh = app_framework.prefs_global.get('menu_auto_refresh', {})
-        if menu_auto_refresh.get('batch', True):
-            try:
-                import flame
-                flame.schedule_idle_event(rescan_hooks)
-            except:
-                pass
+    if menu_refresh:
+        menu_refresh.built('batch')
 
     if settings.get('debug', False):
         print('batch menu update took %s' % (time.time() - start))
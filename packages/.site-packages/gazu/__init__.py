@@ -22,6 +22,11 @@ from . import user
 from . import playlist
 from . import concept
 
+try:
+    from . import aio
+except ImportError:
+    pass
+
 from .exception import (
     AuthFailedException,
     ParameterException,
@@ -92,9 +97,13 @@ def refresh_token(client=raw.default_client):
     if "refresh_token" in client.tokens:
         headers["Authorization"] = "Bearer %s" % client.tokens["refresh_token"]
 
-    response = client.session.get(
+    response = raw.send_request(
+        client.session.get,
         raw.get_full_url("auth/refresh-token", client=client),
+        "auth/refresh-token",
+        client=client,
         headers=headers,
+        timeout=client.timeout,
     )
     raw.check_status(response, "auth/refresh-token")
 
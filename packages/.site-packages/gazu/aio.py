@@ -0,0 +1,325 @@
+"""
+Asyncio front end to gazu requests.
+
+Coroutines of this module can run many requests at the same time without
+an OS thread for each of them. Requests go through aiohttp when it is
+installed, otherwise they run the regular blocking functions on a shared
+thread pool whose size bounds the number of threads used, whatever the
+number of requests.
+
+Example:
+    async def tasks_for(shots):
+        return await aio.gather(
+            [aio.all_tasks_for_shot(shot) for shot in shots],
+            concurrency=8,
+        )
+
+    tasks = aio.run(tasks_for(shots))
+"""
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import ssl
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import client as raw
+from .exception import RequestCancelledException
+from .helpers import normalize_model_parameter
+from .sorting import sort_by_name
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+default = raw.default_client
+
+aio_settings = {"max_workers": 8}
+executor = {"executor": None}
+executor_lock = threading.Lock()
+
+# sessions opened by run() for each client, and digest of the last
+# response received by current task
+sessions_registry = contextvars.ContextVar("gazu_aio_sessions", default=None)
+response_digest = contextvars.ContextVar("gazu_aio_digest", default=None)
+
+
+class Response(object):
+    """
+    Status and body of an aiohttp response, shaped the way
+    client.check_status reads requests responses.
+    """
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def has_native_transport():
+    """
+    Returns:
+        bool: True if requests go through aiohttp rather than threads.
+    """
+    return aiohttp is not None
+
+
+def set_max_workers(max_workers):
+    """
+    Set number of threads running blocking calls. It takes effect when the
+    thread pool is created, so before the first call.
+    """
+    aio_settings["max_workers"] = max_workers
+    return aio_settings["max_workers"]
+
+
+def get_executor():
+    with executor_lock:
+        if executor["executor"] is None:
+            executor["executor"] = ThreadPoolExecutor(
+                max_workers=aio_settings["max_workers"]
+            )
+        return executor["executor"]
+
+
+def run(coroutine):
+    """
+    Run given coroutine on a new event loop, so it can be called from any
+    thread, and close aiohttp sessions it opened.
+
+    Returns:
+        The coroutine result.
+    """
+    loop = asyncio.new_event_loop()
+    sessions = {}
+    token = sessions_registry.set(sessions)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        try:
+            loop.run_until_complete(close_sessions(sessions))
+        finally:
+            sessions_registry.reset(token)
+            loop.close()
+
+
+async def close_sessions(sessions):
+    for session in list(sessions.values()):
+        await session.close()
+    sessions.clear()
+
+
+async def gather(coroutines, concurrency=8, return_exceptions=False):
+    """
+    Await given coroutines with at most concurrency of them running at the
+    same time.
+
+    Returns:
+        list: Results in the same order as coroutines.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(
+        *[bounded(coroutine) for coroutine in coroutines],
+        return_exceptions=return_exceptions
+    )
+
+
+async def call(function, *args, **kwargs):
+    """
+    Run a blocking gazu function on the thread pool.
+
+    Returns:
+        The function result.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(function, *args, **kwargs)
+    )
+
+
+def last_response_digest():
+    """
+    Returns:
+        str: Digest of the body of the last get request awaited by current
+        task, see client.last_response_digest.
+    """
+    return response_digest.get()
+
+
+def get_session(client):
+    sessions = sessions_registry.get()
+    if aiohttp is None or sessions is None:
+        return None
+    session = sessions.get(id(client))
+    if session is None or session.closed:
+        verify = client.session.verify
+        if verify is True:
+            ssl_context = None
+        elif verify is False:
+            ssl_context = False
+        else:
+            ssl_context = ssl.create_default_context(cafile=verify)
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ssl=ssl_context)
+        )
+        sessions[id(client)] = session
+    return session
+
+
+def get_client_timeout(timeout, client):
+    timeout = raw.get_timeout(timeout, client)
+    if timeout is None:
+        return aiohttp.ClientTimeout(total=None)
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+        return aiohttp.ClientTimeout(
+            total=None, sock_connect=connect_timeout, sock_read=read_timeout
+        )
+    return aiohttp.ClientTimeout(
+        total=None, sock_connect=timeout, sock_read=timeout
+    )
+
+
+def get_text_with_digest(path, client, timeout):
+    text = raw.get(path, json_response=False, client=client, timeout=timeout)
+    return text, raw.last_response_digest()
+
+
+async def get(path, params=None, client=default, timeout=None):
+    """
+    Run a get request toward given path for configured host.
+
+    Returns:
+        The request result.
+    """
+    path = raw.build_path_with_params(path, params)
+    response_digest.set(None)
+    session = get_session(client)
+    if session is None:
+        text, digest = await call(get_text_with_digest, path, client, timeout)
+    else:
+        retry = True
+        while retry:
+            token = client.cancellation_token
+            if token is not None and token.is_cancelled():
+                raise RequestCancelledException(path)
+            async with session.get(
+                raw.get_full_url(path, client=client),
+                headers=raw.make_auth_header(client=client),
+                timeout=get_client_timeout(timeout, client),
+            ) as aio_response:
+                response = Response(
+                    aio_response.status, await aio_response.read()
+                )
+            if token is not None and token.is_cancelled():
+                raise RequestCancelledException(path)
+            # token refresh and error reporting are blocking
+            _, retry = await call(raw.check_status, response, path, client)
+        text = response.text
+        digest = hashlib.sha1(response.content).hexdigest()
+    response_digest.set(digest)
+    return json.loads(text)
+
+
+async def fetch_all(path, params=None, client=default, timeout=None):
+    """
+    Args:
+        path (str): The path for which we want to retrieve all entries.
+        params (dict): The parameters to pass to the request.
+
+    Returns:
+        list: All entries stored in database for a given model.
+    """
+    return await get(
+        raw.url_path_join("data", path),
+        params=params,
+        client=client,
+        timeout=timeout,
+    )
+
+
+async def all_shots_for_episode(episode, client=default):
+    """
+    Args:
+        episode (str / dict): The episode dict or the episode ID.
+
+    Returns:
+        list: Shots which are children of given episode.
+    """
+    episode = normalize_model_parameter(episode)
+    return sort_by_name(
+        await fetch_all("episodes/%s/shots" % episode["id"], client=client)
+    )
+
+
+async def all_assets_for_episode(episode, client=default):
+    """
+    Args:
+        episode (str / dict): The episode dict or the episode ID.
+
+    Returns:
+        list: Assets stored in the database for given episode.
+    """
+    episode = normalize_model_parameter(episode)
+    return sort_by_name(
+        await fetch_all(
+            "assets", {"source_id": episode["id"]}, client=client
+        )
+    )
+
+
+async def all_tasks_for_shot(shot, client=default):
+    """
+    Args:
+        shot (str / dict): The shot dict or the shot ID.
+
+    Returns:
+        list: Tasks linked to given shot.
+    """
+    shot = normalize_model_parameter(shot)
+    return sort_by_name(
+        await fetch_all("shots/%s/tasks" % shot["id"], client=client)
+    )
+
+
+async def all_tasks_for_asset(asset, client=default):
+    """
+    Args:
+        asset (str / dict): The asset dict or the asset ID.
+
+    Returns:
+        list: Tasks directly linked to given asset.
+    """
+    asset = normalize_model_parameter(asset)
+    return sort_by_name(
+        await fetch_all("assets/%s/tasks" % asset["id"], client=client)
+    )
+
+
+async def get_all_preview_files_for_task(task, client=default):
+    """
+    Args:
+        task (str / dict): The task dict or the task ID.
+
+    Returns:
+        list: Preview files of given task.
+    """
+    task = normalize_model_parameter(task)
+    return await fetch_all(
+        "preview-files", {"task_id": task["id"]}, client=client
+    )
@@ -132,6 +132,22 @@ def get_asset(asset_id, client=default):
     return raw.fetch_one("assets", asset_id, client=client)
 
 
+def get_assets(asset_ids, client=default):
+    """
+    Args:
+        asset_ids (list): IDs (or dicts) of claimed assets.
+
+    Returns:
+        dict: Assets found, keyed by their ID, a few requests for all of
+        them. They come from the same route as get_asset. IDs the route
+        does not return for a list of IDs are fetched one by one, deleted
+        assets are left out.
+    """
+    return raw.fetch_many_by_id(
+        "assets", asset_ids, client=client, fetch_missing=True
+    )
+
+
 @cache
 def get_asset_url(asset, client=default):
     """
@@ -1,11 +1,18 @@
 import copy
 import datetime
 import json
+import threading
 
+from collections import OrderedDict
 from functools import wraps
+from types import MappingProxyType
 
-cache_settings = {"enabled": False}
+from . import client as raw
+from .helpers import normalize_model_parameter, _UUID_RE
+
+cache_settings = {"enabled": False, "frozen": False, "refresh_workers": 4}
 cached_functions = []
+refresh_executor = {"executor": None, "lock": threading.Lock()}
 
 
 def enable():
@@ -24,90 +31,321 @@ def disable():
     return cache_settings["enabled"]
 
 
-def clear_all():
+def enable_frozen_values():
+    """
+    Make all decorated functions return cached values as read-only
+    structures (dicts become mappingproxy, lists become tuples) instead of
+    deep copies. It makes cache hits cheap but callers can't modify
+    results anymore.
+    """
+    cache_settings["frozen"] = True
+    return cache_settings["frozen"]
+
+
+def disable_frozen_values():
+    """
+    Make all decorated functions return deep copies of cached values.
+    """
+    cache_settings["frozen"] = False
+    return cache_settings["frozen"]
+
+
+def clear_all(client=None):
     """
     Clear all cached functions.
+
+    Args:
+        client (KitsuClient): Only clear values cached for the host and user
+            of this client.
     """
+    removed = 0
     for function in cached_functions:
-        function.clear_cache()
+        removed += function.clear_cache(client=client)
+    return removed
 
 
-def remove_oldest_entry(memo, maxsize):
+def invalidate(model_id=None, model_type=None, client=None):
     """
-    Remove the oldest cache entry if there is more value stored than allowed.
+    Remove cached values related to a model. Values are related when the
+    model was given as argument or is part of the cached result.
+
+    Args:
+        model_id (str): Id of the model that changed.
+        model_type (str): Only look into functions dealing with this type
+            of model ("shot", "task"...). All values of these functions are
+            removed if no id is given.
+        client (KitsuClient): Only remove values cached for the host and user
+            of this client.
+
+    Returns:
+        int: Number of removed values.
+    """
+    removed = 0
+    for function in cached_functions:
+        if model_type is not None:
+            module_name = function.__module__.split(".")[-1]
+            if module_name != model_type.lower().replace("-", "_"):
+                continue
+        if model_id is None:
+            removed += function.clear_cache(client=client)
+        else:
+            removed += function.invalidate(model_id, client=client)
+    return removed
+
+
+def remove_oldest_entry(memo, maxsize, maxbytes=0, state=None):
+    """
+    Remove least recently used entries while there is more value stored than
+    allowed. Memo keeps its entries ordered from least to most recently used
+    so the oldest entry is always the first one.
 
     Params:
-        memo (dict): Cache used for function memoization.
+        memo (OrderedDict): Cache used for function memoization.
         maxsize (int): Maximum number of entries for the cache.
+        maxbytes (int): Maximum estimated size of values for the cache.
+        state (dict): The parameters of the cache, its "current_bytes" total
+            is kept up to date if given.
 
     Returns:
-        Oldest entry for given cache.
+        Last removed entry for given cache.
     """
+    if state is None:
+        state = {"current_bytes": get_cache_bytes(memo), "ids": {}}
     oldest_entry = None
-    if maxsize > 0 and len(memo) > maxsize:
-        oldest_entry_key = list(memo.keys())[0]
-        for entry_key in memo.keys():
-            oldest_date = memo[oldest_entry_key]["date_accessed"]
-            if memo[entry_key]["date_accessed"] < oldest_date:
-                oldest_entry_key = entry_key
-        memo.pop(oldest_entry_key)
+    while maxsize > 0 and len(memo) > maxsize:
+        oldest_key, oldest_entry = memo.popitem(last=False)
+        forget_entry(state, oldest_key, oldest_entry)
+    while maxbytes > 0 and len(memo) > 1 and state["current_bytes"] > maxbytes:
+        oldest_key, oldest_entry = memo.popitem(last=False)
+        forget_entry(state, oldest_key, oldest_entry)
     return oldest_entry
 
 
+def get_cache_bytes(memo):
+    """
+    Returns:
+        int: Estimated size of all values stored in given cache.
+    """
+    return sum(entry["size"] for entry in memo.values())
+
+
+def get_value_size(value):
+    """
+    Estimate memory used by a value from the size of its JSON form, which
+    is close to the size of the response it comes from.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
 def get_cache_key(args, kwargs):
     """
-    Serialize arguments to get a cache key. It will be used to store function
-    results.
+    Build a cache key from function arguments. It will be used to store
+    function results. Models given as dicts or ids are reduced to their id so
+    every shape of the same entity leads to the same key. Key starts with
+    the namespace of the client so users never share cached values.
+
+    Returns:
+        tuple: generated key
+    """
+    kwargs_key = tuple(
+        sorted(
+            (name, get_argument_key(value))
+            for name, value in kwargs.items()
+            if name != "client"
+        )
+    )
+    return (
+        get_cache_namespace(kwargs.get("client")),
+        tuple(get_argument_key(value) for value in args),
+        kwargs_key,
+    )
+
+
+def get_cache_namespace(client=None):
+    """
+    Returns:
+        tuple: Host and user given client, or default client, is logged in
+        as.
+    """
+    if client is None:
+        client = raw.default_client
+    return raw.client_identity(client)
+
+
+def get_entry_ids(key, value):
+    """
+    Collect ids of models a cache entry relates to: models given as
+    arguments and models found in the result.
 
     Returns:
-        str: generated key
+        set: Model ids.
     """
-    kwargscopy = kwargs.copy()
-    if "client" in kwargscopy:
-        kwargscopy["client"] = kwargscopy["client"].host
-    if len(args) == 0 and len(kwargscopy) == 0:
-        return ""
-    elif len(args) == 0:
-        return json.dumps(kwargscopy)
-    elif len(kwargscopy.keys()) == 0:
-        return json.dumps(args)
+    ids = set()
+
+    def add_key_ids(item):
+        if isinstance(item, tuple):
+            for sub_item in item:
+                add_key_ids(sub_item)
+        elif isinstance(item, str) and _UUID_RE.match(item):
+            ids.add(item)
+
+    add_key_ids(key[1:])
+    if isinstance(value, dict):
+        value = [value]
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            if isinstance(item, dict) and item.get("id"):
+                ids.add(item.get("id"))
+    return ids
+
+
+def index_entry(state, key, entry):
+    """
+    Register entry in the id index of the cache.
+    """
+    for model_id in entry["ids"]:
+        state["ids"].setdefault(model_id, set()).add(key)
+
+
+def forget_entry(state, key, entry):
+    """
+    Update cache totals and id index after entry has been removed.
+    """
+    state["current_bytes"] -= entry["size"]
+    for model_id in entry["ids"]:
+        keys = state["ids"].get(model_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                state["ids"].pop(model_id)
+
+
+def get_argument_key(argument):
+    """
+    Returns:
+        Hashable key for a single function argument. Models are reduced to
+        their id, other values are tagged with their type so values that
+        compare equal, like 1 and True, don't share a key.
+    """
+    if isinstance(argument, (list, tuple)):
+        return tuple(get_argument_key(value) for value in argument)
+    try:
+        model = normalize_model_parameter(argument)
+        if isinstance(model, dict) and "id" in model:
+            return model["id"]
+    except ValueError:
+        pass
+    if isinstance(argument, dict):
+        value = json.dumps(argument, sort_keys=True, default=str)
     else:
-        return json.dumps([args, kwargscopy])
+        try:
+            hash(argument)
+            value = argument
+        except TypeError:
+            value = repr(argument)
+    return (type(argument).__name__, value)
+
+
+def freeze(value):
+    """
+    Build a read-only version of given value.
+
+    Returns:
+        Value where dicts are replaced by mappingproxy and lists by tuples.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType(
+            dict((key, freeze(item)) for key, item in value.items())
+        )
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
 
 
-def insert_value(function, cache_store, args, kwargs):
+def insert_value(function, cache_store, args, kwargs, state=None):
     """
     Serialize function call arguments and store function result in given cache
     store.
 
     Args:
         function (func): The function to cache value for.
-        cache_store (dict): The cache which will contain the value to cache.
+        cache_store (OrderedDict): The cache which will contain the value to
+            cache.
         args, kwargs: The arguments for which a cache must be set.
+        state (dict): The parameters of the cache (lock, maxsize, maxbytes,
+            frozen).
 
     Returns:
         The cached value.
     """
+    if state is None:
+        state = {
+            "lock": threading.RLock(),
+            "maxsize": 0,
+            "maxbytes": 0,
+            "current_bytes": 0,
+            "ids": {},
+        }
     returned_value = function(*args, **kwargs)
     key = get_cache_key(args, kwargs)
-    cache_store[key] = {
-        "date_accessed": datetime.datetime.now(),
-        "value": returned_value,
-    }
-    return get_value(cache_store, key)
+    size = 0
+    if state.get("maxbytes", 0) > 0:
+        size = get_value_size(returned_value)
+    ids = get_entry_ids(key, returned_value)
+    if is_frozen(state):
+        returned_value = freeze(returned_value)
+    with state["lock"]:
+        remove_entry(cache_store, key, state)
+        entry = {
+            "date_accessed": datetime.datetime.now(),
+            "value": returned_value,
+            "size": size,
+            "frozen": is_frozen(state),
+            "ids": ids,
+        }
+        cache_store[key] = entry
+        state["current_bytes"] += size
+        index_entry(state, key, entry)
+        value = get_value(cache_store, key)
+        remove_oldest_entry(
+            cache_store, state["maxsize"], state["maxbytes"], state
+        )
+    return value
+
+
+def remove_entry(cache_store, key, state):
+    """
+    Remove given key from cache store if it's there.
+
+    Returns:
+        Removed entry or None.
+    """
+    entry = cache_store.pop(key, None)
+    if entry is not None:
+        forget_entry(state, key, entry)
+    return entry
 
 
 def get_value(cache_store, key):
     """
     It generates a deep copy of the requested value. It's needed because if a
     pointer is returned, the value can be changed. Which leads to a modified
-    cache and unexpected results.
+    cache and unexpected results. Frozen values can't be changed so they are
+    returned as they are.
 
     Returns:
         Value matching given key inside given cache store
     """
-    value = cache_store[key]["value"]
-    return copy.deepcopy(value)
+    entry = cache_store[key]
+    if entry.get("frozen"):
+        return entry["value"]
+    return copy.deepcopy(entry["value"])
 
 
 def is_cache_enabled(state):
@@ -121,6 +359,99 @@ def is_cache_enabled(state):
     return cache_settings["enabled"] and state["enabled"]
 
 
+def is_refreshing(kwargs):
+    """
+    Args:
+        kwargs: The keyword arguments of the call.
+
+    Returns:
+        True if the call is made with a client that refreshes cached values
+        instead of reading them.
+    """
+    client = kwargs.get("client")
+    return client is not None and getattr(client, "refresh_cache", False)
+
+
+def is_frozen(state):
+    """
+    Args:
+        state: The state describing the cache state.
+
+    Returns:
+        True if cached values are stored and returned read-only.
+    """
+    return cache_settings["frozen"] or state.get("frozen", False)
+
+
+def is_cache_stale(memo, state, key):
+    """
+    Check if an expired value can still be returned while it is refreshed
+    in background.
+
+    Args:
+        memo (dict): The function cache
+        state (dict): The parameters of the cache (expire, max_stale)
+        key: The key to check
+
+    Returns:
+        True if value is expired for less than max_stale seconds.
+    """
+    max_stale = state.get("max_stale", 0)
+    if max_stale <= 0 or state["expire"] <= 0:
+        return False
+    date = memo[key]["date_accessed"]
+    hard_expire = datetime.timedelta(seconds=state["expire"] + max_stale)
+    return datetime.datetime.now() < date + hard_expire
+
+
+def get_refresh_executor():
+    """
+    Returns:
+        ThreadPoolExecutor: Executor shared by all cached functions to
+        refresh stale values.
+    """
+    with refresh_executor["lock"]:
+        if refresh_executor["executor"] is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            refresh_executor["executor"] = ThreadPoolExecutor(
+                max_workers=cache_settings["refresh_workers"]
+            )
+        return refresh_executor["executor"]
+
+
+def schedule_refresh(function, cache_store, args, kwargs, state, key):
+    """
+    Refresh a cached value in background. A value already being refreshed
+    is not scheduled again.
+
+    Returns:
+        True if a refresh has been scheduled.
+    """
+    with state["lock"]:
+        if key in state["refreshing"]:
+            return False
+        state["refreshing"].add(key)
+
+    def refresh():
+        try:
+            insert_value(function, cache_store, args, kwargs, state)
+        except Exception:
+            # stale value stays until it is hard expired
+            pass
+        finally:
+            with state["lock"]:
+                state["refreshing"].discard(key)
+
+    try:
+        get_refresh_executor().submit(refresh)
+    except RuntimeError:
+        with state["lock"]:
+            state["refreshing"].discard(key)
+        return False
+    return True
+
+
 def is_cache_expired(memo, state, key):
     """
     Check if cache is expired (outdated) for given wrapper state and cache key.
@@ -140,38 +471,112 @@ def is_cache_expired(memo, state, key):
     return expire > 0 and date_to_check < datetime.datetime.now()
 
 
-def cache(function, maxsize=300, expire=120):
+def cache(
+    function, maxsize=300, expire=120, maxbytes=0, frozen=False, max_stale=0
+):
     """
     Decorator that generate cache wrapper and that adds cache feature to
     target function. A max cache size and and expiration time (in seconds) can
-    be set too.
+    be set too. Entries are evicted least recently used first. Cache store
+    is protected by a lock so the wrapper can be called from several
+    threads, the decorated function itself runs outside of the lock.
+
+    When max_stale is set, an expired value is still returned right away
+    during max_stale seconds and refreshed in background. Values older than
+    expire + max_stale are hard expired and fetched again by the caller.
 
     Args:
         function (func): Decorated function:
         maxsize: Number of value stored in cache (300 by default).
         expire: Time to live in seconds of stored value (disabled by default)
+        maxbytes: Estimated size of stored values (disabled by default).
+        frozen: Return read-only values instead of deep copies.
+        max_stale: Time in seconds an expired value can be returned while
+            it is refreshed (disabled by default).
     """
-    cache_store = {}
-    state = {"enabled": True, "expire": expire, "maxsize": maxsize}
+    cache_store = OrderedDict()
+    state = {
+        "enabled": True,
+        "expire": expire,
+        "maxsize": maxsize,
+        "maxbytes": maxbytes,
+        "frozen": frozen,
+        "lock": threading.RLock(),
+        "current_bytes": 0,
+        "ids": {},
+        "max_stale": max_stale,
+        "refreshing": set(),
+    }
 
-    statistics = {"hits": 0, "misses": 0, "expired_hits": 0}
+    statistics = {
+        "hits": 0,
+        "misses": 0,
+        "expired_hits": 0,
+        "stale_hits": 0,
+        "refreshes": 0,
+    }
 
-    def clear_cache():
-        cache_store.clear()
+    def clear_cache(client=None):
+        with state["lock"]:
+            if client is None:
+                removed = len(cache_store)
+                cache_store.clear()
+                state["ids"].clear()
+                state["current_bytes"] = 0
+                return removed
+            namespace = get_cache_namespace(client)
+            keys = [key for key in cache_store.keys() if key[0] == namespace]
+            for key in keys:
+                remove_entry(cache_store, key, state)
+            return len(keys)
+
+    def invalidate(model_id, client=None):
+        with state["lock"]:
+            keys = list(state["ids"].get(model_id, ()))
+            if client is not None:
+                namespace = get_cache_namespace(client)
+                keys = [key for key in keys if key[0] == namespace]
+            for key in keys:
+                remove_entry(cache_store, key, state)
+            return len(keys)
 
     def get_cache_infos():
-        size = {"current_size": len(cache_store)}
-        infos = {}
-        for d in [state, statistics, size]:
-            infos.update(d)
+        with state["lock"]:
+            size = {"current_size": len(cache_store)}
+            infos = {}
+            for d in [state, statistics, size]:
+                infos.update(d)
+        infos.pop("lock")
+        infos.pop("ids")
+        infos["refreshing"] = len(infos["refreshing"])
 
         return infos
 
     def set_expire(new_expire):
         state["expire"] = new_expire
 
+    def set_max_stale(max_stale):
+        state["max_stale"] = max_stale
+
     def set_max_size(maxsize):
-        state["maxsize"] = maxsize
+        with state["lock"]:
+            state["maxsize"] = maxsize
+            remove_oldest_entry(cache_store, maxsize, state["maxbytes"], state)
+
+    def set_max_bytes(maxbytes):
+        with state["lock"]:
+            state["maxbytes"] = maxbytes
+            if maxbytes > 0:
+                for entry in cache_store.values():
+                    if not entry["size"]:
+                        entry["size"] = get_value_size(entry["value"])
+                state["current_bytes"] = get_cache_bytes(cache_store)
+            remove_oldest_entry(cache_store, state["maxsize"], maxbytes, state)
+
+    def set_frozen(frozen):
+        with state["lock"]:
+            state["frozen"] = frozen
+            clear_cache()
 
     def enable_cache():
         state["enabled"] = True
@@ -182,30 +587,55 @@ def cache(function, maxsize=300, expire=120):
     @wraps(function)
     def wrapper(*args, **kwargs):
         if is_cache_enabled(state):
-            key = get_cache_key(args, kwargs)
+            if is_refreshing(kwargs):
+                with state["lock"]:
+                    statistics["refreshes"] += 1
+                return insert_value(function, cache_store, args, kwargs, state)
 
-            if key in cache_store:
-                if is_cache_expired(cache_store, state, key):
-                    statistics["expired_hits"] += 1
-                    return insert_value(function, cache_store, args, kwargs)
+            key = get_cache_key(args, kwargs)
+            # cached values do not come with a response digest
+            raw.response_state.digest = None
+
+            with state["lock"]:
+                entry = cache_store.get(key)
+                if entry is not None and entry["frozen"] != is_frozen(state):
+                    # frozen mode has been switched since value was stored
+                    remove_entry(cache_store, key, state)
+                    entry = None
+                is_stale = False
+                if entry is not None:
+                    if not is_cache_expired(cache_store, state, key):
+                        statistics["hits"] += 1
+                        cache_store.move_to_end(key)
+                        return get_value(cache_store, key)
+                    elif is_cache_stale(cache_store, state, key):
+                        statistics["stale_hits"] += 1
+                        cache_store.move_to_end(key)
+                        is_stale = True
+                        stale_value = get_value(cache_store, key)
+                    else:
+                        statistics["expired_hits"] += 1
                 else:
-                    statistics["hits"] += 1
-                    return get_value(cache_store, key)
+                    statistics["misses"] += 1
 
-            else:
-                statistics["misses"] += 1
-                returned_value = insert_value(
-                    function, cache_store, args, kwargs
+            if is_stale:
+                schedule_refresh(
+                    function, cache_store, args, kwargs, state, key
                 )
-                remove_oldest_entry(cache_store, state["maxsize"])
-                return returned_value
+                return stale_value
+
+            return insert_value(function, cache_store, args, kwargs, state)
 
         else:
             return function(*args, **kwargs)
 
     wrapper.set_cache_expire = set_expire
+    wrapper.set_cache_max_stale = set_max_stale
     wrapper.set_cache_max_size = set_max_size
+    wrapper.set_cache_max_bytes = set_max_bytes
+    wrapper.set_cache_frozen = set_frozen
     wrapper.clear_cache = clear_cache
+    wrapper.invalidate = invalidate
     wrapper.enable_cache = enable_cache
     wrapper.disable_cache = disable_cache
     wrapper.get_cache_infos = get_cache_infos
@@ -1,10 +1,16 @@
 import sys
+import base64
+import codecs
 import functools
+import hashlib
 import json
 import shutil
+import threading
 import urllib
 import os
 
+from collections import OrderedDict
+
 from .encoder import CustomJSONEncoder
 
 from .__version__ import __version__
@@ -15,6 +21,7 @@ from .exception import (
     NotAllowedException,
     MethodNotAllowedException,
     ParameterException,
+    RequestCancelledException,
     RouteNotFoundException,
     ServerErrorException,
     UploadFailedException,
@@ -28,6 +35,11 @@ else:
 
 DEBUG = os.getenv("GAZU_DEBUG", "false").lower() == "true"
 
+single_flight = {"enabled": False}
+in_flight_lock = threading.Lock()
+in_flight_requests = {}
+response_state = threading.local()
+
 
 class KitsuClient(object):
     def __init__(
@@ -37,6 +49,7 @@ class KitsuClient(object):
         cert=None,
         automatic_refresh_token=False,
         callback_not_authenticated=None,
+        transport=None,
     ):
         self.tokens = {"access_token": "", "refresh_token": ""}
         self.session = requests.Session()
@@ -46,6 +59,51 @@ class KitsuClient(object):
         self.event_host = host
         self.automatic_refresh_token = automatic_refresh_token
         self.callback_not_authenticated = callback_not_authenticated
+        self.timeout = None
+        self.cancellation_token = None
+        self.response_cache = OrderedDict()
+        self.response_cache_lock = threading.Lock()
+        self.response_cache_size = 64
+        self.refresh_cache = False
+        if transport is not None:
+            set_transport(client=self, **transport)
+
+
+class CancellationToken(object):
+    """
+    Token shared by clients whose requests can be cancelled together.
+    Once cancelled, requests started with it raise RequestCancelledException
+    and sessions of its clients are closed to drop kept-alive connections.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.clients = []
+
+    def register(self, client):
+        with self.lock:
+            if client not in self.clients:
+                self.clients.append(client)
+
+    def unregister(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        self.event.set()
+        with self.lock:
+            clients = list(self.clients)
+            self.clients = []
+        for client in clients:
+            try:
+                client.session.close()
+            except Exception:
+                pass
 
 
 def create_client(
@@ -54,6 +112,7 @@ def create_client(
     cert=None,
     automatic_refresh_token=False,
     callback_not_authenticated=None,
+    transport=None,
 ):
     return KitsuClient(
         host,
@@ -61,9 +120,71 @@ def create_client(
         cert=cert,
         automatic_refresh_token=automatic_refresh_token,
         callback_not_authenticated=callback_not_authenticated,
+        transport=transport,
     )
 
 
+def set_transport(
+    client=None,
+    pool_connections=10,
+    pool_maxsize=10,
+    retries=0,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503, 504),
+    connect_timeout=None,
+    read_timeout=None,
+):
+    """
+    Configure how given client talks to the server.
+
+    Args:
+        client (KitsuClient): The client to configure.
+        pool_connections (int): Number of hosts to keep connection pools for.
+        pool_maxsize (int): Number of connections kept open per host. It
+            should match the number of threads using the client at the same
+            time.
+        retries (int): Number of retries on connection errors and on
+            statuses in status_forcelist. Only GET and HEAD requests are
+            retried on read errors and statuses.
+        backoff_factor (float): Retry n waits backoff_factor * 2 ** (n - 1)
+            seconds.
+        status_forcelist (tuple): Statuses to retry on.
+        connect_timeout (float): Seconds to wait for connection to the
+            server.
+        read_timeout (float): Seconds to wait for the server to send data.
+
+    Returns:
+        KitsuClient: The configured client.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    if client is None:
+        client = default_client
+    max_retries = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+    )
+    client.session.mount("http://", adapter)
+    client.session.mount("https://", adapter)
+    if connect_timeout is None and read_timeout is None:
+        client.timeout = None
+    else:
+        client.timeout = (connect_timeout, read_timeout)
+    return client
+
+
 default_client = None
 try:
     import requests
@@ -78,13 +199,77 @@ except Exception:
     print("Warning, running in setup mode!")
 
 
+def set_cancellation_token(token, client=default_client):
+    """
+    Make requests of given client cancellable through given token.
+
+    Args:
+        token (CancellationToken): The token, None to make requests not
+            cancellable.
+    """
+    if client.cancellation_token is not None:
+        client.cancellation_token.unregister(client)
+    client.cancellation_token = token
+    if token is not None:
+        token.register(client)
+    return client.cancellation_token
+
+
+def set_timeout(timeout, client=default_client):
+    """
+    Set default timeout for requests of given client.
+
+    Args:
+        timeout (float / tuple): Seconds to wait for the server, or
+            (connect, read) tuple. None waits forever.
+    """
+    client.timeout = timeout
+    return client.timeout
+
+
+def get_timeout(timeout=None, client=default_client):
+    """
+    Returns:
+        Given timeout, or default timeout of the client if not given.
+    """
+    if timeout is None:
+        return client.timeout
+    return timeout
+
+
+def send_request(method, url, path, client=default_client, **kwargs):
+    """
+    Send a request with given session method, unless the cancellation token
+    of the client has been cancelled. Request is cancelled too if the token
+    is cancelled while it's running.
+
+    Returns:
+        Response: The request response.
+
+    Raises:
+        RequestCancelledException: when the token is cancelled
+    """
+    token = client.cancellation_token
+    if token is not None and token.is_cancelled():
+        raise RequestCancelledException(path)
+    try:
+        response = method(url, **kwargs)
+    except Exception:
+        if token is not None and token.is_cancelled():
+            raise RequestCancelledException(path)
+        raise
+    if token is not None and token.is_cancelled():
+        raise RequestCancelledException(path)
+    return response
+
+
 def host_is_up(client=default_client):
     """
     Returns:
         True if the host is up.
     """
     try:
-        response = client.session.head(client.host)
+        response = client.session.head(client.host, timeout=client.timeout)
     except Exception:
         return False
     return response.status_code == 200
@@ -162,7 +347,10 @@ def make_auth_header(client=default_client):
     Returns:
         Headers required to authenticate.
     """
-    headers = {"User-Agent": "CGWire Gazu %s" % __version__}
+    headers = {
+        "User-Agent": "CGWire Gazu %s" % __version__,
+        "Accept-Encoding": "gzip, deflate",
+    }
     if "access_token" in client.tokens:
         headers["Authorization"] = "Bearer %s" % client.tokens["access_token"]
     return headers
@@ -211,31 +399,345 @@ def build_path_with_params(path, params):
     return path
 
 
-def get(path, json_response=True, params=None, client=default_client):
+def enable_single_flight():
+    """
+    Make concurrent identical get requests share one HTTP call. Requests
+    are identical when they target the same path, on the same host, for the
+    same user.
+    """
+    single_flight["enabled"] = True
+    return single_flight["enabled"]
+
+
+def disable_single_flight():
+    """
+    Make every get request run its own HTTP call.
+    """
+    single_flight["enabled"] = False
+    return single_flight["enabled"]
+
+
+def client_identity(client=default_client):
+    """
+    Args:
+        client (KitsuClient): The client to identify.
+
+    Returns:
+        tuple: Host and user the client is authenticated as. User is read
+        from access token without verifying it, raw token is used if it
+        can't be decoded.
+    """
+    access_token = client.tokens.get("access_token", "") or ""
+    user = access_token
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode("ascii")))
+        user = claims.get("sub") or claims.get("identity") or access_token
+    except Exception:
+        pass
+    return (client.host, user)
+
+
+def get(
+    path, json_response=True, params=None, client=default_client, timeout=None
+):
     """
     Run a get request toward given path for configured host.
 
+    When single flight is enabled, a request identical to one already in
+    progress waits for it and gets its own copy of the result.
+
+    Args:
+        timeout (float / tuple): Overrides default timeout of the client.
+
     Returns:
         The request result.
     """
     if DEBUG:
         print("GET", get_full_url(path, client))
     path = build_path_with_params(path, params)
+    response_state.digest = None
+
+    if not single_flight["enabled"]:
+        text, digest = get_text(path, client=client, timeout=timeout)
+    else:
+        text, digest = get_shared_text(path, client=client, timeout=timeout)
+    response_state.digest = digest
+
+    # every caller parses the body so results are never shared
+    if json_response:
+        return json.loads(text)
+    else:
+        return text
+
+
+def get_shared_text(path, client=default_client, timeout=None):
+    """
+    Same as get_text but a request identical to one already in progress
+    waits for it instead of being sent again. If that request is cancelled,
+    waiting requests that are not cancelled are sent again.
+    """
+    key = (client_identity(client), path)
+    with in_flight_lock:
+        call = in_flight_requests.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = {
+                "done": threading.Event(),
+                "text": None,
+                "digest": None,
+                "error": None,
+            }
+            in_flight_requests[key] = call
+
+    if is_leader:
+        try:
+            call["text"], call["digest"] = get_text(
+                path, client=client, timeout=timeout
+            )
+        except Exception as exception:
+            call["error"] = exception
+            raise
+        finally:
+            with in_flight_lock:
+                in_flight_requests.pop(key, None)
+            call["done"].set()
+    else:
+        token = client.cancellation_token
+        while not call["done"].wait(0.5):
+            if token is not None and token.is_cancelled():
+                raise RequestCancelledException(path)
+        if isinstance(call["error"], RequestCancelledException):
+            # the leader gave up on its own, which says nothing about
+            # this request: send it again, possibly leading this time
+            return get_shared_text(path, client=client, timeout=timeout)
+        if call["error"] is not None:
+            raise call["error"]
+    return call["text"], call["digest"]
+
+
+def get_text(path, client=default_client, timeout=None):
+    """
+    Run a get request toward given path, which already includes its
+    parameters. If a previous response to the same url came with an ETag or
+    a Last-Modified header, the request is conditional and a 304 response is
+    served from the response cache of the client.
+
+    Returns:
+        tuple: Body of the response and its digest.
+    """
+    url = get_full_url(path, client=client)
+    with client.response_cache_lock:
+        entry = client.response_cache.get(url)
+        if entry is not None:
+            client.response_cache.move_to_end(url)
+
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get_response(
+        path, client=client, timeout=timeout, headers=headers
+    )
+    if response.status_code == 304 and entry is not None:
+        return entry["text"], entry["digest"]
+
+    text = get_response_text(response)
+    digest = hashlib.sha1(response.content).hexdigest()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    with client.response_cache_lock:
+        if (etag or last_modified) and client.response_cache_size > 0:
+            client.response_cache[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "text": text,
+                "digest": digest,
+            }
+            client.response_cache.move_to_end(url)
+            while len(client.response_cache) > client.response_cache_size:
+                client.response_cache.popitem(last=False)
+        else:
+            client.response_cache.pop(url, None)
+    return text, digest
+
+
+def get_response_text(response):
+    """
+    Kitsu always answers UTF-8 JSON, decoding it as such avoids charset
+    detection requests runs on bodies without charset header.
+
+    Returns:
+        str: Body of the response.
+    """
+    return response.content.decode("utf-8")
+
+
+def get_iter(path, params=None, client=default_client, timeout=None):
+    """
+    Run a get request toward given path, which has to return a JSON list,
+    and yield its items while the body is downloaded. Only a few items are
+    decoded and kept in memory at a time.
+
+    Requests are neither conditional nor shared with other callers and
+    they do not set last_response_digest.
+
+    Args:
+        timeout (float / tuple): Overrides default timeout of the client.
+
+    Yields:
+        Items of the returned list.
+    """
+    if DEBUG:
+        print("GET", get_full_url(path, client))
+    path = build_path_with_params(path, params)
+    response = get_response(path, client=client, timeout=timeout, stream=True)
+    try:
+        for item in iter_json_list(
+            response.iter_content(chunk_size=65536), path
+        ):
+            yield item
+    finally:
+        response.close()
+
+
+def iter_json_list(chunks, path=""):
+    """
+    Decode a JSON list from given chunks of UTF-8 bytes.
+
+    Yields:
+        Items of the list, as soon as they are complete.
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+    finished = False
+    chunks = iter(chunks)
+
+    while True:
+        chunk = next(chunks, None)
+        if chunk is None:
+            finished = True
+            buffer += utf8_decoder.decode(b"", final=True)
+        else:
+            buffer += utf8_decoder.decode(chunk)
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("%s did not return a list" % path)
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if finished:
+                    raise
+                break
+            if end >= len(buffer) and not finished:
+                # a number may go on in the next chunk
+                break
+            position = end
+            yield item
+
+        if finished:
+            raise ValueError("%s returned an incomplete list" % path)
+        buffer = buffer[position:]
+        position = 0
+
+
+def last_response_digest():
+    """
+    Returns:
+        str: Digest of the body of the last get request run by current
+        thread, None if it failed. Same bodies give same digests, so callers
+        can skip processing results that did not change.
+    """
+    return getattr(response_state, "digest", None)
+
+
+def set_response_cache_size(size, client=default_client):
+    """
+    Set how many responses with validators the client keeps to answer
+    conditional requests. 0 disables conditional requests.
+    """
+    with client.response_cache_lock:
+        client.response_cache_size = size
+        while len(client.response_cache) > max(size, 0):
+            client.response_cache.popitem(last=False)
+    return client.response_cache_size
+
+
+def set_cache_refresh(refresh, client=default_client):
+    """
+    Make cached functions called with this client skip cached values: they
+    always reach the server and store their result for other clients of the
+    same host and user. Meant for clients of background loops, so their
+    requests keep the cache warm and still come with a response digest.
+    """
+    client.refresh_cache = refresh
+    return client.refresh_cache
+
+
+def clear_response_cache(client=default_client):
+    with client.response_cache_lock:
+        client.response_cache.clear()
+
+
+def get_response(
+    path, client=default_client, timeout=None, headers=None, stream=False
+):
+    """
+    Run a get request toward given path, which already includes its
+    parameters, for configured host.
+
+    Args:
+        headers (dict): Headers to send along the authentication header.
+        stream (bool): Do not download the body of successful responses
+            right away.
+
+    Returns:
+        Response: The validated response.
+    """
     retry = True
     while retry:
-        response = client.session.get(
+        request_headers = make_auth_header(client=client)
+        request_headers.update(headers or {})
+        response = send_request(
+            client.session.get,
             get_full_url(path, client=client),
-            headers=make_auth_header(client=client),
+            path,
+            client=client,
+            headers=request_headers,
+            timeout=get_timeout(timeout, client),
+            stream=stream,
         )
-        _, retry = check_status(response, path, client=client)
-
-    if json_response:
-        return response.json()
-    else:
-        return response.text
+        if response.status_code in [401, 422]:
+            # give the connection back to the pool before the token is
+            # refreshed and the request is sent again
+            response.close()
+        try:
+            _, retry = check_status(response, path, client=client)
+        except Exception:
+            response.close()
+            raise
+    return response
 
 
-def post(path, data, client=default_client):
+def post(path, data, client=default_client, timeout=None):
     """
     Run a post request toward given path for configured host.
 
@@ -248,10 +750,14 @@ def post(path, data, client=default_client):
             print("Body:", data)
     retry = True
     while retry:
-        response = client.session.post(
+        response = send_request(
+            client.session.post,
             get_full_url(path, client),
+            path,
+            client=client,
             json=data,
             headers=make_auth_header(client=client),
+            timeout=get_timeout(timeout, client),
         )
         _, retry = check_status(response, path, client=client)
     try:
@@ -262,7 +768,7 @@ def post(path, data, client=default_client):
     return result
 
 
-def put(path, data, client=default_client):
+def put(path, data, client=default_client, timeout=None):
     """
     Run a put request toward given path for configured host.
 
@@ -274,16 +780,20 @@ def put(path, data, client=default_client):
         print("Body:", data)
     retry = True
     while retry:
-        response = client.session.put(
+        response = send_request(
+            client.session.put,
             get_full_url(path, client),
+            path,
+            client=client,
             json=data,
             headers=make_auth_header(client=client),
+            timeout=get_timeout(timeout, client),
         )
         _, retry = check_status(response, path, client=client)
     return response.json()
 
 
-def delete(path, params=None, client=default_client):
+def delete(path, params=None, client=default_client, timeout=None):
     """
     Run a delete request toward given path for configured host.
 
@@ -296,8 +806,13 @@ def delete(path, params=None, client=default_client):
 
     retry = True
     while retry:
-        response = client.session.delete(
-            get_full_url(path, client), headers=make_auth_header(client=client)
+        response = send_request(
+            client.session.delete,
+            get_full_url(path, client),
+            path,
+            client=client,
+            headers=make_auth_header(client=client),
+            timeout=get_timeout(timeout, client),
         )
         _, retry = check_status(response, path, client=client)
     return response.text
@@ -357,7 +872,7 @@ def check_status(request, path, client=None):
                 if retry:
                     return status_code, True
             raise
-    elif status_code in [500, 502]:
+    elif status_code in [500, 502, 503, 504]:
         try:
             stacktrace = request.json().get(
                 "stacktrace", "No stacktrace sent by the server"
@@ -374,7 +889,7 @@ def check_status(request, path, client=None):
     return status_code, False
 
 
-def fetch_all(path, params=None, client=default_client):
+def fetch_all(path, params=None, client=default_client, timeout=None):
     """
     Args:
         path (str): The path for which we want to retrieve all entries.
@@ -383,10 +898,134 @@ def fetch_all(path, params=None, client=default_client):
         list: All entries stored in database for a given model. You can add a
         filter to the model name like this: "tasks?project_id=project-id"
     """
-    return get(url_path_join("data", path), params=params, client=client)
+    return get(
+        url_path_join("data", path),
+        params=params,
+        client=client,
+        timeout=timeout,
+    )
 
 
-def fetch_first(path, params=None, client=default_client):
+def fetch_all_iter(path, params=None, client=default_client, timeout=None):
+    """
+    Args:
+        path (str): The path for which we want to retrieve all entries.
+        params (dict): The parameters to pass to the request.
+
+    Yields:
+        dict: Entries of given path, while they are downloaded.
+    """
+    return get_iter(
+        url_path_join("data", path),
+        params=params,
+        client=client,
+        timeout=timeout,
+    )
+
+
+def fetch_many(
+    path,
+    values,
+    field="id",
+    params=None,
+    client=default_client,
+    chunk_size=50,
+    timeout=None,
+):
+    """
+    Retrieve entries of given path whose field matches one of given values,
+    with one request per chunk of values instead of one request per value.
+
+    Args:
+        path (str): The path for which we want to retrieve entries.
+        values (list): Values (or dicts with an id) to match.
+        field (str): The field to filter on.
+        params (dict): Other parameters to pass to the requests.
+        chunk_size (int): Number of values sent per request, it keeps urls
+            short enough for servers and proxies.
+
+    Returns:
+        list: Entries matching given values.
+    """
+    values = unique_values(values)
+    entries = []
+    for index in range(0, len(values), chunk_size):
+        chunk = values[index : index + chunk_size]
+        chunk_params = dict(params or {})
+        chunk_params[field] = json.dumps(chunk)
+        chunk_values = set(chunk)
+        entries.extend(
+            entry
+            for entry in fetch_all(
+                path, params=chunk_params, client=client, timeout=timeout
+            )
+            # entries are filtered again in case filter is not supported
+            if entry.get(field) in chunk_values
+        )
+    return entries
+
+
+def fetch_many_by_id(
+    model_name,
+    ids,
+    client=default_client,
+    chunk_size=50,
+    timeout=None,
+    fetch_missing=False,
+):
+    """
+    Args:
+        model_name (str): Model type name.
+        ids (list): IDs (or dicts with an id) of entries to retrieve.
+        fetch_missing (bool): Fetch one by one the IDs list requests did not
+            return, in case the route does not filter on lists of values.
+
+    Returns:
+        dict: Entries found, keyed by their ID. Missing IDs are left out.
+    """
+    entries = {
+        entry["id"]: entry
+        for entry in fetch_many(
+            model_name,
+            ids,
+            client=client,
+            chunk_size=chunk_size,
+            timeout=timeout,
+        )
+    }
+    if fetch_missing:
+        for model_id in unique_values(ids):
+            if model_id in entries:
+                continue
+            try:
+                entries[model_id] = fetch_one(
+                    model_name, model_id, client=client, timeout=timeout
+                )
+            except RouteNotFoundException:
+                # deleted meanwhile
+                pass
+    return entries
+
+
+def unique_values(values):
+    """
+    Returns:
+        list: Given values, or IDs of given dicts, without duplicates and
+        None values, in their original order.
+    """
+    result = []
+    seen = set()
+    for value in values:
+        if isinstance(value, dict):
+            value = value.get("id")
+        if value is None or value in seen:
+            continue
+        seen.add(value)
+        result.append(value)
+    return result
+
+
+def fetch_first(path, params=None, client=default_client, timeout=None):
     """
     Args:
         path (str): The path for which we want to retrieve the first entry.
@@ -394,14 +1033,19 @@ def fetch_first(path, params=None, client=default_client):
     Returns:
         dict: The first entry for which a model is required.
     """
-    entries = get(url_path_join("data", path), params=params, client=client)
+    entries = get(
+        url_path_join("data", path),
+        params=params,
+        client=client,
+        timeout=timeout,
+    )
     if len(entries) > 0:
         return entries[0]
     else:
         return None
 
 
-def fetch_one(model_name, id, client=default_client):
+def fetch_one(model_name, id, client=default_client, timeout=None):
     """
     Function dedicated at targeting routes that returns a single model
     instance.
@@ -413,7 +1057,9 @@ def fetch_one(model_name, id, client=default_client):
     Returns:
         dict: The model instance matching id and model name.
     """
-    return get(url_path_join("data", model_name, id), client=client)
+    return get(
+        url_path_join("data", model_name, id), client=client, timeout=timeout
+    )
 
 
 def create(model_name, data, client=default_client):
@@ -447,7 +1093,14 @@ def update(model_name, model_id, data, client=default_client):
     )
 
 
-def upload(path, file_path, data={}, extra_files=[], client=default_client):
+def upload(
+    path,
+    file_path,
+    data={},
+    extra_files=[],
+    client=default_client,
+    timeout=None,
+):
     """
     Upload file located at *file_path* to given url *path*.
 
@@ -462,11 +1115,15 @@ def upload(path, file_path, data={}, extra_files=[], client=default_client):
     files = _build_file_dict(file_path, extra_files)
     retry = True
     while retry:
-        response = client.session.post(
+        response = send_request(
+            client.session.post,
             url,
+            path,
+            client=client,
             data=data,
             headers=make_auth_header(client=client),
             files=files,
+            timeout=get_timeout(timeout, client),
         )
         _, retry = check_status(response, path, client=client)
     try:
@@ -488,7 +1145,9 @@ def _build_file_dict(file_path, extra_files):
     return files
 
 
-def download(path, file_path, params=None, client=default_client):
+def download(
+    path, file_path, params=None, client=default_client, timeout=None
+):
     """
     Download file located at *file_path* to given url *path*.
 
@@ -501,17 +1160,23 @@ def download(path, file_path, params=None, client=default_client):
 
     """
     path = build_path_with_params(path, params)
-    with client.session.get(
+    with send_request(
+        client.session.get,
         get_full_url(path, client),
+        path,
+        client=client,
         headers=make_auth_header(client=client),
         stream=True,
+        timeout=get_timeout(timeout, client),
     ) as response:
         with open(file_path, "wb") as target_file:
             shutil.copyfileobj(response.raw, target_file)
         return response
 
 
-def get_file_data_from_url(url, full=False, client=default_client):
+def get_file_data_from_url(
+    url, full=False, client=default_client, timeout=None
+):
     """
     Return data found at given url.
     """
@@ -519,10 +1184,14 @@ def get_file_data_from_url(url, full=False, client=default_client):
         url = get_full_url(url)
     retry = True
     while retry:
-        response = requests.get(
+        response = send_request(
+            requests.get,
+            url,
             url,
+            client=client,
             stream=True,
             headers=make_auth_header(client=client),
+            timeout=get_timeout(timeout, client),
         )
         _, retry = check_status(response, url, client=client)
     return response.content
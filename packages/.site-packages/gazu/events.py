@@ -41,7 +41,9 @@ def init(
     )
     event_client.on("connect_error", connect_error)
     event_client.register_namespace(EventsNamespace("/events"))
-    event_client.connect(get_event_host(client), make_auth_header())
+    event_client.connect(
+        get_event_host(client), make_auth_header(client=client)
+    )
     return event_client
 
 
@@ -87,3 +87,10 @@ class ProjectDoesntExistException(Exception):
     """
     Error raised when a project isn't available.
     """
+
+
+class RequestCancelledException(Exception):
+    """
+    Error raised when a request is cancelled through the cancellation token
+    of its client.
+    """
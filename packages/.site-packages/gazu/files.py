@@ -175,6 +175,26 @@ def get_all_preview_files_for_task(task, client=default):
     )
 
 
+def get_preview_files_for_tasks(tasks, client=default):
+    """
+    Retrieves preview files of given tasks, a few requests for all of them.
+
+    Args:
+        tasks (list): Target tasks (or their IDs).
+
+    Returns:
+        dict: Lists of preview files keyed by task ID. Tasks without
+        preview files get an empty list.
+    """
+    task_ids = raw.unique_values(tasks)
+    preview_files_by_task_id = {task_id: [] for task_id in task_ids}
+    for preview_file in raw.fetch_many(
+        "preview-files", task_ids, field="task_id", client=client
+    ):
+        preview_files_by_task_id[preview_file["task_id"]].append(preview_file)
+    return preview_files_by_task_id
+
+
 @cache
 def get_all_attachment_files_for_task(task, client=default):
     """
@@ -34,6 +34,23 @@ def all_shots_for_project(project, client=default):
     return sort_by_name(shots)
 
 
+def iter_shots_for_project(project, client=default):
+    """
+    Same as all_shots_for_project, but shots are yielded in server order
+    while they are downloaded. Results are not cached.
+
+    Args:
+        project (str / dict): The project dict or the project ID.
+
+    Yields:
+        dict: Shots for given project.
+    """
+    project = normalize_model_parameter(project)
+    return raw.fetch_all_iter(
+        "projects/%s/shots" % project["id"], client=client
+    )
+
+
 @cache
 def all_shots_for_episode(episode, client=default):
     """
@@ -166,6 +183,22 @@ def get_sequence(sequence_id, client=default):
     return raw.fetch_one("sequences", sequence_id, client=client)
 
 
+def get_sequences(sequence_ids, client=default):
+    """
+    Args:
+        sequence_ids (list): IDs (or dicts) of claimed sequences.
+
+    Returns:
+        dict: Sequences found, keyed by their ID, a few requests for all of
+        them. They come from the same route as get_sequence. IDs the route
+        does not return for a list of IDs are fetched one by one, deleted
+        sequences are left out.
+    """
+    return raw.fetch_many_by_id(
+        "sequences", sequence_ids, client=client, fetch_missing=True
+    )
+
+
 @cache
 def get_sequence_by_name(project, sequence_name, episode=None, client=default):
     """
@@ -212,6 +245,22 @@ def get_shot(shot_id, client=default):
     return raw.fetch_one("shots", shot_id, client=client)
 
 
+def get_shots(shot_ids, client=default):
+    """
+    Args:
+        shot_ids (list): IDs (or dicts) of claimed shots.
+
+    Returns:
+        dict: Shots found, keyed by their ID, a few requests for all of
+        them. They come from the same route as get_shot. IDs the route
+        does not return for a list of IDs are fetched one by one, deleted
+        shots are left out.
+    """
+    return raw.fetch_many_by_id(
+        "shots", shot_ids, client=client, fetch_missing=True
+    )
+
+
 @cache
 def get_shot_by_name(sequence, shot_name, client=default):
     """
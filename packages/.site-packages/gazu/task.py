@@ -618,6 +618,18 @@ def get_task(task_id, client=default):
     return raw.get("data/tasks/%s/full" % task_id["id"], client=client)
 
 
+def get_tasks(task_ids, client=default):
+    """
+    Args:
+        task_ids (list): IDs (or dicts) of claimed tasks.
+
+    Returns:
+        dict: Tasks found, keyed by their ID, a few requests for all of
+        them. Unlike get_task, related models are given by their IDs only.
+    """
+    return raw.fetch_many_by_id("tasks", task_ids, client=client)
+
+
 def new_task(
     entity,
     task_type,
@@ -1273,6 +1285,34 @@ def all_tasks_for_project(
     return raw.get(path, params=params, client=client)
 
 
+def iter_tasks_for_project(
+    project, task_type=None, episode=None, client=default
+):
+    """
+    Same as all_tasks_for_project, but tasks are yielded while they are
+    downloaded so the whole list is never held in memory. Results are not
+    cached.
+
+    Args:
+        project (str / dict): The project (or its ID) to get tasks from.
+        task_type (str / dict): The task type (or its ID) to filter tasks.
+        episode (str / dict): The episode (or its ID) to filter tasks.
+
+    Yields:
+        dict: Tasks related to given project.
+    """
+    project = normalize_model_parameter(project)
+    path = "/data/projects/%s/tasks" % project["id"]
+    params = {}
+    if task_type is not None:
+        task_type = normalize_model_parameter(task_type)
+        params["task_type_id"] = task_type["id"]
+    if episode is not None:
+        episode = normalize_model_parameter(episode)
+        params["episode_id"] = episode["id"]
+    return raw.get_iter(path, params=params, client=client)
+
+
 def update_comment(comment, client=default):
     """
     Save given comment data into the API. Metadata are fully replaced by the ones
@@ -0,0 +1,21 @@
+import os
+import ssl
+import sys
+import types
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# gazu and its dependencies are vendored next to the plugin,
+# the plugin itself is imported from the repository root
+sys.path.insert(0, os.path.join(root, "packages", ".site-packages"))
+sys.path.insert(0, root)
+
+try:
+    import certifi  # noqa: F401
+except ImportError:
+    # requests only asks certifi where CA bundle is. Flame python ships
+    # it, plain interpreters running tests may not, and tests never
+    # open real connections, so system bundle is good enough
+    certifi = types.ModuleType("certifi")
+    certifi.where = lambda: ssl.get_default_verify_paths().cafile or ""
+    sys.modules["certifi"] = certifi
@@ -0,0 +1,113 @@
+import itertools
+import queue
+import threading
+import types
+
+import gazu
+
+from flameMenuKITSU import flameKitsuConnector
+
+
+class FakeGazu(object):
+    """
+    Stands for gazu module in connector. Functions are given by their
+    dotted name, like "shot.get_shots", and every call is recorded in
+    calls. Exceptions and raw client are the real ones.
+    """
+
+    def __init__(self, functions=None):
+        self.calls = []
+        self.exception = gazu.exception
+        self.client = gazu.client
+        self.aio = None
+        self.cache = types.SimpleNamespace(
+            invalidate=self.recorded("cache.invalidate", lambda *a, **k: 0)
+        )
+        for name, function in (functions or {}).items():
+            self.set(name, function)
+
+    def set(self, name, function):
+        module_name, function_name = name.split(".")
+        module = getattr(self, module_name, None)
+        if module is None:
+            module = types.SimpleNamespace()
+            setattr(self, module_name, module)
+        setattr(module, function_name, self.recorded(name, function))
+
+    def recorded(self, name, function):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return function(*args, **kwargs)
+
+        return call
+
+    def called(self, name):
+        return [call for call in self.calls if call[0] == name]
+
+
+def make_connector(fake_gazu=None, project_id="project", user_id="user"):
+    """
+    Connector with its pipeline data and fetch queue but without
+    Flame, login, loops and fetch workers.
+    """
+    connector = flameKitsuConnector.__new__(flameKitsuConnector)
+    connector.name = "flameKitsuConnector"
+    connector.log = lambda message: None
+    connector.log_debug = lambda message: None
+    connector.gazu = fake_gazu or FakeGazu()
+    connector.gazu_client = None
+    connector.user = {"id": user_id}
+    connector.linked_project_id = project_id
+    connector.shot_code_field = None
+    connector.prefs_global = {}
+    connector.threads = True
+    connector.fetch_queue = queue.PriorityQueue()
+    connector.fetch_queue_counter = itertools.count()
+    connector.fetch_jobs_lock = threading.Lock()
+    connector.entity_jobs = {}
+    connector.host_semaphores = {}
+    connector.host_semaphores_lock = threading.Lock()
+    connector.pipeline_data_lock = threading.RLock()
+    connector.pipeline_generation = itertools.count(1)
+    connector.pipeline_data_listeners = []
+    connector.init_pipeline_data()
+    client = types.SimpleNamespace(host="http://kitsu.test/api/")
+    connector.get_loop_client = lambda loop_name: client
+    return connector
+
+
+def start_fetch_workers(connector, count=2):
+    """
+    Run fetch workers of connector. Returned function stops them.
+    """
+    workers = [
+        threading.Thread(target=connector.fetch_worker_loop, args=(index,))
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    def stop():
+        connector.threads = False
+        for worker in workers:
+            worker.join(5)
+
+    return stop
+
+
+def load_pipeline_data(connector, **lists):
+    """
+    Publish given lists as connector pipeline data, indexed the way a
+    full refresh does it.
+    """
+
+    def update(data):
+        data["current_project"] = {"id": connector.linked_project_id}
+        data.update(lists)
+        connector.index_pipeline_data(
+            data,
+            decorated=("all_assets_for_project", "all_shots_for_project"),
+        )
+
+    return connector.update_pipeline_data(update)
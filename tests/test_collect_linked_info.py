@@ -0,0 +1,144 @@
+import unittest
+
+from gazu.exception import (
+    NotAllowedException,
+    RequestCancelledException,
+    RouteNotFoundException,
+)
+
+from connector import (
+    FakeGazu,
+    load_pipeline_data,
+    make_connector,
+    start_fetch_workers,
+)
+
+
+def task(task_id, entity_id, name, preview=True):
+    return {
+        "id": task_id,
+        "name": name,
+        "entity_id": entity_id,
+        "task_type_id": "tt1",
+        "task_status_id": "ts1",
+        "last_preview_file_id": "p-" + task_id if preview else None,
+    }
+
+
+class CollectLinkedInfoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tasks = [
+            task("t2", "s1", "lighting"),
+            task("t1", "s1", "Comp"),
+            task("t3", "a1", "Model", preview=False),
+        ]
+        self.gazu = FakeGazu(
+            {
+                "task.iter_tasks_for_project": self.iter_tasks,
+                "files.get_preview_files_for_tasks": self.previews,
+                "task.all_tasks_for_shot": lambda shot, client: [],
+                "task.all_tasks_for_asset": lambda asset, client: [],
+            }
+        )
+        self.connector = make_connector(self.gazu)
+        self.stop_workers = start_fetch_workers(self.connector)
+        load_pipeline_data(
+            self.connector,
+            all_shots_for_project=[
+                {"id": "s1", "name": "SH010", "code": "SH010", "type": "Shot"},
+                {"id": "s2", "name": "SH020", "code": "SH020", "type": "Shot"},
+            ],
+            all_assets_for_project=[
+                {"id": "a1", "name": "chair", "code": "chair", "type": "Asset"}
+            ],
+            all_task_types_for_project=[{"id": "tt1", "name": "Comp"}],
+            all_task_statuses_for_project=[
+                {"id": "ts1", "name": "Todo", "short_name": "todo"}
+            ],
+        )
+
+    def tearDown(self):
+        self.stop_workers()
+
+    def iter_tasks(self, project, client=None):
+        for item in self.tasks:
+            yield dict(item)
+
+    def previews(self, task_ids, client=None):
+        return {x: [{"id": "p-" + x, "task_id": x}] for x in task_ids}
+
+    @property
+    def data(self):
+        return self.connector.pipeline_data
+
+    def test_tasks_and_previews_are_published_once(self):
+        generation = self.data["generation"]
+        self.connector.collect_linked_info()
+
+        self.assertEqual(self.data["generation"], generation + 1)
+        tasks_by_entity_id = self.data["tasks_by_entity_id"]
+        self.assertEqual(
+            [x["id"] for x in tasks_by_entity_id["s1"]], ["t1", "t2"]
+        )
+        self.assertEqual(tasks_by_entity_id["s1"][0]["task_type_name"], "Comp")
+        self.assertEqual(tasks_by_entity_id["s2"], [])
+        self.assertEqual(
+            self.data["preview_by_task_id"],
+            {
+                "t1": [{"id": "p-t1", "task_id": "t1"}],
+                "t2": [{"id": "p-t2", "task_id": "t2"}],
+                "t3": [],
+            },
+        )
+        # task without preview file is not asked for
+        asked = set()
+        for call in self.gazu.called("files.get_preview_files_for_tasks"):
+            asked.update(call[1][0])
+        self.assertEqual(asked, {"t1", "t2"})
+
+        self.connector.collect_linked_info()
+        self.assertEqual(self.data["generation"], generation + 1)
+
+    def test_entity_whose_last_task_was_deleted_is_emptied(self):
+        self.connector.collect_linked_info()
+        self.tasks = [x for x in self.tasks if x["entity_id"] != "a1"]
+        self.connector.collect_linked_info()
+        self.assertEqual(self.data["tasks_by_entity_id"]["a1"], [])
+        self.assertEqual(
+            [x["id"] for x in self.data["tasks_by_entity_id"]["s1"]],
+            ["t1", "t2"],
+        )
+
+    def fail_with(self, exception):
+        def iter_tasks(project, client=None):
+            yield dict(self.tasks[0])
+            raise exception
+
+        self.gazu.set("task.iter_tasks_for_project", iter_tasks)
+
+    def test_transient_errors_are_left_to_scheduler(self):
+        self.fail_with(IOError("read timed out"))
+        with self.assertRaises(IOError):
+            self.connector.collect_linked_info()
+        self.assertEqual(self.gazu.called("task.all_tasks_for_shot"), [])
+        self.assertEqual(self.data["tasks_by_entity_id"], {})
+
+    def test_cancellation_is_raised(self):
+        self.fail_with(RequestCancelledException("data/tasks"))
+        with self.assertRaises(RequestCancelledException):
+            self.connector.collect_linked_info()
+        self.assertEqual(self.gazu.called("task.all_tasks_for_shot"), [])
+
+    def test_unsupported_route_falls_back_to_entities(self):
+        for exception in (
+            RouteNotFoundException("data/tasks"),
+            NotAllowedException("data/tasks"),
+        ):
+            self.fail_with(exception)
+            self.connector.collect_linked_info()
+        shots = [
+            call[1][0]["id"]
+            for call in self.gazu.called("task.all_tasks_for_shot")
+        ]
+        self.assertEqual(sorted(shots), ["s1", "s1", "s2", "s2"])
+        self.assertEqual(self.data["tasks_by_entity_id"]["a1"], [])
@@ -0,0 +1,82 @@
+import asyncio
+import types
+import unittest
+
+from gazu import aio
+
+from connector import FakeGazu, make_connector
+
+
+class EpisodesContentTestCase(unittest.TestCase):
+    def setUp(self):
+        self.episodes = [
+            {"id": "e%s" % n, "name": "E%s" % n} for n in range(6)
+        ]
+        self.gazu = FakeGazu(
+            {
+                "shot.all_episodes_for_project": lambda project, client: [
+                    dict(x) for x in self.episodes
+                ],
+                "shot.all_shots_for_episode": self.shots_for_episode,
+                "asset.all_assets_for_episode": self.assets_for_episode,
+            }
+        )
+        self.connector = make_connector(self.gazu)
+
+    def shots_for_episode(self, episode, client=None):
+        return [{"id": episode["id"] + "-shot", "type": "Shot"}]
+
+    def assets_for_episode(self, episode, client=None):
+        return [{"id": episode["id"] + "-asset", "type": "Asset"}]
+
+    def assertEpisodesCollected(self):
+        episodes = self.connector.pipeline_data["all_episodes_for_project"]
+        self.assertEqual(
+            [x["id"] for x in episodes], ["e%s" % n for n in range(6)]
+        )
+        for episode in episodes:
+            self.assertEqual(
+                list(episode["shots_by_id"].keys()), [episode["id"] + "-shot"]
+            )
+            self.assertEqual(
+                list(episode["assets_by_id"].keys()),
+                [episode["id"] + "-asset"],
+            )
+        index = self.connector.pipeline_data["pipeline_index"]
+        self.assertEqual(index.episode_id_by_entity_id["e3-shot"], "e3")
+        # nothing waits for fetch workers
+        self.assertTrue(self.connector.fetch_queue.empty())
+
+    def test_episodes_are_fetched_one_by_one_without_aio(self):
+        self.connector.collect_pipeline_data()
+        self.assertEpisodesCollected()
+        calls = self.gazu.called("shot.all_shots_for_episode")
+        self.assertEqual(len(calls), 6)
+
+    def test_episodes_are_gathered_with_bounded_concurrency(self):
+        state = {"running": 0, "max_running": 0}
+
+        def concurrent(function):
+            async def call(episode, client=None):
+                state["running"] += 1
+                state["max_running"] = max(
+                    state["max_running"], state["running"]
+                )
+                await asyncio.sleep(0.01)
+                state["running"] -= 1
+                return function(episode, client)
+
+            return call
+
+        self.gazu.aio = types.SimpleNamespace(
+            run=aio.run,
+            gather=aio.gather,
+            last_response_digest=lambda: "digest",
+            all_shots_for_episode=concurrent(self.shots_for_episode),
+            all_assets_for_episode=concurrent(self.assets_for_episode),
+        )
+        self.connector.prefs_global["fetch_concurrency"] = 2
+        self.connector.collect_pipeline_data()
+        self.assertEpisodesCollected()
+        self.assertEqual(state["max_running"], 2)
+        self.assertEqual(self.gazu.called("shot.all_shots_for_episode"), [])
@@ -0,0 +1,45 @@
+import unittest
+
+import gazu
+
+from connector import FakeGazu, make_connector
+
+
+class ConnectorGazuCacheTestCase(unittest.TestCase):
+    menu_functions = [
+        gazu.project.all_open_projects,
+        gazu.project.get_project,
+        gazu.task.all_task_types_for_project,
+        gazu.task.all_task_statuses_for_project,
+    ]
+
+    def setUp(self):
+        self.connector = make_connector(FakeGazu())
+        self.connector.gazu = gazu
+
+    def tearDown(self):
+        gazu.cache.disable()
+        for function in self.menu_functions:
+            function.set_cache_max_stale(0)
+
+    def test_cache_is_enabled_with_stale_menu_reads(self):
+        self.connector.prefs_global.update(
+            gazu_cache=True, gazu_cache_max_stale=30
+        )
+        self.connector.set_gazu_cache()
+        self.assertTrue(gazu.cache.cache_settings["enabled"])
+        for function in self.menu_functions:
+            self.assertEqual(function.get_cache_infos()["max_stale"], 30)
+        self.assertEqual(
+            gazu.shot.all_shots_for_project.get_cache_infos()["max_stale"], 0
+        )
+
+    def test_cache_can_be_turned_off(self):
+        gazu.cache.enable()
+        self.connector.prefs_global["gazu_cache"] = False
+        self.connector.set_gazu_cache()
+        self.assertFalse(gazu.cache.cache_settings["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
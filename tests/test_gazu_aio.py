@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import unittest
+
+from gazu import aio
+from gazu import client as raw
+
+from transport import FakeResponse, FakeSession
+
+
+class GatherTestCase(unittest.TestCase):
+    def test_results_keep_order_and_concurrency_is_bounded(self):
+        state = {"running": 0, "max_running": 0}
+
+        async def job(number):
+            state["running"] += 1
+            state["max_running"] = max(
+                state["max_running"], state["running"]
+            )
+            await asyncio.sleep(0.01 * (5 - number % 5))
+            state["running"] -= 1
+            return number
+
+        results = aio.run(
+            aio.gather([job(n) for n in range(20)], concurrency=3)
+        )
+        self.assertEqual(results, list(range(20)))
+        self.assertEqual(state["max_running"], 3)
+
+    def test_exceptions_can_be_returned(self):
+        async def fail():
+            raise ValueError("failed")
+
+        async def succeed():
+            return 1
+
+        results = aio.run(
+            aio.gather([fail(), succeed()], return_exceptions=True)
+        )
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(results[1], 1)
+        with self.assertRaises(ValueError):
+            aio.run(aio.gather([fail(), succeed()]))
+
+    def test_run_can_be_called_from_several_threads(self):
+        results = []
+
+        async def job(number):
+            await asyncio.sleep(0.01)
+            return number
+
+        def run(number):
+            results.append(aio.run(aio.gather([job(number)])))
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(results), [[0], [1], [2], [3]])
+
+
+@unittest.skipIf(aio.has_native_transport(), "requests go through aiohttp")
+class ThreadTransportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = raw.create_client("http://kitsu.test/api")
+        self.client.tokens = {"access_token": "token"}
+        self.client.session = FakeSession(self.handler)
+
+    def handler(self, url, **kwargs):
+        episode_id = url.split("/")[-2]
+        return FakeResponse(
+            body=[{"id": episode_id + "-shot", "name": "SH010"}]
+        )
+
+    def test_requests_run_on_thread_pool_with_digests(self):
+        async def episode_shots(episode_id):
+            shots = await aio.all_shots_for_episode(
+                {"id": episode_id}, client=self.client
+            )
+            return shots, aio.last_response_digest()
+
+        results = aio.run(
+            aio.gather([episode_shots("e%s" % n) for n in range(5)])
+        )
+        self.assertEqual(
+            [shots[0]["id"] for shots, _ in results],
+            ["e%s-shot" % n for n in range(5)],
+        )
+        self.assertEqual(len(self.client.session.calls), 5)
+        for _, digest in results:
+            self.assertTrue(digest)
@@ -0,0 +1,302 @@
+import threading
+import time
+import unittest
+
+from gazu import cache
+from gazu import client as raw
+
+
+class CountingFunction(object):
+    """
+    Stand-in for a gazu function: returns what values gives for an
+    argument and counts the calls that reach it.
+    """
+
+    def __init__(self, values=None):
+        self.values = values or {}
+        self.calls = []
+
+    def __call__(self, argument, client=None):
+        if isinstance(argument, dict):
+            argument = argument["id"]
+        self.calls.append(argument)
+        return self.values.get(argument, {"name": argument})
+
+
+class BaseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        cache.enable()
+
+    def tearDown(self):
+        cache.disable()
+
+
+class LruEvictionTestCase(BaseCacheTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        function = CountingFunction()
+        cached = cache.cache(function, maxsize=2, expire=0)
+        cached("a")
+        cached("b")
+        cached("a")
+        cached("c")
+        self.assertEqual(function.calls, ["a", "b", "c"])
+
+        cached("a")
+        cached("c")
+        self.assertEqual(function.calls, ["a", "b", "c"])
+        cached("b")
+        self.assertEqual(function.calls, ["a", "b", "c", "b"])
+        self.assertEqual(cached.get_cache_infos()["current_size"], 2)
+
+    def test_shrinking_max_size_evicts_oldest_entries(self):
+        function = CountingFunction()
+        cached = cache.cache(function, maxsize=3, expire=0)
+        for argument in ["a", "b", "c"]:
+            cached(argument)
+        cached.set_cache_max_size(1)
+        cached("c")
+        self.assertEqual(function.calls, ["a", "b", "c"])
+        cached("a")
+        self.assertEqual(function.calls, ["a", "b", "c", "a"])
+
+
+class ByteAccountingTestCase(BaseCacheTestCase):
+    def setUp(self):
+        super(ByteAccountingTestCase, self).setUp()
+        self.values = {
+            "a": {"name": "a" * 10},
+            "b": {"name": "b" * 20},
+            "c": {"name": "c" * 30},
+        }
+        self.sizes = dict(
+            (key, cache.get_value_size(value))
+            for key, value in self.values.items()
+        )
+
+    def test_current_bytes_follow_stored_values(self):
+        cached = cache.cache(
+            CountingFunction(self.values), maxsize=0, expire=0, maxbytes=1000
+        )
+        cached("a")
+        cached("b")
+        self.assertEqual(
+            cached.get_cache_infos()["current_bytes"],
+            self.sizes["a"] + self.sizes["b"],
+        )
+        cached.clear_cache()
+        self.assertEqual(cached.get_cache_infos()["current_bytes"], 0)
+
+    def test_oldest_entries_are_evicted_over_max_bytes(self):
+        function = CountingFunction(self.values)
+        maxbytes = self.sizes["b"] + self.sizes["c"]
+        cached = cache.cache(function, maxsize=0, expire=0, maxbytes=maxbytes)
+        cached("a")
+        cached("b")
+        cached("c")
+
+        infos = cached.get_cache_infos()
+        self.assertEqual(infos["current_size"], 2)
+        self.assertEqual(
+            infos["current_bytes"], self.sizes["b"] + self.sizes["c"]
+        )
+        cached("b")
+        cached("c")
+        self.assertEqual(function.calls, ["a", "b", "c"])
+
+    def test_entry_bigger_than_max_bytes_is_kept_alone(self):
+        cached = cache.cache(
+            CountingFunction(self.values), maxsize=0, expire=0, maxbytes=1
+        )
+        cached("a")
+        cached("c")
+        infos = cached.get_cache_infos()
+        self.assertEqual(infos["current_size"], 1)
+        self.assertEqual(infos["current_bytes"], self.sizes["c"])
+
+
+class ReturnedValuesTestCase(BaseCacheTestCase):
+    def test_returned_values_are_copies(self):
+        cached = cache.cache(CountingFunction(), expire=0)
+        value = cached("a")
+        value["name"] = "changed"
+        self.assertEqual(cached("a"), {"name": "a"})
+
+    def test_frozen_values_are_read_only(self):
+        function = CountingFunction({"a": {"items": [{"id": 1}]}})
+        cached = cache.cache(function, expire=0, frozen=True)
+        value = cached("a")
+        self.assertIs(cached("a"), value)
+        self.assertIsInstance(value["items"], tuple)
+        with self.assertRaises(TypeError):
+            value["items"] = []
+
+
+class CacheKeyTestCase(BaseCacheTestCase):
+    shot_id = "8f3b2d3e-35d4-4b76-9a52-1b0cc2cbd0a1"
+
+    def test_model_dict_and_id_share_entry(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        cached({"id": self.shot_id, "name": "SH010", "data": {"a": 1}})
+        cached(self.shot_id)
+        cached({"id": self.shot_id})
+        self.assertEqual(len(function.calls), 1)
+        self.assertEqual(cached.get_cache_infos()["current_size"], 1)
+
+    def test_keys_of_lists_and_plain_dicts(self):
+        key = cache.get_cache_key(
+            ([{"id": self.shot_id}, self.shot_id], {"b": 2, "a": 1}), {}
+        )
+        self.assertEqual(
+            key[1],
+            ((self.shot_id, self.shot_id), ("dict", '{"a": 1, "b": 2}')),
+        )
+        hash(key)
+
+    def test_equal_scalars_of_other_types_do_not_share_entry(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        for argument in [1, True, 1.0, "1"]:
+            cached(argument)
+        self.assertEqual(len(function.calls), 4)
+        self.assertEqual(cached.get_cache_infos()["current_size"], 4)
+
+    def test_string_starting_with_id_is_not_a_model(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        cached(self.shot_id)
+        cached(self.shot_id + "-suffix")
+        self.assertEqual(len(function.calls), 2)
+        self.assertEqual(
+            cache.get_argument_key(self.shot_id + "-suffix"),
+            ("str", self.shot_id + "-suffix"),
+        )
+        self.assertEqual(cached.invalidate(self.shot_id), 1)
+        self.assertEqual(cached.get_cache_infos()["current_size"], 1)
+
+
+class NamespaceTestCase(BaseCacheTestCase):
+    shot_id = "8f3b2d3e-35d4-4b76-9a52-1b0cc2cbd0a1"
+    task_id = "0c6a3f09-91f5-4a3e-8d4c-3c2a3f9c7e11"
+
+    def setUp(self):
+        super(NamespaceTestCase, self).setUp()
+        self.client = raw.create_client("http://kitsu.test/api")
+        self.client.tokens = {"access_token": "token-a"}
+        self.other_client = raw.create_client("http://kitsu.test/api")
+        self.other_client.tokens = {"access_token": "token-b"}
+
+    def test_clients_do_not_share_values(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        cached("a", client=self.client)
+        cached("a", client=self.other_client)
+        cached("a", client=self.client)
+        self.assertEqual(function.calls, ["a", "a"])
+
+    def test_invalidate_by_argument_id(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        cached(self.shot_id, client=self.client)
+        cached("a", client=self.client)
+        self.assertEqual(cached.invalidate(self.shot_id), 1)
+        cached(self.shot_id, client=self.client)
+        cached("a", client=self.client)
+        self.assertEqual(function.calls, [self.shot_id, "a", self.shot_id])
+
+    def test_invalidate_by_result_id(self):
+        function = CountingFunction(
+            {self.shot_id: [{"id": self.task_id}, {"id": "other"}]}
+        )
+        cached = cache.cache(function, expire=0)
+        cached(self.shot_id, client=self.client)
+        self.assertEqual(cache.invalidate(self.task_id), 1)
+        self.assertEqual(cache.invalidate(self.task_id), 0)
+        cached(self.shot_id, client=self.client)
+        self.assertEqual(function.calls, [self.shot_id, self.shot_id])
+
+    def test_invalidate_for_one_client(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        cached(self.shot_id, client=self.client)
+        cached(self.shot_id, client=self.other_client)
+        self.assertEqual(
+            cached.invalidate(self.shot_id, client=self.other_client), 1
+        )
+        cached(self.shot_id, client=self.client)
+        self.assertEqual(len(function.calls), 2)
+        cached(self.shot_id, client=self.other_client)
+        self.assertEqual(len(function.calls), 3)
+
+    def test_clear_cache_for_one_client(self):
+        cached = cache.cache(CountingFunction(), expire=0)
+        cached("a", client=self.client)
+        cached("b", client=self.client)
+        cached("a", client=self.other_client)
+        self.assertEqual(cached.clear_cache(client=self.client), 2)
+        self.assertEqual(cached.get_cache_infos()["current_size"], 1)
+
+
+    def test_refreshing_client_skips_and_stores_values(self):
+        function = CountingFunction()
+        cached = cache.cache(function, expire=0)
+        loop_client = raw.create_client("http://kitsu.test/api")
+        loop_client.tokens = self.client.tokens
+        raw.set_cache_refresh(True, client=loop_client)
+        cached("a", client=self.client)
+        cached("a", client=loop_client)
+        cached("a", client=loop_client)
+        self.assertEqual(function.calls, ["a", "a", "a"])
+        self.assertEqual(cached.get_cache_infos()["refreshes"], 2)
+        # refreshed value is served to clients of the same user
+        cached("a", client=self.client)
+        self.assertEqual(len(function.calls), 3)
+        self.assertEqual(cached.get_cache_infos()["current_size"], 1)
+
+
+class StaleWhileRevalidateTestCase(BaseCacheTestCase):
+    def setUp(self):
+        super(StaleWhileRevalidateTestCase, self).setUp()
+        self.release = threading.Event()
+        self.refreshed = threading.Event()
+        self.versions = []
+
+    def versioned(self, argument, client=None):
+        if self.versions:
+            # refreshes wait until test lets them through
+            self.release.wait(5)
+        self.versions.append(argument)
+        self.refreshed.set()
+        return {"name": argument, "version": len(self.versions)}
+
+    def wait_refresh(self, cached):
+        deadline = time.time() + 5
+        while cached.get_cache_infos()["refreshing"]:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_stale_value_is_returned_and_refreshed(self):
+        cached = cache.cache(self.versioned, expire=0.05, max_stale=10)
+        self.assertEqual(cached("a")["version"], 1)
+        time.sleep(0.1)
+
+        self.refreshed.clear()
+        self.assertEqual(cached("a")["version"], 1)
+        self.assertEqual(cached("a")["version"], 1)
+        infos = cached.get_cache_infos()
+        self.assertEqual(infos["stale_hits"], 2)
+        self.assertEqual(infos["refreshing"], 1)
+
+        self.release.set()
+        self.assertTrue(self.refreshed.wait(5))
+        self.wait_refresh(cached)
+        self.assertEqual(cached("a")["version"], 2)
+        self.assertEqual(len(self.versions), 2)
+
+    def test_hard_expired_value_is_fetched(self):
+        self.release.set()
+        cached = cache.cache(self.versioned, expire=0.05, max_stale=0.05)
+        cached("a")
+        time.sleep(0.15)
+        self.assertEqual(cached("a")["version"], 2)
+        self.assertEqual(cached.get_cache_infos()["stale_hits"], 0)
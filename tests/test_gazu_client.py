@@ -0,0 +1,400 @@
+import json
+import threading
+import time
+import unittest
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+import gazu
+from gazu import client as raw
+
+from transport import FakeResponse, FakeSession
+
+
+class BaseClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = raw.create_client("http://kitsu.test/api")
+        self.client.tokens = {"access_token": "token"}
+
+
+class TransportTestCase(BaseClientTestCase):
+    def test_adapter_is_mounted_with_pool_and_retries(self):
+        raw.set_transport(
+            client=self.client,
+            pool_connections=2,
+            pool_maxsize=16,
+            retries=3,
+            backoff_factor=0.5,
+            status_forcelist=(503,),
+        )
+        for prefix in ["http://", "https://"]:
+            adapter = self.client.session.get_adapter(prefix + "kitsu.test")
+            self.assertEqual(adapter._pool_connections, 2)
+            self.assertEqual(adapter._pool_maxsize, 16)
+            self.assertEqual(adapter.max_retries.total, 3)
+            self.assertEqual(adapter.max_retries.backoff_factor, 0.5)
+            self.assertEqual(adapter.max_retries.status_forcelist, (503,))
+            self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+        self.assertIsNone(self.client.timeout)
+
+    def test_timeouts_are_set_on_client(self):
+        raw.set_transport(
+            client=self.client, connect_timeout=3, read_timeout=30
+        )
+        self.assertEqual(self.client.timeout, (3, 30))
+        self.assertEqual(raw.get_timeout(client=self.client), (3, 30))
+        self.assertEqual(raw.get_timeout(5, client=self.client), 5)
+
+    def test_client_is_created_with_transport(self):
+        client = raw.create_client(
+            "http://kitsu.test/api",
+            transport={"pool_maxsize": 4, "read_timeout": 10},
+        )
+        adapter = client.session.get_adapter("http://kitsu.test")
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(client.timeout, (None, 10))
+
+
+class SingleFlightTestCase(BaseClientTestCase):
+    def setUp(self):
+        super(SingleFlightTestCase, self).setUp()
+        self.release = threading.Event()
+        self.client.session = FakeSession(self.blocking_handler)
+        raw.enable_single_flight()
+
+    def tearDown(self):
+        raw.disable_single_flight()
+        self.release.set()
+
+    def blocking_handler(self, url, **kwargs):
+        self.release.wait(5)
+        return FakeResponse(body=[{"id": "a"}])
+
+    def test_identical_requests_share_one_call(self):
+        results = []
+        errors = []
+
+        def run():
+            try:
+                results.append(raw.get("data/shots", client=self.client))
+            except Exception as exception:
+                errors.append(exception)
+
+        threads = [threading.Thread(target=run) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while not raw.in_flight_requests or not self.client.session.calls:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        # followers are waiting on the leader's request by now
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.client.session.calls), 1)
+        self.assertEqual(results, [[{"id": "a"}]] * 5)
+        # every caller gets its own copy
+        self.assertEqual(len(set(id(result) for result in results)), 5)
+        self.assertEqual(raw.in_flight_requests, {})
+
+    def test_followers_retry_when_leader_is_cancelled(self):
+        leader = raw.create_client("http://kitsu.test/api")
+        leader.tokens = self.client.tokens
+        leader.session = self.client.session
+        token = raw.CancellationToken()
+        raw.set_cancellation_token(token, client=leader)
+        results = {}
+
+        def run(name, client):
+            try:
+                results[name] = raw.get("data/shots", client=client)
+            except Exception as exception:
+                results[name] = exception
+
+        leader_thread = threading.Thread(target=run, args=("leader", leader))
+        leader_thread.start()
+        deadline = time.time() + 5
+        while not self.client.session.calls:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        follower_thread = threading.Thread(
+            target=run, args=("follower", self.client)
+        )
+        follower_thread.start()
+        time.sleep(0.1)
+        token.cancel()
+        self.release.set()
+        leader_thread.join(5)
+        follower_thread.join(5)
+
+        self.assertIsInstance(
+            results["leader"], gazu.exception.RequestCancelledException
+        )
+        self.assertEqual(results["follower"], [{"id": "a"}])
+        self.assertEqual(len(self.client.session.calls), 2)
+        self.assertEqual(raw.in_flight_requests, {})
+
+    def test_users_do_not_share_calls(self):
+        self.release.set()
+        other_client = raw.create_client("http://kitsu.test/api")
+        other_client.tokens = {"access_token": "other-token"}
+        other_client.session = self.client.session
+        raw.get("data/shots", client=self.client)
+        raw.get("data/shots", client=other_client)
+        self.assertEqual(len(self.client.session.calls), 2)
+
+
+class ConditionalGetTestCase(BaseClientTestCase):
+    def test_not_modified_response_reuses_cached_body(self):
+        self.client.session = FakeSession(
+            responses=[
+                FakeResponse(body=[{"id": "a"}], headers={"ETag": '"v1"'}),
+                FakeResponse(status_code=304),
+            ]
+        )
+        first = raw.get("data/shots", client=self.client)
+        first_digest = raw.last_response_digest()
+        second = raw.get("data/shots", client=self.client)
+
+        self.assertEqual(second, first)
+        self.assertEqual(raw.last_response_digest(), first_digest)
+        calls = self.client.session.calls
+        self.assertNotIn("If-None-Match", calls[0][1]["headers"])
+        self.assertEqual(calls[1][1]["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(
+            calls[1][1]["headers"]["Authorization"], "Bearer token"
+        )
+
+    def test_modified_response_replaces_cached_body(self):
+        self.client.session = FakeSession(
+            responses=[
+                FakeResponse(
+                    body=[{"id": "a"}],
+                    headers={"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+                ),
+                FakeResponse(body=[{"id": "b"}], headers={"ETag": '"v2"'}),
+                FakeResponse(status_code=304),
+            ]
+        )
+        raw.get("data/shots", client=self.client)
+        self.assertEqual(
+            raw.get("data/shots", client=self.client), [{"id": "b"}]
+        )
+        self.assertEqual(
+            raw.get("data/shots", client=self.client), [{"id": "b"}]
+        )
+        calls = self.client.session.calls
+        self.assertEqual(
+            calls[1][1]["headers"]["If-Modified-Since"],
+            "Mon, 01 Jan 2024 00:00:00 GMT",
+        )
+        self.assertEqual(calls[2][1]["headers"]["If-None-Match"], '"v2"')
+
+    def test_responses_without_validators_are_not_cached(self):
+        self.client.session = FakeSession(
+            responses=[FakeResponse(body=[]), FakeResponse(body=[])]
+        )
+        raw.get("data/shots", client=self.client)
+        raw.get("data/shots", client=self.client)
+        self.assertNotIn(
+            "If-None-Match", self.client.session.calls[1][1]["headers"]
+        )
+        self.assertEqual(len(self.client.response_cache), 0)
+
+
+class StreamedListTestCase(BaseClientTestCase):
+    entries = [
+        {"id": "a", "name": "Plan séquence ✓", "frames": 1200},
+        {"id": "b", "data": {"tags": ["x", "y"], "note": "a, b ] c"}},
+        12345,
+        [],
+        None,
+    ]
+
+    def test_list_is_decoded_on_every_chunk_boundary(self):
+        body = json.dumps(self.entries, ensure_ascii=False).encode("utf-8")
+        for chunk_size in range(1, len(body) + 1):
+            chunks = [
+                body[index : index + chunk_size]
+                for index in range(0, len(body), chunk_size)
+            ]
+            self.assertEqual(
+                list(raw.iter_json_list(chunks)),
+                self.entries,
+                "chunk size %s" % chunk_size,
+            )
+
+    def test_whitespace_and_empty_lists(self):
+        self.assertEqual(list(raw.iter_json_list([b" [ ", b"] \n"])), [])
+        self.assertEqual(
+            list(raw.iter_json_list([b"[1", b"2 ,", b" 3]"])), [12, 3]
+        )
+
+    def test_incomplete_list_raises(self):
+        with self.assertRaises(ValueError):
+            list(raw.iter_json_list([b'[{"id": "a"}, {"id"']))
+        with self.assertRaises(ValueError):
+            list(raw.iter_json_list([b'[{"id": "a"}']))
+        with self.assertRaises(ValueError):
+            list(raw.iter_json_list([b'{"id": "a"}']))
+
+    def test_items_are_yielded_before_body_ends(self):
+        def chunks():
+            yield b'[{"id": "a"}, '
+            raise AssertionError("body read too early")
+
+        items = raw.iter_json_list(chunks())
+        self.assertEqual(next(items), {"id": "a"})
+
+    def test_get_iter_streams_and_closes_response(self):
+        response = FakeResponse(body=self.entries)
+        self.client.session = FakeSession(responses=[response])
+        items = list(
+            raw.get_iter("data/shots", {"a": 1}, client=self.client)
+        )
+        self.assertEqual(items, self.entries)
+        self.assertTrue(response.closed)
+        url, kwargs = self.client.session.calls[0]
+        self.assertEqual(url, "http://kitsu.test/api/data/shots?a=1")
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(
+            kwargs["headers"]["Accept-Encoding"], "gzip, deflate"
+        )
+
+    def test_get_iter_closes_rejected_response_before_retry(self):
+        rejected = FakeResponse(status_code=401)
+        response = FakeResponse(body=self.entries)
+        self.client.session = FakeSession(responses=[rejected, response])
+        self.client.callback_not_authenticated = lambda client, path: True
+        self.assertEqual(
+            list(raw.get_iter("data/shots", client=self.client)),
+            self.entries,
+        )
+        self.assertTrue(rejected.closed)
+        self.assertTrue(response.closed)
+        self.assertEqual(len(self.client.session.calls), 2)
+
+    def test_get_iter_closes_failed_response(self):
+        response = FakeResponse(status_code=404)
+        self.client.session = FakeSession(responses=[response])
+        with self.assertRaises(raw.RouteNotFoundException):
+            list(raw.get_iter("data/shots", client=self.client))
+        self.assertTrue(response.closed)
+
+
+class FetchManyTestCase(BaseClientTestCase):
+    def setUp(self):
+        super(FetchManyTestCase, self).setUp()
+        self.client.session = FakeSession(self.filtering_handler)
+
+    def filtering_handler(self, url, **kwargs):
+        query = parse_qs(urlparse(url).query)
+        ids = json.loads(query["id"][0])
+        # server also answers an entry that was not asked for
+        return FakeResponse(
+            body=[{"id": value, "name": value.upper()} for value in ids]
+            + [{"id": "unrelated"}]
+        )
+
+    def requested_ids(self):
+        return [
+            json.loads(parse_qs(urlparse(url).query)["id"][0])
+            for url, _ in self.client.session.calls
+        ]
+
+    def test_ids_are_split_across_chunks(self):
+        entries = raw.fetch_many(
+            "shots",
+            ["a", {"id": "b"}, "c", "a", None, "d", "e"],
+            params={"project_id": "p"},
+            client=self.client,
+            chunk_size=2,
+        )
+        self.assertEqual(
+            self.requested_ids(), [["a", "b"], ["c", "d"], ["e"]]
+        )
+        self.assertEqual(
+            [entry["id"] for entry in entries], ["a", "b", "c", "d", "e"]
+        )
+        for url, _ in self.client.session.calls:
+            url = urlparse(url)
+            self.assertEqual(url.path, "/api/data/shots")
+            self.assertEqual(parse_qs(url.query)["project_id"], ["p"])
+
+    def test_no_request_without_ids(self):
+        self.assertEqual(
+            raw.fetch_many("shots", [None], client=self.client), []
+        )
+        self.assertEqual(self.client.session.calls, [])
+
+    def test_fetch_many_by_id(self):
+        entries = raw.fetch_many_by_id(
+            "assets", ["x", "y", "x"], client=self.client, chunk_size=50
+        )
+        self.assertEqual(self.requested_ids(), [["x", "y"]])
+        self.assertEqual(
+            entries,
+            {"x": {"id": "x", "name": "X"}, "y": {"id": "y", "name": "Y"}},
+        )
+
+
+class FetchMissingTestCase(BaseClientTestCase):
+    shot_ids = [
+        "5a0b1c3e-0000-4000-8000-000000000001",
+        "5a0b1c3e-0000-4000-8000-000000000002",
+        "5a0b1c3e-0000-4000-8000-000000000003",
+    ]
+
+    def setUp(self):
+        super(FetchMissingTestCase, self).setUp()
+        self.shots = {
+            shot_id: {"id": shot_id, "name": "SH%s" % number}
+            for number, shot_id in enumerate(self.shot_ids[:2])
+        }
+        self.filtered = True
+        self.client.session = FakeSession(self.handler)
+
+    def handler(self, url, **kwargs):
+        url = urlparse(url)
+        if url.path == "/api/data/shots":
+            if not self.filtered:
+                # older servers compare list to each value
+                return FakeResponse(body=[])
+            ids = json.loads(parse_qs(url.query)["id"][0])
+            return FakeResponse(
+                body=[self.shots[x] for x in ids if x in self.shots]
+            )
+        shot_id = url.path.split("/")[-1]
+        if shot_id not in self.shots:
+            return FakeResponse(status_code=404)
+        return FakeResponse(body=self.shots[shot_id])
+
+    def test_ids_filtered_by_route_are_not_fetched_again(self):
+        shots = gazu.shot.get_shots(self.shot_ids[:2], client=self.client)
+        self.assertEqual(shots, self.shots)
+        self.assertEqual(len(self.client.session.calls), 1)
+
+    def test_ids_missing_from_list_are_fetched_one_by_one(self):
+        self.filtered = False
+        shots = gazu.shot.get_shots(self.shot_ids, client=self.client)
+        self.assertEqual(shots, self.shots)
+        paths = [urlparse(url).path for url, _ in self.client.session.calls]
+        self.assertEqual(
+            paths,
+            ["/api/data/shots"]
+            + ["/api/data/shots/%s" % x for x in self.shot_ids],
+        )
+
+    def test_fetch_many_by_id_leaves_missing_ids_out_by_default(self):
+        self.filtered = False
+        self.assertEqual(
+            raw.fetch_many_by_id("shots", self.shot_ids, client=self.client),
+            {},
+        )
+        self.assertEqual(len(self.client.session.calls), 1)
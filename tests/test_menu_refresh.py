@@ -0,0 +1,91 @@
+import sys
+import types
+import unittest
+
+from flameMenuKITSU import flameMenuRefresh
+
+
+class flameMenuPublisher(object):
+    name = "Publish"
+
+    def __init__(self):
+        self.batch_name = "batch_a"
+
+    def flame_inputs(self):
+        return (True, self.batch_name)
+
+    def menu_inputs(self, pipeline_data):
+        return pipeline_data.get("generation")
+
+
+class MenuRefreshPollTestCase(unittest.TestCase):
+    def setUp(self):
+        self.idle_events = []
+        self.flame = types.ModuleType("flame")
+        self.flame.schedule_idle_event = self.idle_events.append
+        self.saved_flame = sys.modules.get("flame")
+        sys.modules["flame"] = self.flame
+
+        self.app = flameMenuPublisher()
+        self.framework = types.SimpleNamespace(
+            prefs_global={
+                # timers are driven by the test
+                "menu_refresh_poll_interval": 0,
+                "menu_refresh_min_interval": 0,
+            },
+            prefs_revision=0,
+            apps=[self.app],
+            log_debug=lambda message: None,
+        )
+        self.connector = types.SimpleNamespace(
+            pipeline_data={"generation": 1},
+            user={"id": "user"},
+            linked_project_id="project",
+        )
+        self.refresh = flameMenuRefresh(self.framework, self.connector)
+        self.refresh.built("media_panel")
+
+    def tearDown(self):
+        self.refresh.stop()
+        if self.saved_flame is None:
+            sys.modules.pop("flame", None)
+        else:
+            sys.modules["flame"] = self.saved_flame
+
+    def test_unchanged_flame_inputs_schedule_nothing(self):
+        self.refresh.poll()
+        self.assertIsNone(self.refresh.timer)
+
+    def test_batch_switch_schedules_check(self):
+        self.app.batch_name = "batch_b"
+        self.refresh.poll()
+        self.assertIsNotNone(self.refresh.timer)
+        self.refresh.timer.join(1)
+        self.assertEqual(self.idle_events, [self.refresh.idle_check])
+
+    def test_pipeline_data_is_not_read_by_poll(self):
+        self.connector.pipeline_data = {"generation": 2}
+        self.refresh.poll()
+        self.assertIsNone(self.refresh.timer)
+
+    def test_flame_inputs_are_part_of_built_state(self):
+        self.assertEqual(
+            self.refresh.built_flame_states["media_panel"],
+            ((True, "batch_a"),),
+        )
+        self.app.batch_name = "batch_b"
+        self.assertNotEqual(
+            self.refresh.get_state("media_panel"),
+            self.refresh.built_states["media_panel"],
+        )
+
+    def test_poll_is_rearmed_and_cancelled_on_stop(self):
+        self.framework.prefs_global["menu_refresh_poll_interval"] = 60
+        self.refresh.poll()
+        self.assertIsNotNone(self.refresh.poll_timer)
+        self.refresh.stop()
+        self.assertIsNone(self.refresh.poll_timer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import unittest
+
+from connector import FakeGazu, load_pipeline_data, make_connector
+
+
+def event(name, **data):
+    return {"name": name, "data": data}
+
+
+class ApplyPipelineEventsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = {
+            "shots": {},
+            "assets": {},
+            "sequences": {},
+            "tasks": {},
+            "previews": {},
+        }
+        self.gazu = FakeGazu(
+            {
+                "shot.get_shots": self.get_many("shots"),
+                "shot.get_sequences": self.get_many("sequences"),
+                "asset.get_assets": self.get_many("assets"),
+                "task.get_tasks": self.get_many("tasks"),
+                "task.all_task_types_for_project": lambda project, client: [
+                    {"id": "tt2", "name": "Comp"}
+                ],
+                "files.get_preview_files_for_tasks": lambda ids, client: {
+                    x: self.server["previews"].get(x, []) for x in ids
+                },
+            }
+        )
+        self.connector = make_connector(self.gazu)
+        self.task = {
+            "id": "t1",
+            "name": "Comp",
+            "entity_id": "s1",
+            "task_type_id": "tt1",
+            "task_status_id": "ts1",
+            "assignees": ["user"],
+        }
+        load_pipeline_data(
+            self.connector,
+            all_sequences_for_project=[
+                {"id": "q1", "name": "SQ01", "type": "Sequence"}
+            ],
+            all_shots_for_project=[
+                self.shot("s1", "SH010"),
+                self.shot("s2", "SH020"),
+            ],
+            all_assets_for_project=[
+                {"id": "a1", "name": "chair", "code": "chair", "type": "Asset"}
+            ],
+            all_task_types_for_project=[{"id": "tt1", "name": "Comp"}],
+            all_task_statuses_for_project=[
+                {"id": "ts1", "name": "Todo", "short_name": "todo"}
+            ],
+            project_tasks_for_person=[self.task],
+            tasks_by_entity_id={"s1": [self.task], "s2": []},
+            preview_by_task_id={"t1": []},
+            digests={"all_shots_for_project": "digest"},
+        )
+        self.generation = self.connector.pipeline_data["generation"]
+
+    def shot(self, shot_id, name, parent_id="q1"):
+        return {
+            "id": shot_id,
+            "name": name,
+            "code": name,
+            "type": "Shot",
+            "parent_id": parent_id,
+        }
+
+    def get_many(self, kind):
+        def get(ids, client=None):
+            found = self.server[kind]
+            return {x: found[x] for x in ids if x in found}
+
+        return get
+
+    def apply(self, *events):
+        return self.connector.apply_pipeline_events(list(events), None)
+
+    @property
+    def data(self):
+        return self.connector.pipeline_data
+
+    def test_updated_shot_is_patched(self):
+        self.server["shots"]["s1"] = self.shot("s1", "SH015", parent_id="q2")
+        self.assertTrue(self.apply(event("shot:update", shot_id="s1")))
+
+        shots = {x["id"]: x for x in self.data["all_shots_for_project"]}
+        self.assertEqual(shots["s1"]["code"], "SH015")
+        self.assertEqual(shots["s1"]["type"], "Shot")
+        self.assertIs(self.data["entity_by_id"]["s1"], shots["s1"])
+        index = self.data["pipeline_index"]
+        self.assertIs(index.entity_by_code["SH015"], shots["s1"])
+        self.assertNotIn("SH010", index.entity_by_code)
+        self.assertEqual(
+            [x["id"] for x in index.shots_by_sequence_id["q2"]], ["s1"]
+        )
+        self.assertEqual(self.data["digests"], {})
+        self.assertEqual(self.data["generation"], self.generation + 1)
+
+    def test_new_shot_is_added(self):
+        self.server["shots"]["s3"] = self.shot("s3", "SH030")
+        self.assertTrue(self.apply(event("shot:new", shot_id="s3")))
+        self.assertIn(("Shot", "s3"), self.data["entitiy_keys"])
+        views = self.data["pipeline_index"].views
+        self.assertEqual(
+            [x["id"] for x in views["by_type"]["Shot"]], ["s1", "s2", "s3"]
+        )
+
+    def test_deleted_shot_is_removed(self):
+        self.assertTrue(self.apply(event("shot:delete", shot_id="s2")))
+        self.assertEqual(
+            [x["id"] for x in self.data["all_shots_for_project"]], ["s1"]
+        )
+        self.assertNotIn("s2", self.data["entity_by_id"])
+        self.assertNotIn("s2", self.data["tasks_by_entity_id"])
+        self.assertNotIn(("Shot", "s2"), self.data["entitiy_keys"])
+        self.assertNotIn("SH020", self.data["pipeline_index"].entity_by_code)
+        self.assertEqual(self.gazu.called("shot.get_shots"), [])
+
+    def test_shot_updated_then_deleted_is_not_fetched(self):
+        self.assertTrue(
+            self.apply(
+                event("shot:update", shot_id="s2"),
+                event("shot:delete", shot_id="s2"),
+            )
+        )
+        self.assertEqual(self.gazu.called("shot.get_shots"), [])
+        self.assertNotIn("s2", self.data["entity_by_id"])
+
+    def test_changed_entities_are_fetched_together(self):
+        self.server["shots"]["s1"] = self.shot("s1", "SH010")
+        self.server["shots"]["s2"] = self.shot("s2", "SH020")
+        self.assertTrue(
+            self.apply(
+                event("shot:update", shot_id="s1"),
+                event("shot:update", shot_id="s2"),
+                event("shot:update", shot_id="s1"),
+            )
+        )
+        calls = self.gazu.called("shot.get_shots")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(calls[0][1][0]), ["s1", "s2"])
+        self.assertEqual(self.data["generation"], self.generation + 1)
+
+    def test_changed_ids_are_invalidated(self):
+        self.server["shots"]["s1"] = self.shot("s1", "SH010")
+        self.apply(
+            event("shot:update", shot_id="s1"),
+            event("asset:delete", asset_id="a1"),
+        )
+        invalidated = set(
+            call[1][0] for call in self.gazu.called("cache.invalidate")
+        )
+        self.assertEqual(invalidated, {"s1", "a1"})
+
+    def test_task_assigned_to_user_is_indexed(self):
+        self.server["tasks"]["t2"] = {
+            "id": "t2",
+            "entity_id": "s2",
+            "task_type_id": "tt1",
+            "task_status_id": "ts1",
+            "assignees": ["user"],
+            "entity": {"id": "s2", "name": "SH020"},
+        }
+        self.assertTrue(self.apply(event("task:assign", task_id="t2")))
+        self.assertEqual(
+            [x["id"] for x in self.data["project_tasks_for_person"]],
+            ["t1", "t2"],
+        )
+        self.assertEqual(self.data["assigned_entity_ids"], {"s1", "s2"})
+        task = self.data["tasks_by_entity_id"]["s2"][0]
+        self.assertEqual(task["task_type_name"], "Comp")
+        self.assertEqual(task["task_status_short_name"], "todo")
+        self.assertEqual(task["entity_name"], "SH020")
+        self.assertNotIn("entity", task)
+
+    def test_task_unassigned_from_user_is_dropped(self):
+        self.server["tasks"]["t1"] = dict(self.task, assignees=[])
+        self.assertTrue(self.apply(event("task:unassign", task_id="t1")))
+        self.assertEqual(self.data["project_tasks_for_person"], [])
+        self.assertEqual(self.data["assigned_entity_ids"], frozenset())
+        self.assertEqual(
+            [x["id"] for x in self.data["tasks_by_entity_id"]["s1"]], ["t1"]
+        )
+        self.assertEqual(
+            self.connector.get_entity_views(True)["by_type"], {}
+        )
+
+    def test_deleted_task_is_removed(self):
+        self.assertTrue(self.apply(event("task:delete", task_id="t1")))
+        self.assertEqual(self.data["tasks_by_entity_id"]["s1"], [])
+        self.assertNotIn("t1", self.data["preview_by_task_id"])
+        self.assertEqual(self.data["assigned_tasks_by_entity_id"], {})
+
+    def test_preview_of_task_is_fetched(self):
+        self.server["previews"]["t1"] = [{"id": "p1", "task_id": "t1"}]
+        self.assertTrue(
+            self.apply(event("preview-file:new", task_id="t1"))
+        )
+        self.assertEqual(
+            self.data["preview_by_task_id"]["t1"],
+            [{"id": "p1", "task_id": "t1"}],
+        )
+
+    def test_task_types_are_fetched_again(self):
+        self.assertTrue(self.apply(event("task-type:new")))
+        self.assertEqual(
+            self.data["all_task_types_for_project"],
+            [{"id": "tt2", "name": "Comp"}],
+        )
+
+    def test_episode_events_need_full_refresh(self):
+        self.assertFalse(self.apply(event("episode:new", episode_id="e1")))
+        self.assertEqual(self.data["generation"], self.generation)
+
+    def test_failed_fetch_needs_full_refresh(self):
+        def fail(ids, client=None):
+            raise IOError("connection reset")
+
+        self.gazu.set("shot.get_shots", fail)
+        self.assertFalse(self.apply(event("shot:update", shot_id="s1")))
+        self.assertEqual(self.data["generation"], self.generation)
+
+    def test_events_of_other_project_are_dropped(self):
+        self.server["shots"]["s1"] = self.shot("s1", "SH015")
+        self.gazu.set(
+            "shot.get_shots",
+            lambda ids, client=None: self.switch_project(
+                {"s1": self.server["shots"]["s1"]}
+            ),
+        )
+        self.assertTrue(self.apply(event("shot:update", shot_id="s1")))
+        self.assertEqual(self.data["generation"], self.generation)
+
+    def switch_project(self, result):
+        self.connector.linked_project_id = "other project"
+        return result
@@ -0,0 +1,188 @@
+import random
+import unittest
+
+from flameMenuKITSU import flameKitsuPipelineIndex
+
+
+def entity(entity_id, entity_type, code, episode_name=None, parent_id=None):
+    return {
+        "id": entity_id,
+        "type": entity_type,
+        "code": code,
+        "episode_name": episode_name,
+        "parent_id": parent_id,
+    }
+
+
+def view_ids(views):
+    by_episode = {
+        episode_name: {
+            entity_type: [x["id"] for x in entities]
+            for entity_type, entities in entities_by_type.items()
+        }
+        for episode_name, entities_by_type in views["by_episode"].items()
+    }
+    by_type = {
+        entity_type: [x["id"] for x in entities]
+        for entity_type, entities in views["by_type"].items()
+    }
+    return by_episode, by_type
+
+
+def replaced(entities, entity_id, new_entity=None):
+    entities = [x for x in entities if x.get("id") != entity_id]
+    if new_entity:
+        entities.append(new_entity)
+    return entities
+
+
+class PatchedIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.shots = [
+            entity("s1", "Shot", "010", "ep1", "q1"),
+            entity("s2", "Shot", "020", "ep1", "q1"),
+            entity("s3", "Shot", "010", "ep2", "q2"),
+        ]
+        self.assets = [
+            entity("a1", "Asset", "chair", "ep1"),
+            entity("a2", "Asset", "020"),
+        ]
+        self.index = flameKitsuPipelineIndex().updated(
+            shots=self.shots, assets=self.assets
+        )
+
+    def assertSameAsRebuilt(self, index, shots, assets):
+        rebuilt = flameKitsuPipelineIndex().updated(shots=shots, assets=assets)
+        self.assertEqual(view_ids(index.views), view_ids(rebuilt.views))
+        self.assertEqual(
+            {k: v["id"] for k, v in index.entity_by_code.items()},
+            {k: v["id"] for k, v in rebuilt.entity_by_code.items()},
+        )
+        self.assertEqual(
+            set(index.entity_by_id.keys()), set(rebuilt.entity_by_id.keys())
+        )
+        self.assertEqual(
+            {
+                k: [x["id"] for x in v]
+                for k, v in index.shots_by_sequence_id.items()
+                if v
+            },
+            {
+                k: [x["id"] for x in v]
+                for k, v in rebuilt.shots_by_sequence_id.items()
+            },
+        )
+
+    def test_new_shot_is_inserted_in_sorted_views(self):
+        shot = entity("s4", "Shot", "015", "ep1", "q1")
+        shots = replaced(self.shots, "s4", shot)
+        index = self.index.patched("Shot", "s4", shots, shot)
+
+        self.assertEqual(
+            [x["id"] for x in index.views["by_episode"]["ep1"]["Shot"]],
+            ["s1", "s4", "s2"],
+        )
+        self.assertIs(index.entity_by_id["s4"], shot)
+        self.assertIs(index.shots, shots)
+        self.assertSameAsRebuilt(index, shots, self.assets)
+
+    def test_patching_leaves_original_index_untouched(self):
+        before = view_ids(self.index.views)
+        shot = entity("s2", "Shot", "005", "ep2", "q2")
+        shots = replaced(self.shots, "s2", shot)
+        self.index.patched("Shot", "s2", shots, shot)
+        self.assertEqual(view_ids(self.index.views), before)
+        self.assertEqual(self.index.entity_by_code["020"]["id"], "s2")
+        self.assertEqual(
+            [x["id"] for x in self.index.shots_by_sequence_id["q1"]],
+            ["s1", "s2"],
+        )
+
+    def test_moved_shot_changes_episode_and_sequence(self):
+        shot = entity("s2", "Shot", "005", "ep2", "q2")
+        shots = replaced(self.shots, "s2", shot)
+        index = self.index.patched("Shot", "s2", shots, shot)
+        self.assertEqual(
+            [x["id"] for x in index.views["by_episode"]["ep2"]["Shot"]],
+            ["s2", "s3"],
+        )
+        self.assertEqual(
+            [x["id"] for x in index.shots_by_sequence_id["q1"]], ["s1"]
+        )
+        self.assertSameAsRebuilt(index, shots, self.assets)
+
+    def test_removed_entity_gives_code_back(self):
+        # shot 020 hides asset with the same code until it is removed
+        self.assertEqual(self.index.entity_by_code["020"]["id"], "s2")
+        shots = replaced(self.shots, "s2")
+        index = self.index.patched("Shot", "s2", shots)
+        self.assertEqual(index.entity_by_code["020"]["id"], "a2")
+        self.assertNotIn("s2", index.entity_by_id)
+        self.assertSameAsRebuilt(index, shots, self.assets)
+
+    def test_asset_does_not_take_code_of_shot(self):
+        asset = entity("a3", "Asset", "010")
+        assets = replaced(self.assets, "a3", asset)
+        index = self.index.patched("Asset", "a3", assets, asset)
+        self.assertEqual(index.entity_by_code["010"]["type"], "Shot")
+        self.assertSameAsRebuilt(index, self.shots, assets)
+
+    def test_last_entity_of_episode_removes_episode(self):
+        assets = replaced(self.assets, "a1")
+        index = self.index.patched("Asset", "a1", assets)
+        self.assertNotIn("Asset", index.views["by_episode"]["ep1"])
+        shots = replaced(self.shots, "s3")
+        index = index.patched("Shot", "s3", shots)
+        self.assertNotIn("ep2", index.views["by_episode"])
+        self.assertSameAsRebuilt(index, shots, assets)
+
+    def test_random_patches_match_rebuilt_index(self):
+        generator = random.Random(7)
+
+        def random_entity(number, entity_type):
+            return entity(
+                "%s%s" % (entity_type, number),
+                entity_type,
+                generator.choice(["a", "b", "c", "d"]),
+                generator.choice([None, "ep1", "ep2"]),
+                generator.choice(["q1", "q2"]),
+            )
+
+        shots = [random_entity(n, "Shot") for n in range(6)]
+        assets = [random_entity(n, "Asset") for n in range(6)]
+        index = flameKitsuPipelineIndex().updated(shots=shots, assets=assets)
+        for _ in range(500):
+            entity_type = generator.choice(["Shot", "Asset"])
+            number = generator.randrange(10)
+            entity_id = "%s%s" % (entity_type, number)
+            new_entity = None
+            if generator.random() > 0.3:
+                new_entity = random_entity(number, entity_type)
+            if entity_type == "Shot":
+                shots = replaced(shots, entity_id, new_entity)
+                index = index.patched(
+                    entity_type, entity_id, shots, new_entity
+                )
+            else:
+                assets = replaced(assets, entity_id, new_entity)
+                index = index.patched(
+                    entity_type, entity_id, assets, new_entity
+                )
+            self.assertSameAsRebuilt(index, shots, assets)
+
+
+class UpdatedIndexTestCase(unittest.TestCase):
+    def test_unchanged_lists_keep_their_maps(self):
+        shots = [entity("s1", "Shot", "010", None, "q1")]
+        assets = []
+        sequences = [{"id": "q1", "name": "SQ01"}]
+        index = flameKitsuPipelineIndex().updated(
+            sequences=sequences, shots=shots, assets=assets
+        )
+        again = index.updated(sequences=sequences, shots=shots, assets=assets)
+        self.assertIs(again.sequence_by_id, index.sequence_by_id)
+        self.assertIs(again.views, index.views)
+
+        again = index.updated(sequences=list(sequences))
+        self.assertIsNot(again.sequence_by_id, index.sequence_by_id)
+        self.assertIs(again.views, index.views)
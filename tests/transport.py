@@ -0,0 +1,58 @@
+import json
+import threading
+
+
+class FakeResponse(object):
+    """
+    Response of a fake session, with the parts of requests.Response the
+    gazu client reads.
+    """
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        if body is None:
+            body = b""
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.content = body
+        self.headers = headers or {}
+        self.closed = False
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        for index in range(0, len(self.content), chunk_size):
+            yield self.content[index : index + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession(object):
+    """
+    Session answering get requests without network. Responses are taken
+    from the queue first, then given by handler called with url and
+    request arguments. Every request is recorded in calls.
+    """
+
+    def __init__(self, handler=None, responses=None):
+        self.handler = handler
+        self.responses = list(responses or [])
+        self.calls = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls.append((url, kwargs))
+            if self.responses:
+                return self.responses.pop(0)
+        return self.handler(url, **kwargs)
+
+    def close(self):
+        self.closed = True